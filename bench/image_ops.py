@@ -0,0 +1,272 @@
+#!/usr/bin/python3
+
+# Times every Image operation, and the full letterform filter, on
+# synthetic boards at several resolutions. The boards are generated from
+# a fixed seed, so runs on different machines or branches time exactly
+# the same work.
+#
+# Run from the repository root:
+#   python bench/image_ops.py [--sizes MP...] [--ops NAME...] [--repeat N]
+#   python bench/image_ops.py --save bench/baseline.json
+#   python bench/image_ops.py --compare bench/baseline.json [--threshold 0.1]
+#
+# With --compare, exits with an error if the median time of any
+# operation has grown by more than the threshold over the baseline.
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from copy import copy
+from pathlib import Path
+from typing import *
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from lib.filter import filter_letterforms
+from lib.image import Image
+from lib.presets import PRESETS
+from lib.warp_cache import WarpCache
+
+PointType = Tuple[int, int]
+
+DEFAULT_SIZES = [1.0, 4.0, 12.0]
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.1
+SEED = 1234
+
+GLYPHS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789+-=()"
+
+
+# A 4:3 photo of a whiteboard with uneven lighting, lines of
+# handwriting-ish text and specks of noise. The board is a slightly
+# skewed quad inside the photo, and its corners are returned as the
+# points to rectify with
+def synthetic_board(
+    megapixels: float, seed: int = SEED
+) -> Tuple[np.ndarray, List[PointType]]:
+    rng = np.random.default_rng(seed)
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = width * 3 // 4
+
+    # Dark wall, with the lit board drawn over it
+    photo = np.full((height, width, 3), 60, dtype=np.uint8)
+    mx, my = width // 12, height // 12
+    points = [
+        (mx + width // 40, my),
+        (width - mx, my + height // 50),
+        (width - mx - width // 60, height - my),
+        (mx, height - my - height // 40),
+    ]
+    cv.fillConvexPoly(photo, np.array(points, dtype=np.int32), (225, 228, 230))
+
+    # A lighting gradient across the board
+    ramp = np.linspace(-25, 15, width, dtype=np.float32)
+    photo = np.clip(photo + ramp[None, :, None], 0, 255).astype(np.uint8)
+
+    scale = width / 1000
+    line_height = int(60 * scale)
+    for y in range(my + line_height, height - my - line_height // 2, line_height):
+        x = mx + int(30 * scale)
+        while x < width - mx - int(120 * scale):
+            word = "".join(rng.choice(list(GLYPHS), rng.integers(2, 7)))
+            cv.putText(
+                photo,
+                word,
+                (x, y + int(rng.integers(-5, 5) * scale)),
+                cv.FONT_HERSHEY_SIMPLEX,
+                1.2 * scale,
+                (40, 40, 40),
+                max(1, int(3 * scale)),
+            )
+            x += int((len(word) * 28 + rng.integers(20, 60)) * scale)
+
+    specks = rng.integers(0, [width, height], size=(width * height // 2000, 2))
+    for x, y in specks:
+        cv.circle(photo, (int(x), int(y)), 1, (90, 90, 90), -1)
+
+    noise = rng.normal(0, 4, photo.shape).astype(np.int16)
+    photo = np.clip(photo.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return photo, points
+
+
+# Each operation is (prepare, run). prepare turns the photo and its
+# points into whatever the operation takes as input, and isn't timed.
+# run is given a fresh copy of that input every time
+def _gray(photo: np.ndarray, points: List[PointType]) -> Image:
+    img = Image(photo)
+    img.grayscale()
+    return img
+
+
+def _binary(photo: np.ndarray, points: List[PointType]) -> Image:
+    img = _gray(photo, points)
+    img.adaptive_threshold(15, 2.0)
+    return img
+
+
+def _color(photo: np.ndarray, points: List[PointType]) -> Image:
+    return Image(photo)
+
+
+def _with_points(photo: np.ndarray, points: List[PointType]):
+    return Image(photo), points
+
+
+# The cache is shared by every run, so the warm up run fills it and the
+# timed runs only remap
+def _with_warps(photo: np.ndarray, points: List[PointType]):
+    return Image(photo), points, WarpCache()
+
+
+OPS: Dict[str, Tuple[Callable, Callable]] = {
+    "grayscale": (_color, lambda img: img.grayscale()),
+    "bgr_color": (_gray, lambda img: img.bgr_color()),
+    "crop_border": (_color, lambda img: img.crop_border(0.02)),
+    "perspective_transform": (
+        _with_points,
+        lambda state: state[0].perspective_transform(state[1]),
+    ),
+    # Cold runs build the remap tables every time, as the first warp of
+    # a board does. Warm runs find them in the cache
+    "perspective_transform_cold": (
+        _with_points,
+        lambda state: state[0].perspective_transform(state[1], WarpCache()),
+    ),
+    "perspective_transform_warm": (
+        _with_warps,
+        lambda state: state[0].perspective_transform(state[1], state[2]),
+    ),
+    "adaptive_threshold": (_gray, lambda img: img.adaptive_threshold(15, 2.0)),
+    "blur": (_gray, lambda img: img.blur(9)),
+    "threshold": (_gray, lambda img: img.threshold(0.1)),
+    "area_threshold": (_binary, lambda img: img.area_threshold(10)),
+    "scale": (_color, lambda img: img.scale(0.5)),
+    "scale_bounded": (_color, lambda img: img.scale_bounded(1850, 1000)),
+    "scale_min": (_gray, lambda img: img.scale_min(2000, 2000)),
+    "watermark": (_color, lambda img: img.watermark(PRESETS["default"])),
+    "draw_line": (_color, lambda img: img.draw_line((0, 0), (100, 100))),
+    "draw_point": (_color, lambda img: img.draw_point(50, 50)),
+    "filter_letterforms": (
+        _with_points,
+        lambda state: filter_letterforms(
+            state[0], trans_matrix=state[1], **PRESETS["default"]
+        ),
+    ),
+}
+
+
+def _fresh(state: Any) -> Any:
+    if isinstance(state, tuple):
+        return (copy(state[0]),) + state[1:]
+    return copy(state)
+
+
+# Returns the median and minimum milliseconds of repeat runs, after one
+# untimed run to warm up caches and lazy initialisation
+def time_op(prepare: Callable, run: Callable, photo, points, repeat: int):
+    state = prepare(photo, points)
+    run(_fresh(state))
+
+    times = []
+    for _ in range(repeat):
+        fresh = _fresh(state)
+        start = time.perf_counter()
+        run(fresh)
+        times.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(times), "min_ms": min(times)}
+
+
+def size_label(megapixels: float) -> str:
+    return "{:g}MP".format(megapixels)
+
+
+def run_benchmarks(
+    sizes: List[float], ops: List[str], repeat: int
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for megapixels in sizes:
+        photo, points = synthetic_board(megapixels)
+        label = size_label(megapixels)
+        results[label] = {}
+        for name in ops:
+            prepare, run = OPS[name]
+            results[label][name] = time_op(prepare, run, photo, points, repeat)
+            print(
+                "{:>6} {:<26} {:10.2f} ms".format(
+                    label, name, results[label][name]["median_ms"]
+                ),
+                file=sys.stderr,
+            )
+    return results
+
+
+# Lists every (size, op, baseline ms, current ms) that slowed down by
+# more than threshold. Entries missing from either side are ignored
+def regressions(
+    baseline: Dict, current: Dict, threshold: float
+) -> List[Tuple[str, str, float, float]]:
+    slower = []
+    for label, ops in current.items():
+        for name, result in ops.items():
+            before = baseline.get(label, {}).get(name)
+            if before is None:
+                continue
+            if result["median_ms"] > before["median_ms"] * (1 + threshold):
+                slower.append((label, name, before["median_ms"], result["median_ms"]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser("image operation benchmark")
+    parser.add_argument(
+        "--sizes", type=float, nargs="+", default=DEFAULT_SIZES, help="Megapixels"
+    )
+    parser.add_argument("--ops", nargs="+", default=list(OPS), choices=list(OPS))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--save", help="Write the results as a baseline")
+    parser.add_argument("--compare", help="Baseline to compare the results with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown over the baseline, 0.1 is 10%%",
+    )
+    args = parser.parse_args()
+
+    report = {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "opencv": cv.__version__,
+            "numpy": np.__version__,
+        },
+        "repeat": args.repeat,
+        "results": run_benchmarks(args.sizes, args.ops, args.repeat),
+    }
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = False
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        slower = regressions(baseline["results"], report["results"], args.threshold)
+        report["regressions"] = [
+            {"size": label, "op": name, "baseline_ms": before, "current_ms": after}
+            for label, name, before, after in slower
+        ]
+        failed = bool(slower)
+
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+
+# Measures how long the command line takes to start, using the import
+# timings Python reports with -X importtime. Each command is run with
+# --help, so the measurement covers starting up and parsing arguments,
+# plus whatever the command imports before it gets going.
+#
+# Run from the repository root:
+#   python bench/startup.py [--budget MS] [--repeat N] [commands...]
+#
+# Exits with an error if any command goes over the budget, or if a
+# command that should be light imports OpenCV or numpy.
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import *
+
+MAIN = str(Path(__file__).resolve().parent.parent / "main.py")
+
+# Commands that only touch the asset database or talk to the daemon,
+# and must stay free of the heavy imports
+LIGHT_COMMANDS = ["add", "delete", "client"]
+HEAVY_MODULES = ["cv2", "numpy"]
+
+# Milliseconds of imports a light command may spend
+DEFAULT_BUDGET = 50.0
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+# Runs a command and returns (wall ms, import ms, imported modules)
+def measure(command: str) -> Tuple[float, float, List[str]]:
+    args = [sys.executable, "-X", "importtime", MAIN, command, "--help"]
+
+    start = time.perf_counter()
+    proc = subprocess.run(args, capture_output=True, text=True)
+    wall = (time.perf_counter() - start) * 1000
+
+    modules = []
+    cumulative = 0
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        modules.append(match.group(4))
+        # Top level imports have no indentation, and their cumulative
+        # time already includes everything they import
+        if len(match.group(3)) == 1:
+            cumulative += int(match.group(2))
+
+    return wall, cumulative / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser("startup benchmark")
+    parser.add_argument("commands", nargs="*", default=LIGHT_COMMANDS)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    for command in args.commands:
+        walls, imports = [], []
+        modules: List[str] = []
+        for _ in range(args.repeat):
+            wall, imported, modules = measure(command)
+            walls.append(wall)
+            imports.append(imported)
+
+        heavy = [m for m in HEAVY_MODULES if m in modules]
+        result = {
+            "wall_ms": statistics.median(walls),
+            "import_ms": statistics.median(imports),
+            "heavy_imports": heavy,
+        }
+        over = result["import_ms"] > args.budget
+        if command in LIGHT_COMMANDS and (heavy or over):
+            failed = True
+            result["over_budget"] = True
+        results[command] = result
+
+    print(json.dumps({"budget_ms": args.budget, "commands": results}, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
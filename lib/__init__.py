@@ -1,5 +1,20 @@
 from . import asset_manager
-from . import window
+import atexit
+import json
+import os
+import sys
+from typing import TYPE_CHECKING
+
+# The window module pulls in OpenCV, so it's only imported once a
+# window is actually needed
+if TYPE_CHECKING:
+    from . import window
+
+# Set to the path of a script (see lib.headless) to run the window
+# without a display. The latency report is written to the report path
+# on exit, or printed if there isn't one
+SCRIPT_ENV = "BOARD_VECTOR_SCRIPT"
+REPORT_ENV = "BOARD_VECTOR_REPORT"
 
 _mgr = None
 _win = None
@@ -12,8 +27,28 @@ def get_asset_mgr() -> asset_manager.AssetManager:
     return _mgr
 
 
-def get_window() -> window.Window:
+def _write_report(backend):
+    report = backend.report()
+    path = os.environ.get(REPORT_ENV)
+    if path:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2), file=sys.stderr)
+
+
+def get_window() -> "window.Window":
     global _win
     if not _win:
-        _win = window.Window()
+        from . import window
+
+        script = os.environ.get(SCRIPT_ENV)
+        if script:
+            from . import headless
+
+            backend = headless.HeadlessBackend(headless.load_script(script))
+            atexit.register(_write_report, backend)
+            _win = window.Window(backend)
+        else:
+            _win = window.Window()
     return _win
@@ -2,13 +2,23 @@
 # photos, that are tagged with point information. These photos can
 # then be used in other commands, without us having to specify via the
 # command line.
+#
+# Several processes may share the same asset folder, for example
+# parallel iadd sessions next to a batch job. Every change takes an
+# exclusive lock on the folder, reloads whatever the other processes
+# have written, applies itself and then replaces the data file in one
+# step, so no process overwrites the entries of another.
 
 import pickle
 import collections
+import fcntl
+import glob
 import os
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 from .cmdlet import Cmdlet
+from .util import atomic_write
 
 PointType = Tuple[int, int]
 
@@ -20,55 +30,121 @@ Entry = collections.namedtuple("Entry", "name points")
 
 ASSET_FOLDER = "./assets"
 ASSET_DATA_FILE = ASSET_FOLDER + "/data.dat"
+ASSET_LOCK_FILE = ASSET_FOLDER + "/data.lock"
+# Thumbnails of each asset, named after it, see lib.thumbnail
+THUMB_FOLDER = ASSET_FOLDER + "/thumbs"
+# Saved rectification tables, see lib.warp_cache
+WARP_FOLDER = ASSET_FOLDER + "/warps"
+
 
 # Singleton class
 class AssetManager:
-    def __init__(self):
-        if not os.path.exists(ASSET_FOLDER):
-            os.mkdir(ASSET_FOLDER)
-
-        if not os.path.exists(ASSET_DATA_FILE):
+    def __init__(self, folder: str = ASSET_FOLDER):
+        self.folder = folder
+        self.data_file = Path(folder, Path(ASSET_DATA_FILE).name)
+        self.lock_file = Path(folder, Path(ASSET_LOCK_FILE).name)
+        self.thumb_folder = Path(folder, Path(THUMB_FOLDER).name)
+        self.warp_folder = Path(folder, Path(WARP_FOLDER).name)
+
+        if not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+
+        self._entries: List[Entry] = []
+        # Identifies the version of the data file we last read, so we
+        # only reload when another process has replaced it
+        self._version = None
+        with self._lock(fcntl.LOCK_SH):
+            self._refresh()
+
+    # Holds the folder lock for the duration of the block. Readers share
+    # the lock, writers get it to themselves
+    @contextmanager
+    def _lock(self, mode: int) -> Iterator[None]:
+        with open(self.lock_file, "a") as lock_f:
+            fcntl.flock(lock_f, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_f, fcntl.LOCK_UN)
+
+    # Reloads the entries if the data file changed since we last read
+    # it. Must be called with the lock held
+    def _refresh(self):
+        try:
+            stat = os.stat(self.data_file)
+        except FileNotFoundError:
             self._entries = []
-        else:
-            with open(ASSET_DATA_FILE, "rb") as data_f:
+            self._version = None
+            return
+
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version != self._version:
+            with open(self.data_file, "rb") as data_f:
                 self._entries = pickle.load(data_f)
+            self._version = version
 
-    # Adds the entry
-    def add(self, photo_path: Path, points: List[PointType]):
+    # Adds the entry, returning the path of the photo in the asset folder
+    def add(self, photo_path: Path, points: List[PointType]) -> Path:
         if not os.path.exists(photo_path):
             raise ValueError
 
         # Check the points, ensure they all are in a good format
         validate_points(points)
 
-        # Hard link photo into asset folder.
-        name = photo_path.name
-        dst = Path(ASSET_FOLDER, name)
-        os.link(photo_path, dst)
+        with self._lock(fcntl.LOCK_EX):
+            self._refresh()
 
-        # Modify state
-        entry = Entry(name, points)
-        self._entries.append(entry)
+            # Hard link photo into asset folder.
+            name = photo_path.name
+            dst = Path(self.folder, name)
+            os.link(photo_path, dst)
 
-        # Persist state
-        self.save()
+            # Modify state
+            entry = Entry(name, points)
+            self._entries.append(entry)
 
-    def delete(self, n: int):
-        if n < len(self._entries) and n >= 0:
-            path = Path(ASSET_FOLDER, self._entries[n].name)
-            os.remove(path)
-            del (self._entries[n])
+            # Persist state
             self.save()
 
-    # Writes data to main file
+        return dst
+
+    def delete(self, n: int):
+        with self._lock(fcntl.LOCK_EX):
+            self._refresh()
+            if n < len(self._entries) and n >= 0:
+                name = self._entries[n].name
+                os.remove(Path(self.folder, name))
+                del self._entries[n]
+                self.save()
+
+                # The photo may be added again with other points, so its
+                # thumbnails mustn't outlive it
+                for pattern in ("*x*.jpg", "json"):
+                    thumbs = str(self.thumb_folder / glob.escape(name)) + "." + pattern
+                    for thumb in glob.glob(thumbs):
+                        os.remove(thumb)
+
+    # Writes data to main file. The new data is written beside the old
+    # one and swapped in, so readers never see a partial file. Must be
+    # called with the exclusive lock held
     def save(self):
-        with open(ASSET_DATA_FILE, "wb") as data_f:
+        with atomic_write(self.data_file) as tmp, open(tmp, "wb") as data_f:
             pickle.dump(self._entries, data_f)
 
+        stat = os.stat(self.data_file)
+        self._version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def __len__(self) -> int:
+        with self._lock(fcntl.LOCK_SH):
+            self._refresh()
+            return len(self._entries)
+
     # Returns the PATH (not name), and the transform points
     def get(self, i: int):
-        entry = self._entries[i]
-        return (Path(ASSET_FOLDER, entry.name), entry.points)
+        with self._lock(fcntl.LOCK_SH):
+            self._refresh()
+            entry = self._entries[i]
+        return (Path(self.folder, entry.name), entry.points)
 
 
 def validate_points(points: List[PointType]):
@@ -96,7 +172,7 @@ def get_points(args):
 def add(args):
     mgr = AssetManager()
     print(args)
-    mgr.add(Path(args.photopath), assets.get_points(args))
+    mgr.add(Path(args.photopath), get_points(args))
 
 
 add_cmd = Cmdlet("add", "Add an asset with set coordinates", add)
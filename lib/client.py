@@ -0,0 +1,51 @@
+# Thin client for the board vector daemon (see lib.daemon). It only
+# needs the standard library, so scripts using it start instantly and
+# leave the heavy lifting to the warm daemon.
+#
+# Jobs are sent as one line of JSON, and answered with one line:
+#   {"job": "process", "n": [0, 1], "preset": "default"}
+#   {"ok": true, "result": ...} or {"ok": false, "error": "..."}
+
+import json
+import socket
+from typing import *
+
+SOCKET_PATH = "./assets/daemon.sock"
+
+
+class DaemonError(Exception):
+    pass
+
+
+def request(job: Dict[str, Any], path: str = SOCKET_PATH) -> Any:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(job).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+
+    if not line:
+        raise DaemonError("Daemon closed the connection")
+    reply = json.loads(line)
+    if not reply["ok"]:
+        raise DaemonError(reply["error"])
+    return reply["result"]
+
+
+# Values are given as key=value, and read as JSON where possible so
+# n=[0,1] is a list, while preset=fine is just a string
+def parse_params(params: List[str]) -> Dict[str, Any]:
+    parsed = {}
+    for param in params:
+        key, _, value = param.partition("=")
+        try:
+            parsed[key] = json.loads(value)
+        except ValueError:
+            parsed[key] = value
+    return parsed
+
+
+def client(args):
+    job = parse_params(args.params)
+    job["job"] = args.job
+    print(json.dumps(request(job, args.socket), indent=2))
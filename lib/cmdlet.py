@@ -1,12 +1,16 @@
 import argparse
+import importlib
 import sys
-from typing import Callable, List, Dict, Any
+from typing import Callable, List, Dict, Any, Union
 
 ArgsType = Dict[str, Any]
 
 
 class Cmdlet:
-    def __init__(self, name: str, helpmsg: str, runner: Callable):
+    # The runner is either the function itself, or where to find it as
+    # "module:function". Commands that need OpenCV or numpy should use
+    # the string form, so those are only imported when the command runs
+    def __init__(self, name: str, helpmsg: str, runner: Union[Callable, str]):
         self.name = name
         self.helpmsg = helpmsg
         self.runner = runner
@@ -22,21 +26,39 @@ class Cmdlet:
         for name, params in self.args.items():
             parser.add_argument(name, **params)
 
+    # Imports the runner if needed, and returns it
+    def resolve(self) -> Callable:
+        if isinstance(self.runner, str):
+            module, func = self.runner.split(":")
+            self.runner = getattr(importlib.import_module(module), func)
+        return self.runner
+
 
 class Commander:
     def __init__(self, cmdlets: List[Cmdlet]):
         self.cmdlets = cmdlets
 
-    def run(self):
+    def run(self, argv: List[str] = None):
+        if argv is None:
+            argv = sys.argv[1:]
+        command = argv[0] if argv else None
+
         main_parser = argparse.ArgumentParser("Board Vector")
         subparsers = main_parser.add_subparsers(help="sub command help")
 
+        # Only the chosen command needs its arguments, the rest are only
+        # listed in the help
         for cmd in self.cmdlets:
-            cmd.add_command(subparsers)
+            if command == cmd.name:
+                cmd.add_command(subparsers)
+            else:
+                subparsers.add_parser(cmd.name, help=cmd.helpmsg)
 
-        args = main_parser.parse_args()
-        command = sys.argv[1]
+        args = main_parser.parse_args(argv)
 
         for cmd in self.cmdlets:
             if command == cmd.name:
-                cmd.runner(args)
+                cmd.resolve()(args)
+                return
+
+        main_parser.print_help()
@@ -0,0 +1,225 @@
+# Finds the four corners of a board in a photo, so they don't have to be
+# clicked. The search runs on a small copy of the photo, looking for a
+# large four sided outline among the edges and among the bright regions,
+# and the corners found are then refined against the full resolution
+# photo.
+#
+# Every detection has a confidence between 0 and 1, from how much of the
+# photo the board covers, how well four corners fit its outline, how
+# square those corners are, and how much it stands out from around it.
+# Anything under MIN_CONFIDENCE should be clicked by hand.
+
+import collections
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import *
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .asset_manager import AssetManager, validate_points
+from .image import Image
+
+PointType = Tuple[int, int]
+
+# points are in the order perspective_transform takes them, top left,
+# top right, bottom right, bottom left
+Detection = collections.namedtuple("Detection", "points confidence")
+
+# Longest side of the copy that's searched
+WORK_SIZE = 512
+MIN_CONFIDENCE = 0.5
+# A board covering this fraction of the photo or more is large enough
+FULL_AREA = 0.2
+# Grey levels between a board and its surroundings for full confidence
+CONTRAST = 40
+
+
+# Orders 4 points as top left, top right, bottom right, bottom left
+def order_points(quad: np.ndarray) -> np.ndarray:
+    quad = quad.reshape(4, 2).astype(np.float32)
+    sums = quad.sum(axis=1)
+    diffs = quad[:, 1] - quad[:, 0]
+    return np.array(
+        [
+            quad[np.argmin(sums)],
+            quad[np.argmin(diffs)],
+            quad[np.argmax(sums)],
+            quad[np.argmax(diffs)],
+        ]
+    )
+
+
+# 1 when every corner is a right angle, falling to 0 as the worst one
+# nears 45 degrees off
+def _squareness(quad: np.ndarray) -> float:
+    worst = 0.0
+    for i in range(4):
+        a = quad[i - 1] - quad[i]
+        b = quad[(i + 1) % 4] - quad[i]
+        cos = abs(np.dot(a, b)) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-9)
+        worst = max(worst, cos)
+    return max(0.0, 1 - worst / math.cos(math.pi / 4))
+
+
+# 1 when the inside of the quad differs from a band just outside it by
+# CONTRAST grey levels or more. A quad with nothing outside it, like the
+# edge of the photo, has no contrast
+def _contrast(gray: np.ndarray, quad: np.ndarray) -> float:
+    inside = np.zeros(gray.shape, dtype=np.uint8)
+    cv.fillConvexPoly(inside, quad.astype(np.int32), 255)
+    band = max(3, min(gray.shape) // 40)
+    around = cv.dilate(inside, np.ones((band, band), np.uint8)) - inside
+    if cv.countNonZero(around) < band * 4:
+        return 0.0
+    diff = abs(cv.mean(gray, inside)[0] - cv.mean(gray, around)[0])
+    return min(1.0, diff / CONTRAST)
+
+
+def _score(gray: np.ndarray, contour: np.ndarray, quad: np.ndarray) -> float:
+    quad_area = cv.contourArea(quad)
+    if quad_area <= 0:
+        return 0.0
+    fit = min(cv.contourArea(contour), quad_area) / quad_area
+    size = min(1.0, quad_area / (gray.shape[0] * gray.shape[1] * FULL_AREA))
+    return fit * size * _squareness(quad) * _contrast(gray, quad)
+
+
+# Outlines that might be the board: edges, closed up so small gaps in
+# the frame don't break it, and the bright regions, since boards are
+# usually the brightest thing in the photo
+def _candidates(gray: np.ndarray) -> Iterator[np.ndarray]:
+    median = float(np.median(gray))
+    edges = cv.Canny(gray, 0.66 * median, 1.33 * median)
+    edges = cv.dilate(edges, np.ones((3, 3), np.uint8))
+    _, bright = cv.threshold(gray, 0, 255, cv.THRESH_BINARY + cv.THRESH_OTSU)
+
+    for mask in (edges, bright):
+        contours, _ = cv.findContours(mask, cv.RETR_LIST, cv.CHAIN_APPROX_SIMPLE)
+        yield from sorted(contours, key=cv.contourArea, reverse=True)[:5]
+
+
+# Moves each corner onto the nearby corner in the full resolution
+# photo. Corners found on the small copy can be a few of its pixels out,
+# so the search window grows with the scale. Only a small patch around
+# each corner is converted to grayscale, so this stays cheap however
+# large the photo is
+def _refine(img: np.ndarray, corners: np.ndarray, scale: float) -> np.ndarray:
+    win = int(min(64, max(5, math.ceil(scale * 5))))
+    pad = win * 3
+    height, width = img.shape[:2]
+    refined = corners.copy()
+
+    for i, (x, y) in enumerate(corners):
+        x0, y0 = max(int(x) - pad, 0), max(int(y) - pad, 0)
+        x1, y1 = min(int(x) + pad, width), min(int(y) + pad, height)
+        if x1 - x0 <= 2 * win + 5 or y1 - y0 <= 2 * win + 5:
+            continue
+        patch = img[y0:y1, x0:x1]
+        if patch.ndim == 3:
+            patch = cv.cvtColor(patch, cv.COLOR_BGR2GRAY)
+
+        point = np.array([[[x - x0, y - y0]]], dtype=np.float32)
+        criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 20, 0.1)
+        cv.cornerSubPix(patch, point, (win, win), (-1, -1), criteria)
+        moved = point[0, 0] + (x0, y0)
+        # A refinement that wanders off is worse than none
+        if np.linalg.norm(moved - (x, y)) <= win:
+            refined[i] = moved
+    return refined
+
+
+def detect_corners(img: np.ndarray, work_size: int = WORK_SIZE) -> Optional[Detection]:
+    height, width = img.shape[:2]
+    scale = max(height, width) / work_size
+    small = img
+    if scale > 1:
+        small = cv.resize(
+            img,
+            (round(width / scale), round(height / scale)),
+            interpolation=cv.INTER_AREA,
+        )
+    else:
+        scale = 1.0
+    if small.ndim == 3:
+        small = cv.cvtColor(small, cv.COLOR_BGR2GRAY)
+    small = cv.GaussianBlur(small, (5, 5), 0)
+
+    best, best_score = None, 0.0
+    for contour in _candidates(small):
+        hull = cv.convexHull(contour)
+        quad = cv.approxPolyDP(hull, 0.02 * cv.arcLength(hull, True), True)
+        if len(quad) != 4:
+            continue
+        quad = order_points(quad)
+        score = _score(small, hull, quad)
+        if score > best_score:
+            best, best_score = quad, score
+
+    if best is None:
+        return None
+
+    corners = _refine(img, best * scale, scale)
+    points = [
+        (int(min(max(round(x), 0), width - 1)), int(min(max(round(y), 0), height - 1)))
+        for x, y in corners
+    ]
+    return Detection(points, float(best_score))
+
+
+def detect_file(path: Path) -> Optional[Detection]:
+    img = Image(path).img
+    # imread gives None for anything it can't decode
+    if img is None:
+        raise ValueError("Unable to read {}".format(path))
+    return detect_corners(img)
+
+
+# Adds every photo whose board is found with enough confidence, and
+# lists the rest so they can be added with iadd. A photo that can't be
+# read or added is reported and left with the rest, so one bad photo
+# doesn't stop the others being added
+def bulk_add(args):
+    mgr = AssetManager()
+    paths = [Path(p) for p in args.photopaths]
+    failed = []
+    start = time.perf_counter()
+
+    def detect(path: Path) -> Tuple[Optional[Detection], Optional[Exception]]:
+        try:
+            return detect_file(path), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for path, (detection, error) in zip(paths, pool.map(detect, paths)):
+            if error is not None:
+                print("{}: {}".format(path, error))
+                failed.append(path)
+                continue
+            if detection is None or detection.confidence < args.min_confidence:
+                confidence = detection.confidence if detection else 0.0
+                print("{}: not found ({:.2f})".format(path, confidence))
+                failed.append(path)
+                continue
+
+            try:
+                validate_points(detection.points)
+                mgr.add(path, detection.points)
+            except Exception as e:
+                print("{}: unable to add: {!r}".format(path, e))
+                failed.append(path)
+                continue
+            print(
+                "{}: {} ({:.2f})".format(path, detection.points, detection.confidence)
+            )
+
+    elapsed = time.perf_counter() - start
+    print(
+        "Added {} of {} photos in {:.1f}s".format(
+            len(paths) - len(failed), len(paths), elapsed
+        )
+    )
+    if failed:
+        print("Add the rest by hand with:")
+        print("  iadd " + " ".join(str(p) for p in failed))
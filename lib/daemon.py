@@ -0,0 +1,194 @@
+# A long lived worker that keeps the asset database, decoded photos and
+# rectified boards in memory, and takes jobs over a unix socket. Scripts
+# that run many small jobs pay for importing OpenCV and decoding each
+# photo once, instead of on every command. See lib.client for the
+# protocol and a client to go with it.
+#
+# Every connection is served on its own thread. The caches are shared,
+# and only ever hold images that nothing modifies, so a job that wants
+# to change one works on a copy. Given more than one worker, each board
+# is filtered across that many processes, see lib.tiled.
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from copy import copy
+from pathlib import Path
+from typing import *
+from .asset_manager import AssetManager
+from .cache import LRUCache
+from .client import DaemonError
+from .filter import (
+    PRESETS,
+    board_params,
+    letterforms,
+    rectify_resolution,
+    with_resolution,
+)
+from .image import Image
+from .process import stale_assets, write_output
+from .tiled import TiledFilter
+from .warp_cache import WarpCache
+
+PointType = Tuple[int, int]
+JobType = Dict[str, Any]
+
+
+class Daemon:
+    def __init__(self, mgr: AssetManager, cache_size: int = 8, workers: int = 1):
+        self.mgr = mgr
+        self.tiled = TiledFilter(workers) if workers > 1 else None
+        self.decoded: LRUCache[Tuple, Image] = LRUCache(cache_size)
+        # Boards, with their scale relative to the reference resolution
+        self.rectified: LRUCache[Tuple, Tuple[Image, float]] = LRUCache(cache_size)
+        # Rectifying a photo again, e.g. once it's dropped out of
+        # rectified or at the other resolution, is a single remap
+        self.warps = WarpCache(folder=str(mgr.warp_folder))
+        self.jobs = {
+            "ping": self.ping,
+            "list": self.list,
+            "process": self.process,
+            "stats": self.stats,
+        }
+
+    # Photos are keyed by their modification time as well as their path,
+    # so a replaced photo is never served from the cache
+    def _decode(self, src: Path) -> Image:
+        key = (str(src), src.stat().st_mtime_ns)
+        return self.decoded.get_or_make(key, lambda: Image(src))
+
+    # Boards only depend on the resolution options of params, so they're
+    # shared by every preset
+    def _rectify(
+        self, src: Path, points: List[PointType], params: Dict[str, Any]
+    ) -> Tuple[Image, float]:
+        def make() -> Tuple[Image, float]:
+            return rectify_resolution(self._decode(src), points, params, self.warps)
+
+        native, max_side = params.get("native", False), params.get("max_side")
+        key = (str(src), src.stat().st_mtime_ns, tuple(points), native, max_side)
+        return self.rectified.get_or_make(key, make)
+
+    def handle(self, job: JobType) -> Any:
+        name = job.pop("job", None)
+        if name not in self.jobs:
+            raise ValueError("Unknown job {}".format(name))
+        return self.jobs[name](**job)
+
+    def ping(self) -> str:
+        return "pong"
+
+    def list(self) -> List[Tuple[str, List[PointType]]]:
+        entries = [self.mgr.get(i) for i in range(len(self.mgr))]
+        return [(path.name, points) for path, points in entries]
+
+    # Same as the process command, returning the paths written
+    def process(
+        self,
+        n: Optional[List[int]] = None,
+        preset: str = "default",
+        output: str = "./processed",
+        format: str = "png",
+        force: bool = False,
+        native: bool = False,
+        max_side: Optional[int] = None,
+    ) -> List[str]:
+        params = with_resolution(PRESETS[preset], native, max_side)
+        os.makedirs(output, exist_ok=True)
+
+        indices = n if n else range(len(self.mgr))
+        written = []
+        for _, src, points, out in stale_assets(
+            self.mgr, indices, params, output, format, force
+        ):
+            board, factor = self._rectify(src, points, params)
+            img = copy(board)
+            filter_params = board_params(params, factor)
+            if self.tiled:
+                self.tiled.letterforms(img, filter_params)
+            else:
+                letterforms(img, **filter_params)
+            write_output(img, out, points, params)
+            written.append(str(out))
+        return written
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"entries": len(cache), "hits": cache.hits, "misses": cache.misses}
+            for name, cache in [
+                ("decoded", self.decoded),
+                ("rectified", self.rectified),
+            ]
+        }
+
+    def close(self):
+        if self.tiled:
+            self.tiled.close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                job = json.loads(line)
+                if job.get("job") == "shutdown":
+                    # Has to happen off this thread, shutdown waits for
+                    # the server loop to notice
+                    threading.Thread(target=self.server.shutdown).start()
+                    reply = {"ok": True, "result": None}
+                else:
+                    reply = {"ok": True, "result": self.server.daemon.handle(job)}
+            except Exception as e:
+                reply = {"ok": False, "error": "{}: {}".format(type(e).__name__, e)}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+def answers(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+    return True
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, daemon: Daemon):
+        # A socket left behind by a daemon that died would stop us
+        # binding, but one that's still answering belongs to a daemon
+        # that's running
+        if os.path.exists(path):
+            if answers(path):
+                raise DaemonError("A daemon is already running on {}".format(path))
+            os.unlink(path)
+        super().__init__(path, _Handler)
+        self.path = path
+        self.daemon = daemon
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def serve(args):
+    daemon = Daemon(AssetManager(), args.cache, args.workers)
+    try:
+        server = Server(args.socket, daemon)
+    except DaemonError as e:
+        daemon.close()
+        sys.exit(str(e))
+
+    with server:
+        print("Serving on {}".format(args.socket))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            daemon.close()
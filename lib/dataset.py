@@ -0,0 +1,122 @@
+# Packs rectified assets into a single file, so experiments can load a
+# whole set of boards with one mmap instead of decoding every photo.
+#
+# The file is laid out as:
+#   MAGIC
+#   one raw array block per asset, each aligned to ALIGN bytes
+#   a JSON table with the name, points, shape, dtype and offset of each
+#   the offset of that table as a little endian uint64, then MAGIC
+#
+# The table goes last so assets can be written as they're decoded,
+# without knowing their sizes up front.
+
+import json
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import *
+import numpy as np  # type: ignore
+from .asset_manager import AssetManager
+from .image import Image
+from .util import WORKERS, atomic_write
+
+PointType = Tuple[int, int]
+RecordType = Tuple[str, List[PointType], np.ndarray]
+
+MAGIC = b"BVDS0001"
+ALIGN = 4096
+FOOTER = struct.Struct("<Q8s")
+
+
+def _pad(f: BinaryIO):
+    pos = f.tell()
+    f.write(b"\0" * (-pos % ALIGN))
+
+
+# Writes each (name, points, array) record to the dataset at path
+def write_dataset(path: Path, records: Iterable[RecordType]):
+    table = []
+    with atomic_write(path) as tmp, open(tmp, "wb") as f:
+        f.write(MAGIC)
+        for name, points, arr in records:
+            arr = np.ascontiguousarray(arr)
+            _pad(f)
+            table.append(
+                {
+                    "name": name,
+                    "points": [list(p) for p in points],
+                    "shape": list(arr.shape),
+                    "dtype": arr.dtype.str,
+                    "offset": f.tell(),
+                }
+            )
+            f.write(arr.tobytes())
+
+        table_offset = f.tell()
+        f.write(json.dumps({"entries": table}).encode())
+        f.write(FOOTER.pack(table_offset, MAGIC))
+
+
+# Read only view of a dataset. The file is mapped once, and every
+# array is a slice of that mapping, so nothing is read until used
+class Dataset:
+    def __init__(self, path: Path):
+        self._map = np.memmap(path, dtype="uint8", mode="r")
+
+        table_offset, magic = FOOTER.unpack(bytes(self._map[-FOOTER.size :]))
+        if magic != MAGIC or bytes(self._map[: len(MAGIC)]) != MAGIC:
+            raise ValueError("{} is not a board vector dataset".format(path))
+
+        table = bytes(self._map[table_offset : -FOOTER.size])
+        self._entries = json.loads(table.decode())["entries"]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        entry = self._entries[i]
+        return np.ndarray(
+            tuple(entry["shape"]),
+            dtype=np.dtype(entry["dtype"]),
+            buffer=self._map,
+            offset=entry["offset"],
+        )
+
+    def name(self, i: int) -> str:
+        return self._entries[i]["name"]
+
+    def points(self, i: int) -> List[PointType]:
+        return [tuple(p) for p in self._entries[i]["points"]]
+
+
+# Decodes and rectifies assets in a thread pool. Only a few are decoded
+# ahead of the writer, which keeps memory bounded for large exports
+def rectified_assets(
+    mgr: AssetManager, indices: List[int], gray: bool, workers: int = WORKERS
+) -> Iterator[RecordType]:
+    def load(i: int) -> RecordType:
+        path, points = mgr.get(i)
+        img = Image(path)
+        img.perspective_transform(points)
+        if gray:
+            img.grayscale()
+        return (path.name, points, img.img)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        queue: Deque = deque()
+        for i in indices:
+            queue.append(pool.submit(load, i))
+            if len(queue) >= 2 * workers:
+                yield queue.popleft().result()
+        while queue:
+            yield queue.popleft().result()
+
+
+def export(args):
+    mgr = AssetManager()
+    indices = args.n if args.n else list(range(len(mgr)))
+    write_dataset(
+        Path(args.output), rectified_assets(mgr, indices, args.gray, args.workers)
+    )
+    print("Exported {} assets to {}".format(len(indices), args.output))
@@ -0,0 +1,97 @@
+# Finds sweep outputs that look the same, so only one of each needs to
+# be reviewed. Every output is reduced to a signature, a HASH_SIZE by
+# HASH_SIZE grid with a bit set in each cell that has ink in it, packed
+# into bytes. Outputs whose signatures differ in no more than radius bits
+# are taken to be the same.
+#
+# Comparing every pair of signatures doesn't scale to large sweeps, so
+# they're indexed for Hamming search. Signatures are split into radius+1
+# chunks. Two signatures within radius bits of each other must match
+# exactly on at least one chunk, so only those sharing a chunk with a
+# signature need to be compared with it.
+
+from typing import *
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+
+HASH_SIZE = 32
+HASH_BYTES = HASH_SIZE * HASH_SIZE // 8
+# Cells darker than this on average have ink in them. Outputs are black
+# on white, so this is a little under 2% ink
+INK_LEVEL = 250
+DEFAULT_RADIUS = 10
+
+# Number of set bits in each byte
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def signature(img: np.ndarray) -> np.ndarray:
+    if img.ndim == 3:
+        img = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
+    small = cv.resize(img, (HASH_SIZE, HASH_SIZE), interpolation=cv.INTER_AREA)
+    return np.packbits(small < INK_LEVEL)
+
+
+# Signature of an output file. It's decoded at a quarter of its
+# resolution, which is far more than a signature needs
+def load_signature(path: str) -> np.ndarray:
+    img = cv.imread(path, cv.IMREAD_REDUCED_GRAYSCALE_4)
+    if img is None:
+        raise ValueError("Unable to read {}".format(path))
+    return signature(img)
+
+
+# Bits differing between each row of signatures and sig
+def hamming(signatures: np.ndarray, sig: np.ndarray) -> np.ndarray:
+    return POPCOUNT[np.bitwise_xor(signatures, sig)].sum(axis=-1)
+
+
+class HammingIndex:
+    def __init__(self, signatures: np.ndarray, radius: int = DEFAULT_RADIUS):
+        self.signatures = signatures
+        self.radius = radius
+        bits = np.unpackbits(signatures, axis=1)
+
+        # For each chunk, the signatures grouped by their value in it:
+        # rows sharing group ids[i] are members[starts[g] : starts[g + 1]]
+        self._chunks = []
+        for chunk in np.array_split(np.arange(bits.shape[1]), radius + 1):
+            packed = np.ascontiguousarray(np.packbits(bits[:, chunk], axis=1))
+            keys = packed.view("V{}".format(packed.shape[1])).ravel()
+            _, ids = np.unique(keys, return_inverse=True)
+            ids = ids.ravel()
+            members = np.argsort(ids, kind="stable")
+            starts = np.searchsorted(ids[members], np.arange(ids.max() + 2))
+            self._chunks.append((ids, members, starts))
+
+    # Rows within radius of row, including row itself, in row order
+    def neighbours(self, row: int) -> np.ndarray:
+        candidates = np.unique(
+            np.concatenate(
+                [
+                    members[starts[ids[row]] : starts[ids[row] + 1]]
+                    for ids, members, starts in self._chunks
+                ]
+            )
+        )
+        near = hamming(self.signatures[candidates], self.signatures[row])
+        return candidates[near <= self.radius]
+
+
+# Groups signatures into clusters, returning the row of each row's
+# representative. Rows are taken in order, and each not yet in a cluster
+# becomes the representative of a new one holding every other unclustered
+# row within radius of it. Every member is within radius of its
+# representative, so clusters can't drift apart through chains of near
+# matches
+def cluster(signatures: np.ndarray, radius: int = DEFAULT_RADIUS) -> np.ndarray:
+    clusters = np.full(len(signatures), -1, dtype=np.int64)
+    if not len(signatures):
+        return clusters
+    index = HammingIndex(signatures, radius)
+    for row in range(len(signatures)):
+        if clusters[row] >= 0:
+            continue
+        near = index.neighbours(row)
+        clusters[near[clusters[near] < 0]] = row
+    return clusters
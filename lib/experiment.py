@@ -1,64 +1,423 @@
-from image import Image
-from copy import copy
+# Tools for parameter sweeps. Each sample of a sweep is one row of a
+# numpy structured array, with a column per parameter from
+# filter.gen_parameters, plus the score, the time the filter took, and
+# the label given when reviewing the output. Keeping it columnar means
+# the analysis below works on whole columns at once, so even very large
+# sweeps are summarized in a fraction of a second.
+#
+# Run with python -m lib.experiment to review the outputs of a sweep and
+# print a summary of the good ones. Outputs that look the same are
+# clustered first, as described in dedupe, and only one from each
+# cluster is reviewed, its label going to the whole cluster.
 
+import argparse
+import os
+import pickle
+from concurrent.futures import Future, ThreadPoolExecutor
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
 from typing import *
-import random as rand
-
-PointType = Tuple[int, int]
-
-# Transforms a raw image into a black and white version that
-# distinguishes only letter forms. Returns a new image, doesn't mutate
-# the input
-def filter_letterforms(
-        img: Image,
-        *,
-        trans_matrix: List[PointType],
-        blur_kernel: int,
-        adaptive_thresh_block: int,
-        adaptive_c: float,
-        thresh_percent: float,
-        area: int) -> Image:
-    img = copy(img)
-
-    # Apply the transformation to the board portion of the image
-    img.perspective_transform(trans_matrix)
-
-    # Crop a small portion of the border, ensuring that the image only
-    # contains the board, and none of the border
-    img.crop_border(0.02)
-
-    # Resize the image to a predetermined resolution. This will ensure
-    # that selected parameters have the same impact, regardless of the
-    # image resolution we use for input
-    img.scale_min(2000, 2000)
-
-    # Apply an adaptive threshold on the image. If the lighting
-    # differs through the image this does an excellent job
-    img.adaptive_threshold(adaptive_thresh_block, adaptive_c)
-
-    # Blur the image, so that portions of the image that weren't
-    # connected, end up connected together, and are counted as part of
-    # a greater area
-    img.blur(blur_kernel)
-
-    # Apply a threshold, connecting whatever was just blurred
-    img.threshold(thresh_percent)
-
-    # Noise in the image should be leftover from the adaptive
-    # threshold, leaving a bunch of spots. This clears the spots, but
-    # retains the larger letter forms by filtering by the area of a
-    # region.
-    img.area_threshold(area)
-
-    return img
-
-# Returns a generator that yields random parameters for testing
-def gen_parameters() -> Iterator:
-    while True:
-        yield {
-            "blur_kernel": rand.randrange(3, 30, step=2),
-            "adaptive_thresh_block": rand.randrange(3, 30, step=2),
-            "adaptive_c": rand.uniform(0, 5),
-            "thresh_percent": rand.uniform(0, 0.2),
-            "area": rand.randrange(1, 20)
-        }
+from .dedupe import DEFAULT_RADIUS, HASH_BYTES, cluster, load_signature
+from .image import Image
+from .thumbnail import compose_page
+from .window import KEY_LEFT, KEY_RIGHT, KEY_SPACE, X_MAX, Y_MAX, Window
+from .util import WORKERS, atomic_write
+from . import get_window
+
+PROJECT_DIR = "./experiment"
+RESULTS_FILE = PROJECT_DIR + "/results.npy"
+# Where sweeps used to be kept, as a pickled dict of dicts
+INDEX_FILE = PROJECT_DIR + "/index.dat"
+# Labels given during a review, one "id label" line each, so a review
+# that's cut short loses nothing
+LABELS_FILE = PROJECT_DIR + "/labels.log"
+# Signature of every output, so they survive the outputs being pruned
+SIGNATURES_FILE = PROJECT_DIR + "/signatures.npy"
+
+REVIEW_COLS = 6
+REVIEW_ROWS = 4
+
+GOOD_COLOR = (0, 200, 0)
+BAD_COLOR = (0, 0, 200)
+
+# Labels, unreviewed samples are UNLABELLED
+UNLABELLED = -1
+BAD = 0
+GOOD = 1
+
+# One column per parameter, named as filter.gen_parameters names them
+PARAM_COLUMNS = [
+    ("blur_kernel", "i4"),
+    ("adaptive_thresh_block", "i4"),
+    ("adaptive_c", "f8"),
+    ("thresh_percent", "f8"),
+    ("area", "i4"),
+]
+PARAMS = [name for name, _ in PARAM_COLUMNS]
+
+RESULT_DTYPE = np.dtype(
+    [("id", "i8")]
+    + PARAM_COLUMNS
+    + [("score", "f8"), ("seconds", "f8"), ("label", "i1")]
+)
+
+# Keys the old pickled index used for each parameter
+OLD_KEYS = {
+    "blur_kernel_size": "blur_kernel",
+    "adaptive_block_size": "adaptive_thresh_block",
+    "adaptive_C": "adaptive_c",
+    "percent_black": "thresh_percent",
+    "min_area": "area",
+}
+
+
+# An empty table of n samples, unscored and unlabelled
+def new_results(n: int) -> np.ndarray:
+    results = np.zeros(n, dtype=RESULT_DTYPE)
+    results["id"] = np.arange(n)
+    results["score"] = np.nan
+    results["seconds"] = np.nan
+    results["label"] = UNLABELLED
+    return results
+
+
+# Builds a table from dicts holding the parameters, and optionally id,
+# score, seconds and label
+def from_records(records: List[Dict[str, Any]]) -> np.ndarray:
+    results = new_results(len(records))
+    for name in RESULT_DTYPE.names:
+        if records and name in records[0]:
+            results[name] = [r[name] for r in records]
+    return results
+
+
+def save_results(path: str, results: np.ndarray):
+    with atomic_write(path) as tmp:
+        np.save(tmp, results)
+
+
+def load_results(path: str = RESULTS_FILE) -> np.ndarray:
+    return np.load(path)
+
+
+# Converts the old pickled index. Old runs appended a second pickle to
+# the file rather than replacing it, so the last one is the latest
+def migrate_index(path: str = INDEX_FILE) -> np.ndarray:
+    data_map = None
+    with open(path, "rb") as f:
+        while True:
+            try:
+                data_map = pickle.load(f)
+            except EOFError:
+                break
+
+    records = []
+    for i, data in sorted((data_map or {}).items()):
+        record = {OLD_KEYS.get(k, k): v for k, v in data["params"].items()}
+        record["id"] = i
+        if "good_image" in data:
+            record["label"] = GOOD if data["good_image"] else BAD
+        records.append(record)
+    return from_records(records)
+
+
+SIGNATURE_DTYPE = np.dtype([("id", "i8"), ("signature", "u1", (HASH_BYTES,))])
+
+
+# Signatures of the outputs of results, in the same order. Signatures
+# already saved in path are reused, and the rest are computed from the
+# outputs in folder and saved along with them
+def load_signatures(
+    results: np.ndarray, folder: str = PROJECT_DIR, path: str = SIGNATURES_FILE
+) -> np.ndarray:
+    known = np.zeros(0, dtype=SIGNATURE_DTYPE)
+    if os.path.exists(path):
+        known = np.load(path)
+    known = known[np.argsort(known["id"])]
+
+    found = np.isin(results["id"], known["id"])
+    rows = np.searchsorted(known["id"], results["id"][found])
+    signatures = np.zeros((len(results), HASH_BYTES), dtype=np.uint8)
+    signatures[found] = known["signature"][rows]
+
+    missing = np.flatnonzero(~found)
+    if not len(missing):
+        return signatures
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        paths = ["{}/out_{}.png".format(folder, results["id"][row]) for row in missing]
+        signatures[missing] = list(pool.map(load_signature, paths))
+
+    table = np.zeros(len(results), dtype=SIGNATURE_DTYPE)
+    table["id"] = results["id"]
+    table["signature"] = signatures
+    table = np.concatenate([known[~np.isin(known["id"], table["id"])], table])
+    with atomic_write(path) as tmp:
+        np.save(tmp, table)
+    return signatures
+
+
+# Deletes the output of every sample that isn't its cluster's
+# representative, returning how many were deleted
+def prune_outputs(
+    results: np.ndarray, clusters: np.ndarray, folder: str = PROJECT_DIR
+) -> int:
+    removed = 0
+    for row in np.flatnonzero(clusters != np.arange(len(clusters))):
+        path = "{}/out_{}.png".format(folder, results["id"][row])
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+# Appends labels to the log as they're given
+class LabelLog:
+    def __init__(self, path: str = LABELS_FILE):
+        self._f = open(path, "a")
+
+    def write(self, sample: int, label: int):
+        self._f.write("{} {}\n".format(sample, label))
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+# Replays a label log onto results, later lines winning. Results are
+# expected in id order, as new_results and migrate_index make them
+def apply_labels(results: np.ndarray, path: str = LABELS_FILE):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    log = np.loadtxt(path, dtype="i8", ndmin=2)
+    rows = np.searchsorted(results["id"], log[:, 0])
+    results["label"][rows] = log[:, 1]
+
+
+# Decodes an output at a quarter of its resolution, which is much faster
+# than decoding it all, and is still more than a cell needs
+def load_review_thumb(path: str, cell_x: int, cell_y: int) -> np.ndarray:
+    img = cv.imread(path, cv.IMREAD_REDUCED_COLOR_4)
+    if img is None:
+        raise ValueError("Unable to read {}".format(path))
+    thumb = Image(img)
+    thumb.scale_bounded(cell_x, cell_y)
+    return thumb.img
+
+
+# Outlines each cell in the colour of its label
+def draw_labels(canvas: np.ndarray, labels: List[int], cols: int, rows: int):
+    cell_x, cell_y = X_MAX // cols, Y_MAX // rows
+    for slot, label in enumerate(labels):
+        if label == UNLABELLED:
+            continue
+        x, y = (slot % cols) * cell_x, (slot // cols) * cell_y
+        color = GOOD_COLOR if label == GOOD else BAD_COLOR
+        cv.rectangle(canvas, (x + 2, y + 2), (x + cell_x - 3, y + cell_y - 3), color, 4)
+
+
+# Shows the outputs a page at a time in a grid. Clicking a cell toggles
+# it between good and bad, g marks the whole page good, and moving on to
+# the next page marks whatever is left unlabelled as bad. Thumbnails are
+# decoded in a thread pool, with the next pages loading while the
+# current one is reviewed. Only unlabelled samples are shown, so a
+# review picks up where the last one stopped. Given clusters, the row of
+# each row's representative as dedupe.cluster gives them, only
+# representatives are shown, and each label is given to the whole
+# cluster
+def collect_data(
+    results: np.ndarray,
+    log: LabelLog,
+    win: Optional[Window] = None,
+    folder: str = PROJECT_DIR,
+    cols: int = REVIEW_COLS,
+    rows: int = REVIEW_ROWS,
+    clusters: Optional[np.ndarray] = None,
+):
+    shown = results["label"] == UNLABELLED
+    if clusters is not None:
+        shown &= clusters == np.arange(len(results))
+    todo = np.flatnonzero(shown)
+    per_page = cols * rows
+    pages = -(-len(todo) // per_page)
+    if not pages:
+        return
+    cell_x, cell_y = X_MAX // cols, Y_MAX // rows
+    pool = ThreadPoolExecutor(max_workers=WORKERS)
+
+    # Pages that are loading or loaded. Only those near the current page
+    # are kept, so memory stays bounded however long the sweep is
+    loaded: Dict[int, List[Future]] = {}
+
+    def request(page: int) -> List[Future]:
+        if page not in loaded:
+            loaded[page] = [
+                pool.submit(
+                    load_review_thumb,
+                    "{}/out_{}.png".format(folder, results["id"][row]),
+                    cell_x,
+                    cell_y,
+                )
+                for row in todo[page * per_page : (page + 1) * per_page]
+            ]
+        return loaded[page]
+
+    page = 0
+
+    def page_rows() -> np.ndarray:
+        return todo[page * per_page : (page + 1) * per_page]
+
+    def draw():
+        thumbs = [
+            (int(results["id"][row]), fut.result())
+            for row, fut in zip(page_rows(), request(page))
+        ]
+        canvas = compose_page(thumbs, cols, rows)
+        draw_labels(canvas, list(results["label"][page_rows()]), cols, rows)
+        win.show(Image(canvas))
+
+    def label(row: int, value: int):
+        members = [row] if clusters is None else np.flatnonzero(clusters == row)
+        for member in members:
+            results["label"][member] = value
+            log.write(int(results["id"][member]), value)
+
+    async def clicker():
+        while True:
+            x, y = await win.click()
+            slot = (y // cell_y) * cols + x // cell_x
+            if x < cell_x * cols and slot < len(page_rows()):
+                row = page_rows()[slot]
+                label(row, BAD if results["label"][row] == GOOD else GOOD)
+                draw()
+
+    async def pager():
+        nonlocal page
+        while True:
+            draw()
+            for near in (page + 1, page + 2, page - 1):
+                if 0 <= near < pages:
+                    request(near)
+            for far in [p for p in loaded if abs(p - page) > 2]:
+                del loaded[far]
+
+            k = await win.keypress()
+            if k in (KEY_RIGHT, KEY_SPACE, "n"):
+                for row in page_rows():
+                    if results["label"][row] == UNLABELLED:
+                        label(row, BAD)
+                if page == pages - 1:
+                    return
+                page += 1
+            elif k in (KEY_LEFT, "p"):
+                page = max(page - 1, 0)
+            elif k == "g":
+                for row in page_rows():
+                    label(row, GOOD)
+
+    if win is None:
+        win = get_window()
+    win.run(pager(), [clicker()])
+    pool.shutdown(wait=False)
+
+
+# Mean of each parameter over the samples labelled good
+def summarize_stats(results: np.ndarray) -> Dict[str, float]:
+    good = results[results["label"] == GOOD]
+    if not len(good):
+        raise ValueError("No samples are labelled good")
+    return {name: float(good[name].mean()) for name in PARAMS}
+
+
+# Mean of column for each distinct value of by. Rows where column is
+# nan, or unlabelled when it's the label, are left out
+def grouped_mean(
+    results: np.ndarray, by: str, column: str = "label"
+) -> Tuple[np.ndarray, np.ndarray]:
+    results = _known(results, column)
+    keys, inverse = np.unique(results[by], return_inverse=True)
+    totals = np.bincount(inverse, weights=results[column].astype("f8"))
+    counts = np.bincount(inverse)
+    return keys, totals / counts
+
+
+def quantiles(
+    results: np.ndarray, column: str, qs: Sequence[float] = (0.05, 0.5, 0.95)
+) -> np.ndarray:
+    return np.quantile(_known(results, column)[column], qs)
+
+
+# How column changes as one parameter varies. The parameter is split
+# into bins holding about the same number of samples, and the mean of
+# column is given for each. Returns the bin edges and the means
+def marginal_effect(
+    results: np.ndarray, param: str, column: str = "label", bins: int = 10
+) -> Tuple[np.ndarray, np.ndarray]:
+    results = _known(results, column)
+    values = results[param].astype("f8")
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)))
+    which = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+    totals = np.bincount(
+        which, weights=results[column].astype("f8"), minlength=len(edges) - 1
+    )
+    counts = np.bincount(which, minlength=len(edges) - 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return edges, totals / counts
+
+
+# Correlation of each parameter with column
+def correlations(results: np.ndarray, column: str = "label") -> Dict[str, float]:
+    results = _known(results, column)
+    outcome = results[column].astype("f8")
+    params = np.stack([results[name].astype("f8") for name in PARAMS])
+    matrix = np.corrcoef(np.vstack([params, outcome]))
+    return {name: float(matrix[i, -1]) for i, name in enumerate(PARAMS)}
+
+
+def _known(results: np.ndarray, column: str) -> np.ndarray:
+    if column == "label":
+        return results[results["label"] != UNLABELLED]
+    return results[~np.isnan(results[column])]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("sweep review")
+    parser.add_argument(
+        "--radius",
+        type=int,
+        default=DEFAULT_RADIUS,
+        help="Bits signatures may differ by and still be the same output",
+    )
+    parser.add_argument("--no-dedupe", action="store_true", help="Review every output")
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Delete the outputs of all but one sample of each cluster",
+    )
+    args = parser.parse_args()
+
+    if os.path.exists(RESULTS_FILE):
+        results = load_results()
+    else:
+        results = migrate_index()
+    apply_labels(results)
+
+    clusters = None
+    if not args.no_dedupe:
+        clusters = cluster(load_signatures(results), args.radius)
+        distinct = np.count_nonzero(clusters == np.arange(len(results)))
+        print("{} outputs, {} distinct".format(len(results), distinct))
+        if args.prune:
+            print(
+                "Deleted {} duplicate outputs".format(prune_outputs(results, clusters))
+            )
+
+    log = LabelLog()
+    collect_data(results, log, clusters=clusters)
+    log.close()
+
+    # Every label is in the results now, so the log can start afresh
+    save_results(RESULTS_FILE, results)
+    os.remove(LABELS_FILE)
+
+    print(summarize_stats(results))
+    print(correlations(results))
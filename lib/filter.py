@@ -1,53 +1,353 @@
-import cv2 as cv
-import numpy as np
-import pickle
+from .image import Image
+from .warp_cache import WarpCache
+from . import instrument
+from .presets import PRESETS
+from copy import copy
 
-PROJECT_DIR = "./experiment"
-INDEX_FILE = PROJECT_DIR + "/index.dat"
-SPACE_KEY = 32
+from typing import *
+import math
+import random as rand
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
 
+PointType = Tuple[int, int]
 
-def collect_data(data_map):
-    for i, data in data_map.items():
-        img = cv.imread("{}/out_{}.png".format(PROJECT_DIR, i))
-        cv.imshow("File", cv.resize(img, (500, 1000)))
-        key = cv.waitKey()
-        data["good_image"] = key == SPACE_KEY  # Pressing space marks it as
-        # a legible good image
+# Fraction of the board trimmed from each edge, and the size the
+# shorter side is scaled to, by rectify
+CROP_BORDER = 0.02
+RECTIFIED_MIN = 2000
 
+# Side of the tiles checked for ink before filtering
+INK_TILE = 32
+# Above this fraction of tiles with ink, the whole board is filtered
+INK_MAX = 0.5
+# Blur standing in for the smoothing that scaling up to the reference
+# resolution gives, see rectify_native
+UPSCALE_SIGMA = 0.6
 
-def summarize_stats(data_map):
-    quality_params = [
-        data["params"] for data in data_map.values() if data["good_image"]
-    ]
+# Transforms a raw image into a black and white version that
+# distinguishes only letter forms. Returns a new image, doesn't mutate
+# the input.
+#
+# The parameters are in reference pixels, pixels of the board once its
+# shorter side is RECTIFIED_MIN long, so they mean the same whatever the
+# resolution of the photo. By default the board is scaled to that
+# reference resolution. With native, it's left at the resolution it
+# was photographed at, or scaled down so its longer side is no more
+# than max_side, and the parameters are converted to its pixels
+# instead. Most boards are photographed smaller than the reference, so
+# this filters far fewer pixels, with nearly the same result
+def filter_letterforms(
+        img: Image,
+        *,
+        trans_matrix: List[PointType],
+        blur_kernel: int,
+        adaptive_thresh_block: int,
+        adaptive_c: float,
+        thresh_percent: float,
+        area: int,
+        native: bool = False,
+        max_side: Optional[int] = None) -> Image:
+    params = {
+        "blur_kernel": blur_kernel,
+        "adaptive_thresh_block": adaptive_thresh_block,
+        "adaptive_c": adaptive_c,
+        "thresh_percent": thresh_percent,
+        "area": area,
+    }
+    img, params = rectify_params(
+        img, trans_matrix, with_resolution(params, native, max_side))
+    letterforms(img, **params)
+    return img
 
-    keys = [
-        "adaptive_block_size",
-        "adaptive_C",
-        "min_area",
-        "blur_kernel_size",
-        "percent_black",
-    ]
+# Adds the options that choose the resolution a board is filtered at,
+# see filter_letterforms, to params. max_side only applies to native
+# resolution, so it's refused without it rather than quietly ignored
+def with_resolution(
+        params: Dict[str, Any],
+        native: bool,
+        max_side: Optional[int]) -> Dict[str, Any]:
+    if max_side is not None and not native:
+        raise ValueError("max_side only applies to native resolution")
+    params = dict(params)
+    if native:
+        params.update(native=True, max_side=max_side)
+    return params
+
+# Rectifies a board as filter_letterforms would, given params that may
+# include the options from with_resolution. Returns the board, and the
+# parameters for letterforms converted to its pixels. Returns a new
+# image, doesn't mutate the input
+def rectify_params(
+        img: Image,
+        trans_matrix: List[PointType],
+        params: Dict[str, Any],
+        warps: Optional[WarpCache] = None) -> Tuple[Image, Dict[str, Any]]:
+    img, factor = rectify_resolution(img, trans_matrix, params, warps)
+    return img, board_params(params, factor)
+
+# The board half of rectify_params. Returns the board at the resolution
+# the options in params choose, and its scale relative to the reference
+# resolution. The board is the same for any filter parameters, so it
+# can be kept and filtered again with others
+def rectify_resolution(
+        img: Image,
+        trans_matrix: List[PointType],
+        params: Dict[str, Any],
+        warps: Optional[WarpCache] = None) -> Tuple[Image, float]:
+    if not params.get("native", False):
+        return rectify(img, trans_matrix, warps), 1.0
+    return rectify_native(
+        img, trans_matrix, params.get("max_side"), warps)
+
+# The parameters half of rectify_params. Returns the parameters for
+# letterforms, converted to the pixels of a board rectified at factor
+def board_params(params: Dict[str, Any], factor: float) -> Dict[str, Any]:
+    params = dict(params)
+    native = params.pop("native", False)
+    params.pop("max_side", None)
+    return scale_params(params, factor) if native else params
+
+# The first half of filter_letterforms. Produces a grayscale image of
+# just the board, at the resolution the parameters are tuned for.
+# Returns a new image, doesn't mutate the input. warps is passed on to
+# perspective_transform
+def rectify(
+        img: Image,
+        trans_matrix: List[PointType],
+        warps: Optional[WarpCache] = None) -> Image:
+    img = _board(img, trans_matrix, warps)
+
+    # Resize the image to a predetermined resolution. This will ensure
+    # that selected parameters have the same impact, regardless of the
+    # image resolution we use for input
+    img.scale_min(RECTIFIED_MIN, RECTIFIED_MIN)
+
+    return img
+
+# Like rectify, but leaves the board at the resolution it was
+# photographed at, unless its longer side is over max_side. Returns the
+# board, and its scale relative to the reference resolution rectify
+# gives, for converting parameters with scale_params.
+#
+# Scaling a board up to the reference resolution interpolates between
+# its pixels, which evens out sensor noise the adaptive threshold would
+# otherwise pick up as specks. A board smaller than the reference is
+# blurred slightly to match
+def rectify_native(
+        img: Image,
+        trans_matrix: List[PointType],
+        max_side: Optional[int] = None,
+        warps: Optional[WarpCache] = None) -> Tuple[Image, float]:
+    img = _board(img, trans_matrix, warps)
+    if max_side and max(img.x_res, img.y_res) > max_side:
+        img.scale_bounded(max_side, max_side)
+
+    factor = min(img.x_res, img.y_res) / RECTIFIED_MIN
+    if factor < 1:
+        img.img = cv.GaussianBlur(img.img, (0, 0), UPSCALE_SIGMA)
+    return img, factor
+
+# The board alone, in grayscale, at the resolution it was photographed
+def _board(
+        img: Image,
+        trans_matrix: List[PointType],
+        warps: Optional[WarpCache] = None) -> Image:
+    img = copy(img)
+
+    # Apply the transformation to the board portion of the image
+    img.perspective_transform(trans_matrix, warps)
+
+    # Crop a small portion of the border, ensuring that the image only
+    # contains the board, and none of the border
+    img.crop_border(CROP_BORDER)
+
+    # The thresholds below only work on a single channel
+    img.grayscale()
 
-    means = {}
+    return img
+
+# Rounds to the nearest whole size, halves up, then up to an odd size if
+# that's even, as kernels have to have a middle pixel. Never below 3
+def nearest_odd(n: float) -> int:
+    whole = math.floor(n + 0.5)
+    return max(3, whole if whole % 2 else whole + 1)
+
+# Adjusts parameters measured in pixels so they have the same effect on
+# an image scaled by factor. Areas scale with the square of it
+def scale_params(params: Dict[str, Any], factor: float) -> Dict[str, Any]:
+    scaled = dict(params)
+    scaled["blur_kernel"] = nearest_odd(params["blur_kernel"] * factor)
+    scaled["adaptive_thresh_block"] = nearest_odd(
+        params["adaptive_thresh_block"] * factor)
+    scaled["area"] = max(1, round(params["area"] * factor * factor))
+    return scaled
+
+# How far the filter reaches past a pixel. The adaptive threshold and
+# blur look half their size out, and any component smaller than area
+# fits within area pixels of it
+def halo(params: Dict[str, Any]) -> int:
+    return (
+        params["adaptive_thresh_block"] // 2
+        + params["blur_kernel"] // 2
+        + params["area"])
+
+# Finds the tiles of a grayscale image that might have ink in them, as a
+# boolean array with one entry per tile. The rest are known to come out
+# of the filter white.
+#
+# The adaptive threshold leaves a pixel white unless it's more than
+# adaptive_c below the weighted mean of the block around it, which can't
+# happen where the block varies by less than adaptive_c. So a tile comes
+# out white if everything within reach of the threshold and blur varies
+# by less than that. Everything after the
+# adaptive threshold keeps white areas white, unless thresh_percent is so
+# small the threshold turns everything black. Returns None when no tile
+# can be skipped
+def ink_tiles(
+        gray: np.ndarray,
+        *,
+        blur_kernel: int,
+        adaptive_thresh_block: int,
+        adaptive_c: float,
+        thresh_percent: float,
+        tile: int = INK_TILE) -> Optional[np.ndarray]:
+    # Matches how the adaptive threshold and threshold round
+    level = math.ceil(adaptive_c)
+    if level < 1 or int(thresh_percent * 255) < 1:
+        return None
+
+    rows, cols = -(-gray.shape[0] // tile), -(-gray.shape[1] // tile)
+    padded = np.pad(
+        gray,
+        ((0, rows * tile - gray.shape[0]), (0, cols * tile - gray.shape[1])),
+        mode="edge")
+    blocks = padded.reshape(rows, tile, cols, tile)
+
+    # The darkest and lightest the image gets within reach of each tile
+    reach = math.ceil((adaptive_thresh_block // 2 + blur_kernel // 2) / tile)
+    near = np.ones((reach * 2 + 1, reach * 2 + 1), np.uint8)
+    darkest = cv.erode(
+        blocks.min(axis=(1, 3)), near, borderType=cv.BORDER_REPLICATE)
+    lightest = cv.dilate(
+        blocks.max(axis=(1, 3)), near, borderType=cv.BORDER_REPLICATE)
+    return lightest.astype(np.int16) - darkest >= level
+
+# Finds the tiles of a binary image with any black in them, as a boolean
+# array with one entry per tile
+def black_tiles(binary: np.ndarray, tile: int = INK_TILE) -> np.ndarray:
+    rows, cols = -(-binary.shape[0] // tile), -(-binary.shape[1] // tile)
+    padded = np.pad(
+        binary,
+        ((0, rows * tile - binary.shape[0]), (0, cols * tile - binary.shape[1])),
+        mode="edge")
+    return padded.reshape(rows, tile, cols, tile).min(axis=(1, 3)) == 0
+
+# Runs stage over only the tiles of img that are set, filling the rest in
+# white. Each group of touching tiles is run with margin pixels around
+# it, which must be as far as stage reaches past a pixel, so the result
+# is the same as running stage over all of img
+def _by_tiles(
+        img: Image,
+        tiles: np.ndarray,
+        margin: int,
+        stage: Callable[[Image], None]):
+    gray = img.img
+    height, width = gray.shape
+    out = np.full_like(gray, 255)
+
+    n, _, stats, _ = cv.connectedComponentsWithStats(tiles.astype(np.uint8))
+    # Label 0 is the tiles that aren't set
+    for k in range(1, n):
+        col, row, cols, rows = stats[k, :4]
+        y0, x0 = row * INK_TILE, col * INK_TILE
+        y1 = min((row + rows) * INK_TILE, height)
+        x1 = min((col + cols) * INK_TILE, width)
+        hy0, hx0 = max(y0 - margin, 0), max(x0 - margin, 0)
+        hy1, hx1 = min(y1 + margin, height), min(x1 + margin, width)
+
+        crop = Image(gray[hy0:hy1, hx0:hx1])
+        stage(crop)
+        out[y0:y1, x0:x1] = crop.img[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+    img.img = out
+
+# The second half of filter_letterforms. Takes a rectified image and
+# reduces it to the letter forms, mutating the image.
+#
+# Boards are mostly empty, so unless roi is False, each stage only runs
+# where it can make a difference. The thresholds run over the tiles that
+# ink_tiles finds, and the area threshold, by far the slowest stage, over
+# the tiles that are left with any black in them. Everywhere else is
+# known to come out white, and the result is the same as running every
+# stage over the whole board. Each stage is recorded as one operation by
+# an active instrument.Recorder, however many tiles it ran over
+def letterforms(
+        img: Image,
+        *,
+        blur_kernel: int,
+        adaptive_thresh_block: int,
+        adaptive_c: float,
+        thresh_percent: float,
+        area: int,
+        roi: bool = True):
+    stages = [
+        # Apply an adaptive threshold on the image. If the lighting
+        # differs through the image this does an excellent job
+        ("adaptive_threshold", adaptive_thresh_block // 2,
+         lambda img: img.adaptive_threshold(adaptive_thresh_block, adaptive_c)),
+
+        # Blur the image, so that portions of the image that weren't
+        # connected, end up connected together, and are counted as part
+        # of a greater area
+        ("blur", blur_kernel // 2, lambda img: img.blur(blur_kernel)),
+
+        # Apply a threshold, connecting whatever was just blurred
+        ("threshold", 0, lambda img: img.threshold(thresh_percent)),
+    ]
 
-    for k in keys:
-        total = 0
-        n = 0
-        # find the mean statistic
-        for params in quality_params:
-            n += 1
-            total += params[k]
-        means[k] = total / n
+    # Noise in the image should be leftover from the adaptive
+    # threshold, leaving a bunch of spots. This clears the spots, but
+    # retains the larger letter forms by filtering by the area of a
+    # region. Any component smaller than area fits within area pixels
+    # of where it starts
+    def area_threshold(img: Image):
+        img.area_threshold(area)
 
-    return means
+    if not roi or not img.is_gray():
+        for _, _, run in stages:
+            run(img)
+        area_threshold(img)
+        return
 
+    ink = ink_tiles(
+        img.img,
+        blur_kernel=blur_kernel,
+        adaptive_thresh_block=adaptive_thresh_block,
+        adaptive_c=adaptive_c,
+        thresh_percent=thresh_percent)
+    for name, reach, run in stages:
+        if ink is None or ink.mean() > INK_MAX:
+            run(img)
+        else:
+            # Tiles outside ink stay white through every stage, so each
+            # only needs its own reach around the ink
+            with instrument.stage(name, img):
+                _by_tiles(img, ink, reach, run)
 
-if __name__ == "__main__":
-    with open(INDEX_FILE, "r+b") as idx_file:
-        data_map = pickle.load(idx_file)
-        collect_data(data_map)
-        # Write the data back out, the data map passed in is mutated
-        pickle.dump(data_map, idx_file)
+    black = black_tiles(img.img)
+    if black.mean() > INK_MAX:
+        area_threshold(img)
+    else:
+        with instrument.stage("area_threshold", img):
+            _by_tiles(img, black, area, area_threshold)
 
-    print(summarize_stats(data_map))
+# Returns a generator that yields random parameters for testing
+def gen_parameters() -> Iterator:
+    while True:
+        yield {
+            "blur_kernel": rand.randrange(3, 30, step=2),
+            "adaptive_thresh_block": rand.randrange(3, 30, step=2),
+            "adaptive_c": rand.uniform(0, 5),
+            "thresh_percent": rand.uniform(0, 0.2),
+            "area": rand.randrange(1, 20)
+        }
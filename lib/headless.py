@@ -0,0 +1,170 @@
+# A Window backend that needs no display. Instead of a user it replays
+# a script of timed clicks and keys, and records every frame shown, so
+# the interactive commands can be tested and timed on a headless box.
+#
+# A script is a list of events, each with the number of seconds after
+# the start that it fires:
+#   {"t": 0.5, "type": "click", "x": 10, "y": 20}
+#   {"t": 1.0, "type": "key", "key": 10}
+#   {"t": 1.5, "type": "trackbar", "name": "Area", "value": 40}
+#   {"t": 2.0, "type": "wheel", "x": 10, "y": 20, "delta": 120}
+#   {"t": 2.5, "type": "drag", "x0": 10, "y0": 20, "x": 50, "y": 60}
+# Keys may also be given as single characters, e.g. {"key": "q"}.
+
+import cv2 as cv  # type: ignore
+import json
+import time
+import numpy as np  # type: ignore
+from pathlib import Path
+from typing import *
+
+EventType = Dict[str, Any]
+
+# Once the script runs out the backend presses q after this many
+# seconds, so a replay always ends
+QUIT_AFTER = 1.0
+
+
+def load_script(path: Path) -> List[EventType]:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    return float(np.percentile(values, p))
+
+
+class HeadlessBackend:
+    def __init__(
+        self,
+        script: List[EventType],
+        keep_frames: bool = False,
+        quit_after: float = QUIT_AFTER,
+    ):
+        self._script = sorted(script, key=lambda e: e["t"])
+        self._next = 0
+        self._callback: Optional[Callable] = None
+        # Current value, maximum and callback of each trackbar
+        self.trackbars: Dict[str, List[Any]] = {}
+        self._quit_after = quit_after
+        self._keep_frames = keep_frames
+        self._start = time.perf_counter()
+
+        # Every frame shown as (seconds since start, shape), plus the
+        # frames themselves if asked to keep them
+        self.frames: List[Tuple[float, Tuple[int, ...]]] = []
+        self.images: List[np.ndarray] = []
+        self.last_frame: Optional[np.ndarray] = None
+
+        # Events that have fired, but have no frame shown since
+        self._waiting: List[EventType] = []
+        # For each event, the seconds from when it was scripted to fire
+        # until the next frame was shown
+        self.latencies: List[Tuple[EventType, float]] = []
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._start
+
+    def create(self, name: str):
+        pass
+
+    def set_mouse_callback(self, name: str, callback: Callable):
+        self._callback = callback
+
+    def create_trackbar(
+        self, name: str, window: str, value: int, maximum: int, callback: Callable
+    ):
+        self.trackbars[name] = [value, maximum, callback]
+
+    def imshow(self, name: str, img: np.ndarray):
+        now = self._now()
+        self.frames.append((now, img.shape))
+        self.last_frame = img
+        if self._keep_frames:
+            self.images.append(img.copy())
+
+        for event in self._waiting:
+            self.latencies.append((event, now - event["t"]))
+        self._waiting.clear()
+
+    # Fires every scripted event that is due. Clicks and trackbar moves
+    # go straight to their callbacks, the first due key is returned as
+    # waitKey would
+    def _dispatch(self) -> int:
+        now = self._now()
+        while self._next < len(self._script) and self._script[self._next]["t"] <= now:
+            event = self._script[self._next]
+            self._next += 1
+            self._waiting.append(event)
+
+            if event["type"] == "click":
+                if self._callback:
+                    x, y = event["x"], event["y"]
+                    self._callback(cv.EVENT_LBUTTONDOWN, x, y, 0, None)
+                    self._callback(cv.EVENT_LBUTTONUP, x, y, 0, None)
+            elif event["type"] == "wheel":
+                if self._callback:
+                    # Like OpenCV, the delta is in the upper 16 bits
+                    flags = event["delta"] << 16
+                    self._callback(
+                        cv.EVENT_MOUSEWHEEL, event["x"], event["y"], flags, None
+                    )
+            elif event["type"] == "drag":
+                if self._callback:
+                    held = cv.EVENT_FLAG_LBUTTON
+                    x0, y0, x, y = event["x0"], event["y0"], event["x"], event["y"]
+                    self._callback(cv.EVENT_LBUTTONDOWN, x0, y0, held, None)
+                    self._callback(cv.EVENT_MOUSEMOVE, x, y, held, None)
+                    self._callback(cv.EVENT_LBUTTONUP, x, y, 0, None)
+            elif event["type"] == "trackbar":
+                bar = self.trackbars[event["name"]]
+                bar[0] = min(max(event["value"], 0), bar[1])
+                bar[2](bar[0])
+            elif event["type"] == "key":
+                key = event["key"]
+                return ord(key) if isinstance(key, str) else key
+
+        if self._next >= len(self._script):
+            last = self._script[-1]["t"] if self._script else 0
+            if now - last >= self._quit_after:
+                return ord("q")
+
+        return -1
+
+    # Sleeps like waitKey would, but wakes early for the next event. A
+    # negative delay waits until there is a key
+    def wait_key(self, delay: int) -> int:
+        deadline = None if delay <= 0 else self._now() + delay / 1000
+
+        while True:
+            key = self._dispatch()
+            if key != -1:
+                return key
+
+            now = self._now()
+            if deadline is not None and now >= deadline:
+                return -1
+
+            if self._next < len(self._script):
+                wake = self._script[self._next]["t"]
+            else:
+                wake = (self._script[-1]["t"] if self._script else 0) + self._quit_after
+            if deadline is not None:
+                wake = min(wake, deadline)
+            time.sleep(max(0.0, wake - now))
+
+    # Latency statistics, in milliseconds, per type of event
+    def report(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {"frames": len(self.frames)}
+        kinds = sorted({e["type"] for e, _ in self.latencies})
+        for kind in kinds:
+            ms = [lat * 1000 for e, lat in self.latencies if e["type"] == kind]
+            summary[kind] = {
+                "count": len(ms),
+                "p50": percentile(ms, 50),
+                "p95": percentile(ms, 95),
+                "max": max(ms),
+            }
+        return summary
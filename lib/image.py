@@ -2,7 +2,8 @@ import cv2 as cv  # type: ignore
 import numpy as np  # type: ignore
 from pathlib import Path
 from copy import copy
-from typing import Dict, List, Set, Tuple, Any, Union
+from typing import Dict, List, Set, Tuple, Any, Optional, Union
+from .warp_cache import WarpCache, perspective_matrix
 
 DEFAULT_COLOR = (192, 36, 27)
 
@@ -107,34 +108,16 @@ class Image:
             self.img[y_offset : y_offset + y_size, x_offset : x_offset + x_size]
         )
 
-    # Returns an image that's projected from the 4 given points
-    def perspective_transform(self, points: List[PointType]):
-        if len(points) != 4:
-            raise ValueError("Exactly 4 points must be provided")
-        for x, y in points:
-            if type(x) != int or type(y) != int:
-                raise ValueError("Non integer value passed as point")
-
-        top_left = points[0]
-        top_right = points[1]
-        bottom_right = points[2]
-        bottom_left = points[3]
-
-        source = np.array(
-            [top_left, top_right, bottom_right, bottom_left], dtype="float32"
-        )
-        maxW = max(top_right[0] - top_left[0], bottom_right[0] - bottom_left[0])
-        maxH = max(bottom_right[1] - top_right[1], bottom_left[1] - top_left[1])
-        # This determines the output size we want to map onto. It's not
-        # perfect, but it's good enough to get the general shape of what
-        # was captured
-        dest = np.array(
-            [(0, 0), (maxW - 1, 0), (maxW - 1, maxH - 1), (0, maxH - 1)],
-            dtype="float32",
-        )
-        transM = cv.getPerspectiveTransform(source, dest)
-
-        self.img = cv.warpPerspective(self.img, transM, (maxW, maxH))
+    # Returns an image that's projected from the 4 given points. Callers
+    # that project the same photo again and again can pass a WarpCache
+    def perspective_transform(
+        self, points: List[PointType], warps: Optional[WarpCache] = None
+    ):
+        if warps:
+            self.img = warps.warp(self.img, points)
+        else:
+            transM, size = perspective_matrix(points)
+            self.img = cv.warpPerspective(self.img, transM, size)
 
     def adaptive_threshold(self, block_size: int, c: float):
         if block_size % 2 != 1 or block_size <= 1:
@@ -209,7 +192,8 @@ class Image:
     def save(self, path: Path):
         f = open(path, "wb")
         f.close()
-        cv.imwrite(self, self.img, str(path.resolve()))
+        if not cv.imwrite(str(path.resolve()), self.img):
+            raise ValueError("Unable to encode image to {}".format(path))
 
     def scale(self, factor: Union[float, int]):
         if factor <= 0:
@@ -0,0 +1,197 @@
+# Opt in timing of the Image operations that make up the letterform
+# filter. While a Recorder is active, each operation records its wall
+# and CPU time, the shape and dtype going in and coming out, and
+# optionally how many bytes it allocated. When no Recorder is active the
+# Image methods are the plain originals, so there's no cost at all.
+#
+#   with Recorder(open("stages.jsonl", "w")) as rec:
+#       filter_letterforms(img, trans_matrix=points, **params)
+#   print(summarize(rec.events))
+#
+# Operations called from inside another one, e.g. bgr_color from
+# watermark, count towards the outer operation only. Code that runs a
+# stage as many smaller operations, like the letterform filter does
+# over tiles, wraps them in stage() so they're recorded as one.
+
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from typing import *
+import numpy as np  # type: ignore
+from .image import Image
+
+EventType = Dict[str, Any]
+
+# The Image methods that are timed
+STAGES = [
+    "perspective_transform",
+    "crop_border",
+    "grayscale",
+    "bgr_color",
+    "scale",
+    "scale_bounded",
+    "scale_min",
+    "adaptive_threshold",
+    "blur",
+    "threshold",
+    "area_threshold",
+    "watermark",
+]
+
+
+def _describe(arr: np.ndarray) -> Tuple[List[int], str]:
+    return list(arr.shape), str(arr.dtype)
+
+
+# The Recorder that's active, if any
+_active: Optional["Recorder"] = None
+
+
+# Records everything done to img inside the block as one event of the
+# given stage. Does nothing when no Recorder is active
+@contextmanager
+def stage(name: str, img: Image) -> Iterator[None]:
+    if _active is None:
+        yield
+    else:
+        with _active.measure(name, img):
+            yield
+
+
+class Recorder:
+    # Events are kept in memory, and also written as JSON lines to out
+    # if given. Measuring allocations uses tracemalloc, which slows
+    # everything down a little, so it's only done when asked for
+    def __init__(self, out: Optional[TextIO] = None, memory: bool = False):
+        self.out = out
+        self.memory = memory
+        self.events: List[EventType] = []
+        self._originals: Dict[str, Callable] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __enter__(self) -> "Recorder":
+        global _active
+        if any(hasattr(getattr(Image, s), "__recorder__") for s in STAGES):
+            raise RuntimeError("Only one Recorder can be active at a time")
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        else:
+            self._started_tracing = False
+
+        for name in STAGES:
+            original = getattr(Image, name)
+            self._originals[name] = original
+            setattr(Image, name, self._wrap(name, original))
+        _active = self
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        _active = None
+        for name, original in self._originals.items():
+            setattr(Image, name, original)
+        self._originals.clear()
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    # Records the block as one event, unless it's inside another
+    @contextmanager
+    def measure(self, name: str, img: Image) -> Iterator[None]:
+        if getattr(self._local, "depth", 0):
+            yield
+            return
+
+        shape_in, dtype_in = _describe(img.img)
+        if self.memory:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+
+        cpu = time.thread_time() - cpu
+        wall = time.perf_counter() - wall
+        shape_out, dtype_out = _describe(img.img)
+        event = {
+            "stage": name,
+            "wall_ms": wall * 1000,
+            "cpu_ms": cpu * 1000,
+            "in_shape": shape_in,
+            "in_dtype": dtype_in,
+            "out_shape": shape_out,
+            "out_dtype": dtype_out,
+        }
+        if self.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            event["allocated_bytes"] = peak - before
+        self.record(event)
+
+    def _wrap(self, name: str, original: Callable) -> Callable:
+        @wraps(original)
+        def timed(img: Image, *args, **kwargs):
+            with self.measure(name, img):
+                return original(img, *args, **kwargs)
+
+        timed.__recorder__ = self  # type: ignore
+        return timed
+
+    def record(self, event: EventType):
+        with self._lock:
+            self.events.append(event)
+            if self.out:
+                self.out.write(json.dumps(event) + "\n")
+
+
+# Reads events back from a JSON lines file
+def load_events(lines: Iterable[str]) -> List[EventType]:
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+# Per stage totals and percentiles, keyed by stage in the order each
+# was first seen
+def summarize(events: List[EventType]) -> Dict[str, Dict[str, float]]:
+    by_stage: Dict[str, List[EventType]] = {}
+    for event in events:
+        by_stage.setdefault(event["stage"], []).append(event)
+
+    summary = {}
+    for stage, stage_events in by_stage.items():
+        wall = [e["wall_ms"] for e in stage_events]
+        summary[stage] = {
+            "calls": len(stage_events),
+            "total_ms": float(np.sum(wall)),
+            "p50_ms": float(np.percentile(wall, 50)),
+            "p95_ms": float(np.percentile(wall, 95)),
+            "cpu_ms": float(np.sum([e["cpu_ms"] for e in stage_events])),
+        }
+        allocated = [
+            e["allocated_bytes"] for e in stage_events if "allocated_bytes" in e
+        ]
+        if allocated:
+            summary[stage]["p95_bytes"] = float(np.percentile(allocated, 95))
+    return summary
+
+
+def print_summary(summary: Dict[str, Dict[str, float]]):
+    print(
+        "{:<22} {:>6} {:>10} {:>10} {:>10}".format(
+            "stage", "calls", "total ms", "p50 ms", "p95 ms"
+        )
+    )
+    for stage, s in summary.items():
+        print(
+            "{:<22} {:>6} {:>10.1f} {:>10.2f} {:>10.2f}".format(
+                stage, s["calls"], s["total_ms"], s["p50_ms"], s["p95_ms"]
+            )
+        )
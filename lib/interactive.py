@@ -0,0 +1,119 @@
+# The interactive commands for adding and looking at assets
+
+from argparse import Namespace
+from copy import copy
+from pathlib import Path
+from typing import *
+from .corners import detect_corners
+from .image import Image
+from .prefetch import Prefetcher
+from .thumbnail import ThumbnailBuilder
+from .viewer import TiledViewer
+from .window import KEY_ENTER, X_MAX, Y_MAX
+from . import get_window, get_asset_mgr
+
+PointType = Tuple[int, int]
+
+
+def view(args: Namespace):
+    mgr = get_asset_mgr()
+
+    path, points = mgr.get(args.n)
+
+    img = Image(path)
+    img.perspective_transform(points)
+    TiledViewer(img).run(get_window())
+
+
+# Draws the points clicked so far, joined up once all 4 are in
+def outline(img: Image, points: List[PointType]):
+    for i, (x, y) in enumerate(points):
+        img.draw_point(x, y)
+        if i > 0:
+            img.draw_line(points[i - 1], points[i])
+    if len(points) == 4:
+        img.draw_line(points[-1], points[0])
+
+
+def interactive_add(args: Namespace):
+    mgr = get_asset_mgr()
+    paths = [Path(p) for p in args.photopaths]
+    points: List[PointType] = []
+    # Thumbnails for each added photo are built while the next one is
+    # being annotated
+    thumbnails = ThumbnailBuilder()
+
+    # Decodes and scales a photo for display, and looks for the board's
+    # corners. The next few photos are loaded in the background while
+    # the current one is being clicked
+    def load(path: Path):
+        img = Image(path)
+        detection = detect_corners(img.img)
+        factor = img.scale_bounded(X_MAX, Y_MAX)
+        return (path, img, factor, detection)
+
+    photos = Prefetcher(
+        paths, load, depth=args.prefetch, max_bytes=args.prefetch_mb * 1024 * 1024
+    )
+
+    async def add():
+        # Points found by detection, at full resolution. Set while the
+        # points shown are the detected ones
+        detected: Optional[List[PointType]] = None
+
+        # Adds image to the database
+        def add_image():
+            if detected is not None:
+                full_points = detected
+            else:
+                inverse = 1 / factor
+                full_points = [
+                    (round(p[0] * inverse), round(p[1] * inverse)) for p in points
+                ]
+            asset_path = mgr.add(path, full_points)
+            thumbnails.submit(asset_path, full_points)
+            points.clear()
+
+        async for path, scaled, factor, detection in photos:
+            # A confident detection fills in the points, Enter accepts
+            # them and any other key clears them to click by hand
+            detected = None
+            if detection and detection.confidence >= args.min_confidence:
+                detected = detection.points
+                points.extend(
+                    (
+                        min(round(x * factor), scaled.x_res - 1),
+                        min(round(y * factor), scaled.y_res - 1),
+                    )
+                    for x, y in detected
+                )
+            img = copy(scaled)
+            outline(img, points)
+            win.show(img)
+
+            while True:
+                while len(points) < 4:
+                    x, y = await win.click()
+                    points.append((x, y))
+                    img = copy(scaled)
+                    outline(img, points)
+                    win.show(img)
+
+                k = await win.keypress()
+
+                if k == KEY_ENTER:
+                    add_image()
+                    win.flush()
+                    break
+
+                # Reset, dropping anything clicked before the reset
+                points.clear()
+                detected = None
+                win.flush()
+                img = copy(scaled)
+                win.show(img)
+
+    win = get_window()
+    win.run(add())
+    photos.close()
+    thumbnails.shutdown()
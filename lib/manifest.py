@@ -0,0 +1,137 @@
+# Runs the processing pipeline described by a manifest file, with each
+# step as a separate pipeline stage so decoding, filtering and encoding
+# of different boards overlap. A manifest is JSON like:
+#
+#   {
+#     "assets": [0, 1, 2],
+#     "preset": "default",
+#     "output": "./processed",
+#     "format": "png",
+#     "native": false,
+#     "queue_size": 4,
+#     "stages": {
+#       "decode": {"workers": 2},
+#       "rectify": {"workers": 2},
+#       "filter": {"workers": 4, "processes": true},
+#       "encode": {"workers": 2}
+#     }
+#   }
+#
+# Every key is optional. Leaving out assets processes the whole db, and
+# "params" may be given in place of a preset. "native" and "max_side"
+# choose the resolution boards are filtered at, as --native and
+# --max-side do for the process command. Outputs are the same as the
+# process command makes, so either can pick up where the other left
+# off.
+
+import json
+import os
+from functools import partial
+from typing import *
+from .asset_manager import AssetManager
+from .filter import letterforms, rectify_params, with_resolution
+from .image import Image
+from .pipeline import DEFAULT_QUEUE_SIZE, Pipeline, Stage
+from .presets import PRESETS
+from .process import describe, is_fresh, output_path, write_output
+from .util import WORKERS
+
+JobType = Dict[str, Any]
+
+STAGE_DEFAULTS = {
+    "decode": {"workers": 2},
+    "rectify": {"workers": 2},
+    "filter": {"workers": WORKERS, "processes": True},
+    "encode": {"workers": 2},
+}
+
+
+# Each stage takes the job for one asset, and returns it with the
+# image moved on a step. They're kept at the module level so they can
+# be sent to worker processes
+
+
+def decode(job: JobType) -> JobType:
+    job["img"] = Image(job["src"])
+    return job
+
+
+# Also works out the parameters for the board's resolution, which
+# differ between boards when filtering at native resolution
+def rectify_stage(job: JobType, params: Dict[str, Any]) -> JobType:
+    job["img"], job["params"] = rectify_params(job["img"], job["points"], params)
+    return job
+
+
+def filter_stage(job: JobType) -> JobType:
+    letterforms(job["img"], **job.pop("params"))
+    return job
+
+
+def encode(job: JobType, params: Dict[str, Any]) -> JobType:
+    write_output(job["img"], job["out"], job["points"], params)
+    # Nothing downstream needs the pixels
+    del job["img"]
+    return job
+
+
+def build_pipeline(manifest: Dict[str, Any], params: Dict[str, Any]) -> Pipeline:
+    fns = {
+        "decode": decode,
+        "rectify": partial(rectify_stage, params=params),
+        "filter": filter_stage,
+        "encode": partial(encode, params=params),
+    }
+    config = manifest.get("stages", {})
+
+    stages = []
+    for name, fn in fns.items():
+        options = dict(STAGE_DEFAULTS[name])
+        options.update(config.get(name, {}))
+        stages.append(Stage(name, fn, **options))
+
+    return Pipeline(stages, manifest.get("queue_size", DEFAULT_QUEUE_SIZE))
+
+
+def run_manifest(args):
+    with open(args.manifest, "r") as f:
+        manifest = json.load(f)
+
+    params = with_resolution(
+        manifest.get("params") or PRESETS[manifest.get("preset", "default")],
+        manifest.get("native", False),
+        manifest.get("max_side"),
+    )
+    output = manifest.get("output", "./processed")
+    os.makedirs(output, exist_ok=True)
+
+    mgr = AssetManager()
+    indices = manifest.get("assets") or list(range(len(mgr)))
+    jobs = []
+    for i in indices:
+        src, points = mgr.get(i)
+        out = output_path(output, src.name, manifest.get("format", "png"))
+        if args.force or not is_fresh(src, out, describe(points, params)):
+            jobs.append({"index": i, "src": src, "points": points, "out": out})
+
+    print("Running {} of {} assets".format(len(jobs), len(indices)))
+
+    pipeline = build_pipeline(manifest, params)
+    for done, result in enumerate(pipeline.run(jobs), 1):
+        asset = jobs[result.index]["index"]
+        if result.error:
+            print("Asset {} failed: {}".format(asset, result.error))
+        else:
+            print("[{}/{}] asset {}".format(done, len(jobs), asset))
+
+    print("Finished in {:.1f}s".format(pipeline.elapsed))
+    for name, stats in pipeline.stats().items():
+        print(
+            "  {:8} {:4} items  {:6.2f} items/s  {:4.0%} busy  {} failed".format(
+                name,
+                stats["items"],
+                stats["items_per_s"],
+                stats["utilisation"],
+                stats["errors"],
+            )
+        )
@@ -0,0 +1,165 @@
+# A small framework for streaming items through a chain of stages, e.g.
+# decode -> rectify -> filter -> encode. Each stage has its own workers,
+# and stages are joined by bounded queues. A slow stage makes the ones
+# before it wait instead of piling up work, and while one image is being
+# decoded another can be filtered and a third encoded.
+#
+# Stages run on threads by default, which suits OpenCV since it releases
+# the GIL. A stage doing pure Python work can run its function in a pool
+# of processes instead.
+
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import *
+
+# What comes out of the pipeline for each item. The index is the
+# position of the item in the input, error is set if any stage failed
+Result = collections.namedtuple("Result", "index value error")
+
+DEFAULT_QUEUE_SIZE = 4
+
+# Tells a worker there's nothing more to come
+_DONE = object()
+
+
+class Stage:
+    def __init__(
+        self, name: str, fn: Callable, workers: int = 1, processes: bool = False
+    ):
+        if workers < 1:
+            raise ValueError("A stage needs at least one worker")
+
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.processes = processes
+
+        # Counters, updated by the workers as they go
+        self._lock = threading.Lock()
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+
+    def _record(self, seconds: float, failed: bool):
+        with self._lock:
+            self.items += 1
+            self.busy += seconds
+            if failed:
+                self.errors += 1
+
+
+# Counts down the workers of a stage that are still running
+class _Countdown:
+    def __init__(self, n: int):
+        self._n = n
+        self._lock = threading.Lock()
+
+    # Returns True for the last caller
+    def done(self) -> bool:
+        with self._lock:
+            self._n -= 1
+            return self._n == 0
+
+
+# Body of every worker thread. Takes items from inbox until told there
+# are no more, and passes the results on. The last worker of a stage to
+# finish passes the end on to every worker of the next stage
+def _work(
+    stage: Stage,
+    inbox: queue.Queue,
+    outbox: queue.Queue,
+    pool: Optional[ProcessPoolExecutor],
+    remaining: _Countdown,
+    after: int,
+):
+    while True:
+        result = inbox.get()
+        if result is _DONE:
+            if remaining.done():
+                for _ in range(after):
+                    outbox.put(_DONE)
+            return
+
+        # Failed items skip the remaining stages
+        if result.error is None:
+            began = time.perf_counter()
+            try:
+                if pool:
+                    value = pool.submit(stage.fn, result.value).result()
+                else:
+                    value = stage.fn(result.value)
+                result = Result(result.index, value, None)
+            except Exception as e:
+                result = Result(result.index, None, e)
+            stage._record(time.perf_counter() - began, result.error is not None)
+        outbox.put(result)
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage], queue_size: int = DEFAULT_QUEUE_SIZE):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.elapsed = 0.0
+
+    # Runs every item through the stages, yielding a Result for each as
+    # it comes out of the last one. Results arrive in the order they
+    # finish, which may differ from the input order
+    def run(self, items: Iterable[Any]) -> Iterator[Result]:
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        pools = [
+            ProcessPoolExecutor(max_workers=s.workers) if s.processes else None
+            for s in self.stages
+        ]
+        threads = []
+        start = time.perf_counter()
+
+        def feed():
+            for i, item in enumerate(items):
+                queues[0].put(Result(i, item, None))
+            for _ in range(self.stages[0].workers):
+                queues[0].put(_DONE)
+
+        threads.append(threading.Thread(target=feed, daemon=True))
+
+        for n, stage in enumerate(self.stages):
+            after = self.stages[n + 1].workers if n + 1 < len(self.stages) else 1
+            remaining = _Countdown(stage.workers)
+            for _ in range(stage.workers):
+                args = (stage, queues[n], queues[n + 1], pools[n], remaining, after)
+                threads.append(threading.Thread(target=_work, args=args, daemon=True))
+
+        for t in threads:
+            t.start()
+
+        try:
+            while True:
+                result = queues[-1].get()
+                if result is _DONE:
+                    break
+                yield result
+        finally:
+            self.elapsed = time.perf_counter() - start
+            for pool in pools:
+                if pool:
+                    pool.shutdown(wait=False)
+
+    # Throughput and utilisation of each stage. A utilisation near 1
+    # means every worker of the stage was always busy, so it's the one
+    # holding the rest back
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        summary = {}
+        for stage in self.stages:
+            elapsed = self.elapsed or 1e-9
+            summary[stage.name] = {
+                "items": stage.items,
+                "errors": stage.errors,
+                "busy_s": stage.busy,
+                "items_per_s": stage.items / elapsed,
+                "utilisation": stage.busy / (elapsed * stage.workers),
+            }
+        return summary
@@ -0,0 +1,119 @@
+# Loads items ahead of whoever is consuming them, so that slow decodes
+# happen while the user is busy with the previous item.
+
+import asyncio
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import *
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_DEPTH = 3
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+# Size of a loaded result, used against the memory budget. Anything
+# with a numpy array in it is measured by that array
+def default_sizeof(result: Any) -> int:
+    if hasattr(result, "nbytes"):
+        return result.nbytes
+    if hasattr(result, "img"):
+        return result.img.nbytes
+    if isinstance(result, tuple):
+        return sum(default_sizeof(r) for r in result)
+    return 0
+
+
+# Iterates over load(item) for every item, in order. Up to depth items
+# are loaded ahead in a thread pool, but loading pauses whenever the
+# results waiting to be consumed would exceed max_bytes. Results still
+# loading are assumed to be as large as the largest seen so far
+class Prefetcher(Generic[T, R]):
+    def __init__(
+        self,
+        items: Iterable[T],
+        load: Callable[[T], R],
+        depth: int = DEFAULT_DEPTH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        workers: int = 2,
+        sizeof: Callable[[R], int] = default_sizeof,
+    ):
+        if depth < 1:
+            raise ValueError("Depth must be at least 1")
+
+        self._items = iter(items)
+        self._load = load
+        self._depth = depth
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._queue: Deque[Future] = deque()
+        self._exhausted = False
+        self._largest: Optional[int] = None
+
+    def _buffered_bytes(self) -> int:
+        total = 0
+        for f in self._queue:
+            if not f.done():
+                total += self._largest or 0
+            elif f.exception() is None:
+                size = self._sizeof(f.result())
+                self._largest = max(size, self._largest or 0)
+                total += size
+        return total
+
+    def _fill(self):
+        while not self._exhausted and len(self._queue) < self._depth:
+            # Until one result has been measured, load one at a time
+            if self._largest is None and self._queue:
+                return
+            if self._buffered_bytes() >= self._max_bytes:
+                return
+
+            try:
+                item = next(self._items)
+            except StopIteration:
+                self._exhausted = True
+                return
+            self._queue.append(self._pool.submit(self._load, item))
+
+    # The future of the next result, or None once there are no more
+    def _pop(self) -> Optional[Future]:
+        self._fill()
+        if not self._queue:
+            self.close()
+            return None
+        return self._queue.popleft()
+
+    def _took(self, result: R) -> R:
+        self._largest = max(self._sizeof(result), self._largest or 0)
+        # Start on the next items now, rather than when they're asked for
+        self._fill()
+        return result
+
+    def __iter__(self) -> "Prefetcher[T, R]":
+        return self
+
+    def __next__(self) -> R:
+        fut = self._pop()
+        if fut is None:
+            raise StopIteration
+        return self._took(fut.result())
+
+    # Iterating with async for waits on each result without blocking the
+    # event loop, so a window stays responsive while a photo loads
+    def __aiter__(self) -> "Prefetcher[T, R]":
+        return self
+
+    async def __anext__(self) -> R:
+        fut = self._pop()
+        if fut is None:
+            raise StopAsyncIteration
+        return self._took(await asyncio.wrap_future(fut))
+
+    def close(self):
+        for f in self._queue:
+            f.cancel()
+        self._queue.clear()
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,23 @@
+# Named parameter sets for filter_letterforms, so batch jobs can refer
+# to tuned values instead of repeating them on the command line. They
+# live apart from filter so the command line can list them without
+# importing OpenCV.
+
+from typing import Any, Dict
+
+PRESETS: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "blur_kernel": 9,
+        "adaptive_thresh_block": 15,
+        "adaptive_c": 2.0,
+        "thresh_percent": 0.1,
+        "area": 10,
+    },
+    "fine": {
+        "blur_kernel": 5,
+        "adaptive_thresh_block": 11,
+        "adaptive_c": 3.0,
+        "thresh_percent": 0.05,
+        "area": 5,
+    },
+}
@@ -0,0 +1,184 @@
+# Runs the letterform pipeline over the asset database. Each asset is
+# handled by its own worker process, and the output is written next to
+# a small sidecar describing how it was made, so reruns only redo the
+# assets whose photo or parameters changed.
+
+import json
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import *
+from .asset_manager import AssetManager
+from .filter import PRESETS, filter_letterforms, with_resolution
+from .image import Image
+from .instrument import EventType, Recorder, print_summary, summarize
+from .util import atomic_write
+from .vector import WRITERS, write_vector
+
+PointType = Tuple[int, int]
+
+
+# Outputs are png images, or the traced outlines of the letterforms as
+# svg or bvpl files, see lib.vector
+def output_path(folder: str, name: str, fmt: str = "png") -> Path:
+    return Path(folder, Path(name).stem + "." + fmt)
+
+
+# The sidecar keeps the whole name of the output, so outputs of the
+# same photo in different formats each have their own
+def sidecar_path(out: Path) -> Path:
+    return out.with_name(out.name + ".json")
+
+
+# Everything that determines the output. If any of it changes the
+# asset has to be processed again
+def describe(points: List[PointType], params: Dict[str, Any]) -> Dict[str, Any]:
+    return {"points": [list(p) for p in points], "params": params}
+
+
+# An output is up to date if it's newer than the photo, and was made
+# with the same points and parameters
+def is_fresh(src: Path, out: Path, description: Dict[str, Any]) -> bool:
+    sidecar = sidecar_path(out)
+    if not out.exists() or not sidecar.exists():
+        return False
+    if out.stat().st_mtime < src.stat().st_mtime:
+        return False
+    with open(sidecar, "r") as f:
+        try:
+            return json.load(f) == description
+        except ValueError:
+            return False
+
+
+# The assets of indices whose outputs have to be made, as (index,
+# photo, points, output). Outputs that are up to date are left out,
+# unless forced
+def stale_assets(
+    mgr: AssetManager,
+    indices: Iterable[int],
+    params: Dict[str, Any],
+    folder: str,
+    fmt: str = "png",
+    force: bool = False,
+) -> List[Tuple[int, Path, List[PointType], Path]]:
+    jobs = []
+    for i in indices:
+        src, points = mgr.get(i)
+        out = output_path(folder, src.name, fmt)
+        if force or not is_fresh(src, out, describe(points, params)):
+            jobs.append((i, src, points, out))
+    return jobs
+
+
+# Runs in a worker process. Only the path is sent back, so the images
+# never have to cross the process boundary. When profiling, the stage
+# timings recorded in the worker are sent back along with it
+def process_asset(
+    src: Path,
+    points: List[PointType],
+    params: Dict[str, Any],
+    out: Path,
+    profile: bool = False,
+) -> Tuple[Path, List[EventType]]:
+    if not profile:
+        img = filter_letterforms(Image(src), trans_matrix=points, **params)
+        write_output(img, out, points, params)
+        return out, []
+
+    with Recorder() as rec:
+        img = filter_letterforms(Image(src), trans_matrix=points, **params)
+    write_output(img, out, points, params)
+    return out, rec.events
+
+
+# Writes a processed image along with its sidecar, in the format given
+# by the suffix of out. The old sidecar is removed first and both files
+# are written under a temporary name and swapped in, so an interrupted
+# run never leaves an output that looks finished
+def write_output(
+    img: Image, out: Path, points: List[PointType], params: Dict[str, Any]
+):
+    sidecar = sidecar_path(out)
+    if sidecar.exists():
+        sidecar.unlink()
+
+    with atomic_write(out) as tmp:
+        if out.suffix in WRITERS:
+            with open(tmp, "wb") as f:
+                write_vector(f, out.suffix, img)
+        else:
+            img.save(tmp)
+
+    with atomic_write(sidecar) as tmp, open(tmp, "w") as f:
+        json.dump(describe(points, params), f)
+
+
+def process(args):
+    mgr = AssetManager()
+    # The resolution is part of the parameters, so switching it counts
+    # as a change and outputs are made again
+    params = with_resolution(PRESETS[args.preset], args.native, args.max_side)
+    os.makedirs(args.output, exist_ok=True)
+
+    indices = args.n if args.n else list(range(len(mgr)))
+    jobs = stale_assets(mgr, indices, params, args.output, args.format, args.force)
+    total = len(jobs)
+    skipped = len(indices) - total
+    print("Processing {} assets, {} already up to date".format(total, skipped))
+
+    # Only a few jobs are submitted ahead of the workers. Each in flight
+    # job holds a full resolution image, so this bounds the memory used
+    # no matter how large the database is
+    in_flight = max(1, args.in_flight or 2 * args.workers)
+    pending: Dict[Any, int] = {}
+    done = 0
+    failed = 0
+    start = time.perf_counter()
+    events: List[EventType] = []
+    with open(args.profile, "w") if args.profile else nullcontext() as profile:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            queue = iter(jobs)
+            while True:
+                for i, src, points, out in queue:
+                    pending[
+                        pool.submit(
+                            process_asset, src, points, params, out, bool(profile)
+                        )
+                    ] = i
+                    if len(pending) >= in_flight:
+                        break
+
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    i = pending.pop(fut)
+                    done += 1
+                    try:
+                        _, asset_events = fut.result()
+                    except Exception as e:
+                        failed += 1
+                        print("Asset {} failed: {}".format(i, e))
+                    else:
+                        if profile:
+                            for event in asset_events:
+                                event["asset"] = i
+                                profile.write(json.dumps(event) + "\n")
+                            events.extend(asset_events)
+
+                    elapsed = time.perf_counter() - start
+                    print(
+                        "[{}/{}] asset {} ({:.2f} assets/s)".format(
+                            done, total, i, done / elapsed
+                        )
+                    )
+
+    elapsed = time.perf_counter() - start
+    print("Processed {} assets in {:.1f}s, {} failed".format(done, elapsed, failed))
+
+    if profile:
+        print_summary(summarize(events))
@@ -0,0 +1,220 @@
+# Runs the letterform filter over the frames of a video, or a folder of
+# images, from a camera that doesn't move. Every frame shares the same
+# board points, so instead of warping each one through rectify, the
+# whole of rectify is folded into a single pair of remap tables up
+# front, and each frame is rectified with one remap. Given the native
+# option, see filter_letterforms, frames are rectified at the board's
+# own resolution and the parameters converted to it.
+#
+# Most of a board doesn't change from one frame to the next. Each frame
+# is split into tiles, and a tile with any pixel that differs by more
+# than diff from when it was last filtered has changed. The filter
+# reaches halo pixels past a pixel, so every tile within halo of a
+# changed one is filtered again too. Tiles are filtered with a margin
+# of halo around them, so apart from changes too small to pass diff,
+# the result is the same as filtering the whole frame.
+
+import os
+import time
+from pathlib import Path
+from typing import *
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .asset_manager import AssetManager
+from .filter import (
+    CROP_BORDER,
+    PRESETS,
+    RECTIFIED_MIN,
+    UPSCALE_SIGMA,
+    halo,
+    letterforms,
+    scale_params,
+    with_resolution,
+)
+from .image import Image
+from .warp_cache import homography_maps, perspective_matrix
+
+PointType = Tuple[int, int]
+ParamsType = Dict[str, Any]
+
+DEFAULT_TILE = 256
+# Change in a pixel, in grey levels, above which it counts as changed.
+# High enough to ignore sensor noise
+DEFAULT_DIFF = 16.0
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"}
+
+
+# Builds remap tables doing the work of rectify, perspective transform,
+# crop and scale, in one step. Each output pixel is traced back through
+# the scale and crop to the warped image, and from there through the
+# inverse of the perspective transform to the photo. With native, the
+# scale is that of rectify_native instead
+def rectify_maps(
+    points: List[PointType], native: bool = False, max_side: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    transM, (width, height) = perspective_matrix(points)
+
+    x_offset = round(width * CROP_BORDER)
+    y_offset = round(height * CROP_BORDER)
+    x_size = width - x_offset * 2
+    y_size = height - y_offset * 2
+
+    if not native:
+        factor = max(RECTIFIED_MIN / x_size, RECTIFIED_MIN / y_size)
+    elif max_side and max(x_size, y_size) > max_side:
+        factor = max_side / max(x_size, y_size)
+    else:
+        factor = 1.0
+    out_x, out_y = round(x_size * factor), round(y_size * factor)
+
+    # Matches where cv.resize samples from
+    xs = (np.arange(out_x, dtype=np.float32) + 0.5) * (x_size / out_x) - 0.5
+    ys = (np.arange(out_y, dtype=np.float32) + 0.5) * (y_size / out_y) - 0.5
+    return homography_maps(transM, xs + x_offset, ys + y_offset)
+
+
+# Yields frames from a video file, or the images in a folder in name
+# order
+def read_frames(source: str) -> Iterator[np.ndarray]:
+    if os.path.isdir(source):
+        for path in sorted(Path(source).iterdir()):
+            if path.suffix.lower() in IMAGE_SUFFIXES:
+                yield Image(path).img
+        return
+
+    capture = cv.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError("Unable to open {}".format(source))
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        capture.release()
+
+
+class StreamFilter:
+    def __init__(
+        self,
+        points: List[PointType],
+        params: ParamsType,
+        tile: int = DEFAULT_TILE,
+        diff: float = DEFAULT_DIFF,
+    ):
+        params = dict(params)
+        native = params.pop("native", False)
+        self.map1, self.map2 = rectify_maps(
+            points, native, params.pop("max_side", None)
+        )
+
+        # Like rectify_native, boards smaller than the reference are
+        # blurred slightly
+        self.sigma = 0.0
+        if native:
+            factor = min(self.map1.shape[:2]) / RECTIFIED_MIN
+            params = scale_params(params, factor)
+            if factor < 1:
+                self.sigma = UPSCALE_SIGMA
+        self.params = params
+        self.tile = tile
+        self.diff = diff
+        self.halo = halo(params)
+
+        # The rectified frame each tile was last filtered from, and the
+        # filtered result
+        self._reference: Optional[np.ndarray] = None
+        self.output: Optional[np.ndarray] = None
+
+    def rectify(self, frame: np.ndarray) -> np.ndarray:
+        if frame.ndim == 3:
+            frame = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+        gray = cv.remap(frame, self.map1, self.map2, cv.INTER_LINEAR)
+        if self.sigma:
+            gray = cv.GaussianBlur(gray, (0, 0), self.sigma)
+        return gray
+
+    # Returns the (row, col) of every tile that has to be filtered
+    # again, those with a pixel changed by more than diff and those
+    # within halo of them
+    def changed_tiles(self, gray: np.ndarray) -> List[Tuple[int, int]]:
+        rows = -(-gray.shape[0] // self.tile)
+        cols = -(-gray.shape[1] // self.tile)
+        if self._reference is None:
+            return [(r, c) for r in range(rows) for c in range(cols)]
+
+        delta = cv.absdiff(gray, self._reference)
+        # The largest change in each tile, the last row and column may
+        # be partial
+        padded = np.zeros((rows * self.tile, cols * self.tile), dtype=np.uint8)
+        padded[: gray.shape[0], : gray.shape[1]] = delta
+        largest = padded.reshape(rows, self.tile, cols, self.tile).max(axis=(1, 3))
+        changed = (largest > self.diff).astype(np.uint8)
+
+        reach = -(-self.halo // self.tile)
+        near = np.ones((reach * 2 + 1, reach * 2 + 1), np.uint8)
+        changed = cv.dilate(changed, near, borderType=cv.BORDER_CONSTANT, borderValue=0)
+        return [tuple(rc) for rc in np.argwhere(changed)]
+
+    def _filter_tile(self, gray: np.ndarray, row: int, col: int):
+        height, width = gray.shape
+        y0, x0 = row * self.tile, col * self.tile
+        y1, x1 = min(y0 + self.tile, height), min(x0 + self.tile, width)
+        hy0, hx0 = max(y0 - self.halo, 0), max(x0 - self.halo, 0)
+        hy1, hx1 = min(y1 + self.halo, height), min(x1 + self.halo, width)
+
+        img = Image(gray[hy0:hy1, hx0:hx1])
+        letterforms(img, **self.params)
+        self.output[y0:y1, x0:x1] = img.img[y0 - hy0 : y1 - hy0, x0 - hx0 : x1 - hx0]
+        self._reference[y0:y1, x0:x1] = gray[y0:y1, x0:x1]
+
+    # Filters a frame, returning the filtered board and the number of
+    # tiles that had to be filtered again. The board returned is updated
+    # in place by later frames, copy it to keep it
+    def process(self, frame: np.ndarray) -> Tuple[np.ndarray, int]:
+        gray = self.rectify(frame)
+        changed = self.changed_tiles(gray)
+
+        # The first frame is filtered whole
+        if self._reference is None:
+            img = Image(gray)
+            letterforms(img, **self.params)
+            self._reference = gray
+            self.output = img.img
+            return self.output, len(changed)
+
+        for row, col in changed:
+            self._filter_tile(gray, row, col)
+        return self.output, len(changed)
+
+
+def stream(args):
+    mgr = AssetManager()
+    _, points = mgr.get(args.n)
+    params = with_resolution(PRESETS[args.preset], args.native, args.max_side)
+    filt = StreamFilter(points, params, args.tile, args.diff)
+    os.makedirs(args.output, exist_ok=True)
+
+    start = time.perf_counter()
+    frames = written = tiles = 0
+    for frames, frame in enumerate(read_frames(args.source), 1):
+        output, changed = filt.process(frame)
+        tiles += changed
+        # Frames where nothing changed are the same as the one before
+        if changed:
+            written += 1
+            Image(output).save(Path(args.output, "frame_{:06d}.png".format(frames)))
+
+        if frames % 100 == 0:
+            elapsed = time.perf_counter() - start
+            print("{} frames, {:.1f} frames/s".format(frames, frames / elapsed))
+
+    elapsed = time.perf_counter() - start
+    print(
+        "Filtered {} frames in {:.1f}s ({:.1f} frames/s), {} written, "
+        "{} tiles filtered".format(
+            frames, elapsed, frames / max(elapsed, 1e-9), written, tiles
+        )
+    )
@@ -1,9 +1,34 @@
+# Sweeps the letterform pipeline over a sample of the parameter space.
+# The sample is picked from a seed, so a large sweep can be split into
+# shards run on different machines:
+#
+#   python -m lib.test --seed 7 --samples 5000 --shard 0/3
+#   python -m lib.test --seed 7 --samples 5000 --shard 1/3
+#   ...
+#   python -m lib.test --merge experiment/shard_*.npy
+#
+# Copy each shard's folder into one, then merge the shard files. A sweep
+# that isn't split writes the results file straight away, ready for
+# python -m lib.experiment. Neither replaces the results of an earlier
+# sweep unless given --force.
+
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import *
 import cv2 as cv
 import numpy as np
-import itertools as it
-import random
-import pickle
-import os
+from .experiment import (
+    PROJECT_DIR,
+    LABELS_FILE,
+    OLD_KEYS,
+    RESULTS_FILE,
+    SIGNATURES_FILE,
+    from_records,
+    load_results,
+    save_results,
+)
 
 TEST_IMG = "./IMG_20190916_123045.jpg"
 
@@ -20,6 +45,7 @@ CORNERS = [
     (1108, 2718),  # Bottom Left
 ]
 
+
 # Returns an image that's projected from the 4 given points
 def transform_img(img, top_left, top_right, bottom_right, bottom_left):
     source = np.array([top_left, top_right, bottom_right, bottom_left], dtype="float32")
@@ -116,7 +142,7 @@ def pipeline(img, **kwargs):
     # Convert back into an RGB image so we can have a different color
     # for our watermark
     watermarked = cv.cvtColor(threshold, cv.COLOR_GRAY2BGR)
-    for (param_name, param_val) in kwargs.items():
+    for param_name, param_val in kwargs.items():
         # Write out a line for each parameter
         watermarked = cv.putText(
             watermarked,
@@ -142,73 +168,180 @@ def crop_border(img, percent):
     return np.array(img[y_offset : y_offset + y_size, x_offset : x_offset + x_size])
 
 
+# The values each parameter is swept over. Every combination is a point
+# in the parameter space, numbered in the order gen_params yields them
+PARAM_RANGES = [
+    ("adaptive_block_size", list(range(3, 30, 2))),
+    # This value has enormous power. It should be non zero, else the
+    # image is black
+    ("adaptive_C", list(range(1, 5))),
+    ("min_area", list(range(10, 21))),
+    ("blur_kernel_size", list(range(3, 30, 2))),
+    ("percent_black", [0.01 * n for n in range(1, 30)]),
+]
+SPACE_SIZE = int(np.prod([len(values) for _, values in PARAM_RANGES]))
+CROP_PERCENT = 0.02
+
+
+# Returns the parameters at a point in the parameter space
+def params_at(index: int) -> Dict[str, Any]:
+    shape = [len(values) for _, values in PARAM_RANGES]
+    params = {"crop_percent": CROP_PERCENT}
+    for (name, values), i in zip(PARAM_RANGES, np.unravel_index(index, shape)):
+        params[name] = values[i]
+    return params
+
+
 # Returns a series of dictionaries that can represent a range of
 # permutations for params to be passed into a pipeline function. This
 # way we can build a ton of different images with varying params and
 # see what the effects are.
-def gen_params():
-    param_ranges = it.product(
-        range(3, 30, 2),  # Adaptive block size
-        # This value has enormous power. It
-        # should be non zero, else the image is black
-        range(1, 5),  # adaptive C
-        range(10, 21),  # min area
-        range(3, 30, 2),  # blur_kernel_size
-        map(lambda n: 0.01 * n, range(1, 30)),
-    )  # percent_black
-
-    for params in param_ranges:
-        yield {
-            "crop_percent": 0.02,
-            "adaptive_block_size": params[0],
-            "adaptive_C": params[1],
-            "min_area": params[2],
-            "blur_kernel_size": params[3],
-            "percent_black": params[4],
-        }
-
-
-PROJECT_DIR = "./experiment"
-INDEX_FILE = PROJECT_DIR + "/index.dat"
+def gen_params() -> Iterator[Dict[str, Any]]:
+    for index in range(SPACE_SIZE):
+        yield params_at(index)
+
+
+# Parses "i/n", the i-th of n shards counting from 0
+def parse_shard(shard: str) -> Tuple[int, int]:
+    i, _, n = shard.partition("/")
+    if not i.isdigit() or not n.isdigit() or not 0 <= int(i) < int(n):
+        raise argparse.ArgumentTypeError("Shard must be i/n, with 0 <= i < n")
+    return int(i), int(n)
+
+
+# The points of the parameter space a shard covers. The same seed always
+# picks the same sample of the space, and shard i of n takes every n-th
+# point of it, so the shards never overlap and together cover it all
+def shard_indices(seed: int, samples: int, shard: Tuple[int, int]) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    chosen = rng.choice(SPACE_SIZE, size=min(samples, SPACE_SIZE), replace=False)
+    i, n = shard
+    return chosen[i::n]
+
+
+# Where a shard saves its results. The only shard of a sweep is the
+# whole of it, so it's saved where the experiment tools look
+def shard_file(output: str, shard: Tuple[int, int]) -> Path:
+    if shard[1] == 1:
+        return Path(output, Path(RESULTS_FILE).name)
+    return Path(output, "shard_{}of{}.npy".format(*shard))
+
+
+# Refuses to replace the results of an earlier sweep by accident
+def check_unused(paths: List[Path], force: bool):
+    for path in paths:
+        if path.exists() and not force:
+            raise FileExistsError(
+                "{} already exists, use --force to replace it".format(path)
+            )
+
+
+# Files made from the results of a sweep, for the samples of whichever
+# sweep made them. A new sweep starts without them, so its samples are
+# never given the signatures or labels of another's
+def derived_files(output: str) -> List[Path]:
+    return [
+        Path(output, Path(SIGNATURES_FILE).name),
+        Path(output, Path(LABELS_FILE).name),
+    ]
+
+
+def remove(paths: Iterable[Path]):
+    for path in paths:
+        if path.exists():
+            path.unlink()
+
+
+def run_shard(args):
+    os.makedirs(args.output, exist_ok=True)
+    # A sweep that isn't split replaces everything in the folder. The
+    # shards of a split one may share a folder, so each only minds its
+    # own file
+    whole = args.shard[1] == 1
+    shards = sorted(Path(args.output).glob("shard_*.npy")) if whole else []
+    check_unused([shard_file(args.output, args.shard)] + shards, args.force)
+
+    img = cv.imread(args.image)
+    if img is None:
+        raise ValueError("Unable to read {}".format(args.image))
+    if whole:
+        outputs = Path(args.output).glob("out_*.png")
+        remove(list(outputs) + shards + derived_files(args.output))
+    transformed = transform_img(img, CORNERS[0], CORNERS[1], CORNERS[2], CORNERS[3])
+
+    indices = shard_indices(args.seed, args.samples, args.shard)
+    records = []
+    for n, index in enumerate(indices, 1):
+        p = params_at(int(index))
+        print("Writing image {} of {}".format(n, len(indices)))
+        # Named by the point in the space, so outputs of every shard can
+        # be copied into one folder
+        path = "{}/out_{}.png".format(args.output, index)
+        try:
+            start = time.perf_counter()
+            out_img = pipeline(transformed, **p)
+            seconds = time.perf_counter() - start
+            cv.imwrite(path, out_img)
+        except cv.error:
+            print("OpenCV ran into an error with parameters:", p)
+            continue
+
+        record = {OLD_KEYS[k]: v for k, v in p.items() if k in OLD_KEYS}
+        record.update(id=int(index), seconds=seconds)
+        records.append(record)
+
+    # Written once the shard is done, so a file that exists is complete.
+    # Results are kept in id order, as the experiment tools expect
+    results = from_records(records)
+    results = results[np.argsort(results["id"], kind="stable")]
+    save_results(str(shard_file(args.output, args.shard)), results)
+    print("Saved {}".format(shard_file(args.output, args.shard)))
+
+
+# Combines the results of every shard into one results file, that the
+# experiment tools can review and analyze
+def merge(args):
+    path = Path(args.output, Path(RESULTS_FILE).name)
+    check_unused([path], args.force)
+
+    parts = [load_results(shard) for shard in args.merge]
+    results = np.concatenate(parts) if parts else from_records([])
+    results = results[np.argsort(results["id"], kind="stable")]
+
+    if len(np.unique(results["id"])) != len(results):
+        raise ValueError("Shards overlap, were they run with different seeds?")
+
+    # The outputs were copied in with the shards, so only what was made
+    # from an earlier results file goes
+    remove(derived_files(args.output))
+    save_results(str(path), results)
+    print(
+        "Merged {} samples from {} shards into {}".format(
+            len(results), len(parts), path
+        )
+    )
+
 
 if __name__ == "__main__":
-    # create directory if not present
-    try:
-        os.mkdir(PROJECT_DIR)
-    except FileExistsError:
-        yes = input(
-            "Project folder present. If we continue the data will be deleted. Enter 'y' to proceed: "
-        )
-        if yes != "y":
-            os.abort()
-
-    # Open this up early, so if we fail we don't waste 30 minutes
-    with open(INDEX_FILE, "wb") as idx_file:
-
-        img = cv.imread(TEST_IMG)
-        transformed = transform_img(img, CORNERS[0], CORNERS[1], CORNERS[2], CORNERS[3])
-        SAMPLE_SIZE = 500
-
-        samples = {}  # Add our samples to this array as we create them, so
-        # we can write this out and save the data for comparison purposes
-        # later on. Note we use a map to handle the issue of errors.
-
-        # We must take a small sub sample of our parameters, because
-        # otherwise we would be dealing with an order of magnitude too
-        # many. Hopefully we can learn something from the patterns we see
-        # here and narrow down our ranges to get better results
-        param_samples = random.sample(list(gen_params()), SAMPLE_SIZE)
-        for i, p in enumerate(param_samples):
-            try:
-                print("Writing image {} of {}".format(i + 1, SAMPLE_SIZE))
-                path = PROJECT_DIR + "/out_{}.png".format(i)
-                out_img = pipeline(transformed, **p)
-                cv.imwrite(path, out_img)
-                samples[i] = {"params": p}
-            except KeyboardInterrupt:
-                os.abort()
-            except:
-                print("OpenCV ran into an error with pameters:", p)
-
-        print("Saving index file")
-        pickle.dump(samples, idx_file)
+    parser = argparse.ArgumentParser("parameter sweep")
+    parser.add_argument("--image", default=TEST_IMG, help="Photo to sweep over")
+    parser.add_argument("--output", default=PROJECT_DIR, help="Output folder")
+    parser.add_argument("--seed", type=int, default=0, help="Seed picking the sample")
+    parser.add_argument(
+        "--samples", type=int, default=500, help="Points of the space to sample"
+    )
+    parser.add_argument(
+        "--shard", type=parse_shard, default=(0, 1), help="Run shard i of n, as i/n"
+    )
+    parser.add_argument(
+        "--merge", nargs="+", help="Merge these shard files instead of sweeping"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Replace the results of an earlier sweep"
+    )
+    args = parser.parse_args()
+
+    if args.merge:
+        merge(args)
+    else:
+        run_shard(args)
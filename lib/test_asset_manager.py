@@ -1,5 +1,10 @@
 import unittest
-from .asset_manager import validate_points
+import multiprocessing
+import tempfile
+from pathlib import Path
+from .asset_manager import AssetManager, validate_points
+
+POINTS = [(0, 0), (1, 0), (1, 1), (0, 1)]
 
 
 class TestPointValidation(unittest.TestCase):
@@ -24,5 +29,91 @@ class TestPointValidation(unittest.TestCase):
         self.assertTrue(validate_points(points))
 
 
+# Creates empty photos to add, returning their paths
+def make_photos(folder: str, prefix: str, n: int):
+    paths = []
+    for i in range(n):
+        path = Path(folder, "{}_{}.jpg".format(prefix, i))
+        path.touch()
+        paths.append(path)
+    return paths
+
+
+def add_all(folder: str, paths):
+    mgr = AssetManager(folder)
+    for path in paths:
+        mgr.add(path, POINTS)
+
+
+class TestConcurrentManagers(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.photos = self.tmp.name
+        self.assets = str(Path(self.tmp.name, "assets"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sees_other_writes(self):
+        a = AssetManager(self.assets)
+        b = AssetManager(self.assets)
+        pa, pb = make_photos(self.photos, "a", 1) + make_photos(self.photos, "b", 1)
+
+        a.add(pa, POINTS)
+        b.add(pb, POINTS)
+
+        self.assertEqual(2, len(a))
+        self.assertEqual(pb.name, a.get(1)[0].name)
+
+    def test_delete_uses_latest(self):
+        a = AssetManager(self.assets)
+        b = AssetManager(self.assets)
+        pa, pb = make_photos(self.photos, "a", 2)
+
+        a.add(pa, POINTS)
+        b.add(pb, POINTS)
+        a.delete(1)
+
+        self.assertEqual(1, len(b))
+        self.assertEqual(pa.name, b.get(0)[0].name)
+
+    def test_parallel_processes(self):
+        workers = 4
+        per_worker = 10
+        procs = []
+        for w in range(workers):
+            paths = make_photos(self.photos, "w{}".format(w), per_worker)
+            proc = multiprocessing.Process(target=add_all, args=(self.assets, paths))
+            procs.append(proc)
+            proc.start()
+
+        for proc in procs:
+            proc.join()
+            self.assertEqual(0, proc.exitcode)
+
+        self.assertEqual(workers * per_worker, len(AssetManager(self.assets)))
+
+
+class TestDelete(unittest.TestCase):
+    def test_removes_thumbnails(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            assets = Path(tmp, "assets")
+            mgr = AssetManager(str(assets))
+            [photo, other] = make_photos(tmp, "p", 2)
+            mgr.add(photo, POINTS)
+            mgr.add(other, POINTS)
+
+            mgr.thumb_folder.mkdir()
+            for name in (photo.name, other.name):
+                Path(mgr.thumb_folder, name + ".256x256.jpg").touch()
+                Path(mgr.thumb_folder, name + ".json").touch()
+
+            mgr.delete(0)
+            self.assertEqual(
+                sorted(p.name for p in mgr.thumb_folder.iterdir()),
+                [other.name + ".256x256.jpg", other.name + ".json"],
+            )
+
+
 if __name__ == "__main__":
     unittest.main()
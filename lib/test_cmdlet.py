@@ -0,0 +1,55 @@
+import unittest
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from .cmdlet import Cmdlet, Commander
+
+MAIN = str(Path(__file__).resolve().parent.parent / "main.py")
+
+ran = []
+
+
+def record(args):
+    ran.append(args)
+
+
+class TestLazyRunner(unittest.TestCase):
+    def setUp(self):
+        ran.clear()
+
+    def test_resolves_string(self):
+        cmd = Cmdlet("rec", "Records args", __name__ + ":record")
+        cmd.add_arg("n", type=int)
+        Commander([cmd]).run(["rec", "3"])
+        self.assertEqual(3, ran[0].n)
+
+    def test_only_chosen_resolved(self):
+        chosen = Cmdlet("rec", "Records args", __name__ + ":record")
+        # Resolving this would fail, so it must never be imported
+        other = Cmdlet("other", "Never runs", "lib.does_not_exist:run")
+        Commander([other, chosen]).run(["rec"])
+        self.assertEqual(1, len(ran))
+
+    def test_callable_runner(self):
+        cmd = Cmdlet("rec", "Records args", record)
+        Commander([cmd]).run(["rec"])
+        self.assertEqual(1, len(ran))
+
+
+class TestStartupImports(unittest.TestCase):
+    def test_delete_skips_opencv(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            proc = subprocess.run(
+                [sys.executable, "-X", "importtime", MAIN, "delete", "0"],
+                cwd=tmp,
+                capture_output=True,
+                text=True,
+            )
+        self.assertEqual(0, proc.returncode, proc.stderr)
+        self.assertNotIn("cv2", proc.stderr)
+        self.assertNotIn("numpy", proc.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+from pathlib import Path
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .asset_manager import AssetManager
+from .corners import bulk_add, detect_corners, order_points
+
+CORNERS = [(310, 180), (1620, 240), (1560, 1100), (260, 1020)]
+
+
+# A light board, skewed as if photographed from off to the side, with
+# some writing on it, against a darker wall
+def photo() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    img = np.full((1200, 1800, 3), 70, dtype=np.uint8)
+    img += rng.integers(0, 10, img.shape, dtype=np.uint8)
+    cv.fillConvexPoly(img, np.array(CORNERS, dtype=np.int32), (225, 225, 225))
+    for i in range(5):
+        y = 400 + i * 120
+        cv.putText(img, "f(x) = x^2", (500, y), cv.FONT_HERSHEY_SIMPLEX, 2, 30, 4)
+    return img
+
+
+class TestCorners(unittest.TestCase):
+    def test_finds_board(self):
+        detection = detect_corners(photo())
+        self.assertIsNotNone(detection)
+        self.assertGreater(detection.confidence, 0.8)
+        # In the order perspective_transform takes them
+        for (x, y), (ex, ey) in zip(detection.points, CORNERS):
+            self.assertLessEqual(abs(x - ex), 3)
+            self.assertLessEqual(abs(y - ey), 3)
+        for x, y in detection.points:
+            self.assertIs(type(x), int)
+            self.assertIs(type(y), int)
+
+    def test_nothing_to_find(self):
+        flat = np.full((600, 800, 3), 128, dtype=np.uint8)
+        self.assertIsNone(detect_corners(flat))
+
+        rng = np.random.default_rng(1)
+        noise = rng.integers(0, 256, (600, 800, 3), dtype=np.uint8)
+        detection = detect_corners(noise)
+        self.assertTrue(detection is None or detection.confidence < 0.5)
+
+    def test_order_points(self):
+        quad = np.array([[90, 95], [5, 10], [100, 0], [0, 100]])
+        ordered = order_points(quad)
+        self.assertEqual(ordered.tolist(), [[5, 10], [100, 0], [90, 95], [0, 100]])
+
+
+class TestBulkAdd(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        # Assets go in ./assets
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, cwd)
+
+    def test_bad_photos_left_for_iadd(self):
+        good = Path(self.tmp.name, "good.png")
+        cv.imwrite(str(good), photo())
+        unreadable = Path(self.tmp.name, "notes.png")
+        unreadable.write_text("not a photo")
+        AssetManager().add(Path(self.tmp.name, "good.png"), CORNERS)
+        again = Path(self.tmp.name, "again", "good.png")
+        again.parent.mkdir()
+        cv.imwrite(str(again), photo())
+        fresh = Path(self.tmp.name, "fresh.png")
+        cv.imwrite(str(fresh), photo())
+
+        args = argparse.Namespace(
+            photopaths=[str(unreadable), str(again), str(fresh)],
+            workers=2,
+            min_confidence=0.5,
+        )
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            bulk_add(args)
+
+        # Only the fresh photo is added, the others are listed for iadd
+        mgr = AssetManager()
+        self.assertEqual(
+            [mgr.get(i)[0].name for i in range(len(mgr))], ["good.png", "fresh.png"]
+        )
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[-1], "  iadd {} {}".format(unreadable, again))
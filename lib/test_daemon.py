@@ -0,0 +1,140 @@
+import unittest
+import os
+import socket
+import tempfile
+import threading
+from pathlib import Path
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .asset_manager import AssetManager
+from .cache import LRUCache
+from .client import DaemonError, parse_params, request
+from .daemon import Daemon, Server
+from .filter import PRESETS
+from .process import output_path, process_asset
+
+POINTS = [(0, 0), (199, 0), (199, 149), (0, 149)]
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recent(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_get_or_make(self):
+        cache = LRUCache(1)
+        made = []
+        for _ in range(3):
+            cache.get_or_make("a", lambda: made.append(1) or len(made))
+        self.assertEqual(made, [1])
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+
+class TestParseParams(unittest.TestCase):
+    def test_json_and_strings(self):
+        self.assertEqual(
+            parse_params(["n=[0,1]", "preset=fine", "force=true"]),
+            {"n": [0, 1], "preset": "fine", "force": True},
+        )
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        photo = Path(self.tmp.name, "board.png")
+        img = np.full((150, 200, 3), 255, dtype=np.uint8)
+        cv.putText(img, "AB", (20, 100), cv.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 5)
+        cv.imwrite(str(photo), img)
+
+        mgr = AssetManager(os.path.join(self.tmp.name, "assets"))
+        mgr.add(photo, POINTS)
+        self.output = os.path.join(self.tmp.name, "processed")
+
+        self.socket = os.path.join(self.tmp.name, "daemon.sock")
+        self.server = Server(self.socket, Daemon(mgr))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def test_ping_and_list(self):
+        self.assertEqual(request({"job": "ping"}, self.socket), "pong")
+        [(name, points)] = request({"job": "list"}, self.socket)
+        self.assertEqual([tuple(p) for p in points], POINTS)
+
+    def test_unknown_job(self):
+        with self.assertRaises(DaemonError):
+            request({"job": "nope"}, self.socket)
+
+    def test_process_reuses_rectified(self):
+        job = {"job": "process", "output": self.output}
+        [out] = request(dict(job), self.socket)
+        self.assertTrue(os.path.exists(out))
+
+        # Up to date, so nothing is written
+        self.assertEqual(request(dict(job), self.socket), [])
+
+        request(dict(job, force=True), self.socket)
+        stats = request({"job": "stats"}, self.socket)
+        self.assertEqual(stats["rectified"]["hits"], 1)
+        self.assertEqual(stats["decoded"]["misses"], 1)
+
+    def test_native(self):
+        job = {"job": "process", "output": self.output}
+        [out] = request(dict(job), self.socket)
+        reference = cv.imread(out)
+
+        [out] = request(dict(job, native=True), self.socket)
+        self.assertLess(cv.imread(out).size, reference.size)
+        # Switching resolutions makes the output again
+        self.assertEqual(request(dict(job), self.socket), [out])
+
+        with self.assertRaises(DaemonError):
+            request(dict(job, max_side=100), self.socket)
+
+    def test_one_daemon_per_socket(self):
+        with self.assertRaises(DaemonError):
+            Server(self.socket, Daemon(self.server.daemon.mgr))
+        # The running one still has its socket
+        self.assertEqual(request({"job": "ping"}, self.socket), "pong")
+
+    def test_stale_socket_replaced(self):
+        # Bound and closed without being removed, as a daemon that died
+        path = os.path.join(self.tmp.name, "stale.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(path)
+        server = Server(path, Daemon(self.server.daemon.mgr))
+        server.server_close()
+
+    def test_same_as_process(self):
+        [out] = request({"job": "process", "output": self.output}, self.socket)
+        src, points = self.server.daemon.mgr.get(0)
+        expected = output_path(self.tmp.name, "expected.png")
+        process_asset(src, points, PRESETS["default"], expected)
+        self.assertTrue(np.array_equal(cv.imread(out), cv.imread(str(expected))))
+
+    def test_tiled_same_output(self):
+        mgr = AssetManager(os.path.join(self.tmp.name, "assets"))
+        [whole] = Daemon(mgr).process(output=self.output)
+        expected = cv.imread(whole)
+
+        daemon = Daemon(mgr, workers=2)
+        try:
+            [tiled] = daemon.process(output=self.output, force=True)
+        finally:
+            daemon.close()
+        self.assertTrue(np.array_equal(cv.imread(tiled), expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
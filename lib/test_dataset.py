@@ -0,0 +1,53 @@
+import unittest
+import tempfile
+import numpy as np
+from pathlib import Path
+from .dataset import Dataset, write_dataset, ALIGN
+
+POINTS = [(0, 0), (1, 0), (1, 1), (0, 1)]
+
+
+class TestRoundTrip(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name, "boards.bvds")
+        rng = np.random.default_rng(0)
+        self.arrays = [
+            rng.integers(0, 255, (31, 17, 3), dtype="uint8"),
+            rng.integers(0, 255, (5, 9), dtype="uint8"),
+            rng.random((4, 4)).astype("float32"),
+        ]
+        records = [
+            ("board_{}.jpg".format(i), POINTS, arr) for i, arr in enumerate(self.arrays)
+        ]
+        write_dataset(self.path, records)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_arrays(self):
+        ds = Dataset(self.path)
+        self.assertEqual(len(self.arrays), len(ds))
+        for i, arr in enumerate(self.arrays):
+            self.assertEqual(arr.dtype, ds[i].dtype)
+            self.assertTrue(np.array_equal(arr, ds[i]))
+
+    def test_metadata(self):
+        ds = Dataset(self.path)
+        self.assertEqual("board_1.jpg", ds.name(1))
+        self.assertEqual(POINTS, ds.points(1))
+
+    def test_aligned(self):
+        ds = Dataset(self.path)
+        for entry in ds._entries:
+            self.assertEqual(0, entry["offset"] % ALIGN)
+
+    def test_bad_file(self):
+        bad = Path(self.tmp.name, "bad.bvds")
+        bad.write_bytes(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            Dataset(bad)
+
+
+if __name__ == "__main__":
+    unittest.main()
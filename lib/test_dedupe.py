@@ -0,0 +1,82 @@
+import unittest
+import time
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .dedupe import HASH_BYTES, HammingIndex, cluster, hamming, signature
+
+
+# A white board with a few random black strokes
+def output(seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    img = np.full((400, 600), 255, dtype=np.uint8)
+    for _ in range(8):
+        x, y = rng.integers(0, 560), rng.integers(0, 360)
+        cv.rectangle(img, (x, y), (x + 40, y + 8), 0, -1)
+    return img
+
+
+def flip_bits(sig: np.ndarray, n: int, rng) -> np.ndarray:
+    bits = np.unpackbits(sig)
+    flip = rng.choice(len(bits), n, replace=False)
+    bits[flip] ^= 1
+    return np.packbits(bits)
+
+
+class TestSignature(unittest.TestCase):
+    def test_same_output_same_signature(self):
+        img = output(0)
+        sig = signature(img)
+        self.assertEqual(sig.shape, (HASH_BYTES,))
+        self.assertTrue(
+            np.array_equal(sig, signature(cv.cvtColor(img, cv.COLOR_GRAY2BGR)))
+        )
+
+        # A speck of noise doesn't change anything
+        specked = img.copy()
+        specked[200, 300] = 0
+        self.assertEqual(hamming(signature(specked)[None], sig)[0], 0)
+
+        self.assertGreater(hamming(signature(output(1))[None], sig)[0], 20)
+
+    def test_blank(self):
+        blank = np.full((400, 600), 255, dtype=np.uint8)
+        self.assertEqual(signature(blank).sum(), 0)
+
+
+class TestCluster(unittest.TestCase):
+    def test_neighbours_match_brute_force(self):
+        rng = np.random.default_rng(0)
+        bases = rng.integers(0, 256, (20, HASH_BYTES), dtype=np.uint8)
+        sigs = np.array(
+            [flip_bits(bases[i % 20], rng.integers(0, 12), rng) for i in range(300)]
+        )
+        index = HammingIndex(sigs, radius=10)
+        for row in range(0, 300, 7):
+            expected = np.flatnonzero(hamming(sigs, sigs[row]) <= 10)
+            self.assertEqual(index.neighbours(row).tolist(), expected.tolist())
+
+    def test_clusters(self):
+        rng = np.random.default_rng(1)
+        bases = rng.integers(0, 256, (5, HASH_BYTES), dtype=np.uint8)
+        sigs = np.array([flip_bits(bases[i % 5], 3, rng) for i in range(50)])
+        clusters = cluster(sigs, radius=10)
+
+        # One representative per base, each the first of its members
+        self.assertEqual(np.unique(clusters).tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(clusters.tolist(), [i % 5 for i in range(50)])
+        for row, rep in enumerate(clusters):
+            self.assertLessEqual(hamming(sigs[row][None], sigs[rep])[0], 10)
+
+    def test_empty(self):
+        self.assertEqual(len(cluster(np.zeros((0, HASH_BYTES), np.uint8))), 0)
+
+    def test_large_sweep_fast(self):
+        rng = np.random.default_rng(2)
+        bases = rng.integers(0, 256, (2000, HASH_BYTES), dtype=np.uint8)
+        which = rng.integers(0, 2000, 50000)
+        sigs = bases[which]
+        start = time.perf_counter()
+        clusters = cluster(sigs)
+        elapsed = time.perf_counter() - start
+        self.assertEqual(len(np.unique(clusters)), len(np.unique(which)))
+        self.assertLess(elapsed, 10)
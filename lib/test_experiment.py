@@ -0,0 +1,217 @@
+import unittest
+import os
+import pickle
+import tempfile
+import time
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .experiment import (
+    BAD,
+    GOOD,
+    LabelLog,
+    PARAMS,
+    UNLABELLED,
+    apply_labels,
+    collect_data,
+    correlations,
+    from_records,
+    grouped_mean,
+    load_results,
+    load_signatures,
+    marginal_effect,
+    migrate_index,
+    new_results,
+    prune_outputs,
+    quantiles,
+    save_results,
+    summarize_stats,
+)
+from .dedupe import cluster
+from .filter import gen_parameters
+from .headless import HeadlessBackend
+from .window import Window
+
+
+def sweep(n: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    results = new_results(n)
+    results["blur_kernel"] = rng.integers(1, 15, n) * 2 + 1
+    results["adaptive_thresh_block"] = rng.integers(1, 15, n) * 2 + 1
+    results["adaptive_c"] = rng.uniform(0, 5, n)
+    results["thresh_percent"] = rng.uniform(0, 0.2, n)
+    results["area"] = rng.integers(1, 20, n)
+    # Small blur kernels make good images
+    results["label"] = results["blur_kernel"] < 10
+    results["score"] = results["adaptive_c"] * 2
+    return results
+
+
+class TestStore(unittest.TestCase):
+    def test_columns_match_gen_parameters(self):
+        self.assertEqual(set(next(gen_parameters())), set(PARAMS))
+
+    def test_save_load(self):
+        results = sweep(100)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "results.npy")
+            save_results(path, results)
+            self.assertEqual(load_results(path).tobytes(), results.tobytes())
+
+    def test_migrate_appended_pickles(self):
+        old = {
+            "blur_kernel_size": 5,
+            "adaptive_block_size": 11,
+            "adaptive_C": 2.0,
+            "percent_black": 0.1,
+            "min_area": 4,
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.dat")
+            with open(path, "wb") as f:
+                pickle.dump({0: {"params": old}, 1: {"params": old}}, f)
+                pickle.dump(
+                    {
+                        0: {"params": old, "good_image": True},
+                        1: {"params": old, "good_image": False},
+                    },
+                    f,
+                )
+            results = migrate_index(path)
+
+        self.assertEqual(list(results["label"]), [GOOD, BAD])
+        self.assertEqual(list(results["area"]), [4, 4])
+        self.assertEqual(list(results["adaptive_thresh_block"]), [11, 11])
+
+    def test_from_records(self):
+        results = from_records([dict(next(gen_parameters()), id=7)])
+        self.assertEqual(results["id"][0], 7)
+        self.assertEqual(results["label"][0], UNLABELLED)
+
+
+class TestAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.results = sweep(1000)
+
+    def test_summarize_stats(self):
+        means = summarize_stats(self.results)
+        self.assertLess(means["blur_kernel"], 10)
+
+    def test_grouped_mean(self):
+        keys, means = grouped_mean(self.results, "blur_kernel")
+        np.testing.assert_array_equal(means, (keys < 10).astype(float))
+
+    def test_unlabelled_left_out(self):
+        self.results["label"][:500] = UNLABELLED
+        keys, means = grouped_mean(self.results, "blur_kernel")
+        np.testing.assert_array_equal(means, (keys < 10).astype(float))
+
+    def test_quantiles(self):
+        low, mid, high = quantiles(self.results, "score")
+        self.assertLess(low, mid)
+        self.assertLess(mid, high)
+
+    def test_marginal_effect(self):
+        edges, means = marginal_effect(self.results, "blur_kernel", bins=4)
+        self.assertEqual(len(means), len(edges) - 1)
+        self.assertEqual(means[0], 1.0)
+        self.assertEqual(means[-1], 0.0)
+
+    def test_correlations(self):
+        corr = correlations(self.results)
+        self.assertLess(corr["blur_kernel"], -0.5)
+        self.assertLess(abs(corr["area"]), 0.2)
+        self.assertAlmostEqual(correlations(self.results, "score")["adaptive_c"], 1.0)
+
+    def test_large_sweep_fast(self):
+        results = sweep(100000)
+        start = time.perf_counter()
+        summarize_stats(results)
+        correlations(results)
+        for name in PARAMS:
+            grouped_mean(results, name)
+            marginal_effect(results, name)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+
+class TestReview(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp.name, "labels.log")
+        self.results = sweep(30)
+        self.results["label"] = UNLABELLED
+        for sample in self.results["id"]:
+            path = os.path.join(self.tmp.name, "out_{}.png".format(sample))
+            cv.imwrite(path, np.full((80, 40, 3), 255, dtype=np.uint8))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_grid_review(self):
+        script = [
+            {"t": 0.05, "type": "click", "x": 10, "y": 10},
+            {"t": 0.1, "type": "key", "key": "n"},
+            {"t": 0.15, "type": "key", "key": "g"},
+            {"t": 0.2, "type": "key", "key": "n"},
+        ]
+        log = LabelLog(self.log_path)
+        win = Window(HeadlessBackend(script))
+        collect_data(self.results, log, win, folder=self.tmp.name)
+        log.close()
+
+        expected = [GOOD] + [BAD] * 23 + [GOOD] * 6
+        self.assertEqual(list(self.results["label"]), expected)
+
+        # The log alone is enough to get the labels back
+        replayed = sweep(30)
+        replayed["label"] = UNLABELLED
+        apply_labels(replayed, self.log_path)
+        self.assertEqual(list(replayed["label"]), expected)
+
+
+class TestDedupedReview(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sig_path = os.path.join(self.tmp.name, "signatures.npy")
+        self.results = sweep(30)
+        self.results["label"] = UNLABELLED
+        # Only 3 distinct outputs
+        for sample in self.results["id"]:
+            img = np.full((400, 300), 255, dtype=np.uint8)
+            x = 20 + (sample % 3) * 90
+            cv.rectangle(img, (x, 50), (x + 60, 350), 0, -1)
+            path = os.path.join(self.tmp.name, "out_{}.png".format(sample))
+            cv.imwrite(path, img)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_one_per_cluster(self):
+        signatures = load_signatures(self.results, self.tmp.name, self.sig_path)
+        clusters = cluster(signatures)
+        self.assertEqual(clusters.tolist(), [i % 3 for i in range(30)])
+
+        script = [
+            {"t": 0.05, "type": "click", "x": 10, "y": 10},
+            {"t": 0.1, "type": "key", "key": "n"},
+        ]
+        log = LabelLog(os.path.join(self.tmp.name, "labels.log"))
+        win = Window(HeadlessBackend(script))
+        collect_data(self.results, log, win, self.tmp.name, clusters=clusters)
+        log.close()
+
+        expected = [GOOD if i % 3 == 0 else BAD for i in range(30)]
+        self.assertEqual(list(self.results["label"]), expected)
+
+    def test_prune_keeps_signatures(self):
+        signatures = load_signatures(self.results, self.tmp.name, self.sig_path)
+        clusters = cluster(signatures)
+        self.assertEqual(prune_outputs(self.results, clusters, self.tmp.name), 27)
+        self.assertEqual(len(os.listdir(self.tmp.name)), 4)
+
+        # Pruned outputs aren't needed again
+        again = load_signatures(self.results, self.tmp.name, self.sig_path)
+        self.assertTrue(np.array_equal(again, signatures))
+
+
+if __name__ == "__main__":
+    unittest.main()
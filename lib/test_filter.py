@@ -0,0 +1,188 @@
+import unittest
+import random
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .filter import (
+    PRESETS,
+    RECTIFIED_MIN,
+    black_tiles,
+    filter_letterforms,
+    gen_parameters,
+    ink_tiles,
+    letterforms,
+    nearest_odd,
+    rectify_native,
+    rectify_params,
+    scale_params,
+    with_resolution,
+)
+from .image import Image
+from .instrument import Recorder
+
+
+# A mostly empty board with a few lines of writing, optionally unevenly
+# lit and noisy
+def board(seed: int, gradient: bool = False, noise: bool = False) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    img = np.full((480, 640), 200, dtype=np.float32)
+    if gradient:
+        img += np.linspace(0, 30, 640)[None, :]
+    if noise:
+        img += rng.normal(0, 2, img.shape)
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    for _ in range(3):
+        x, y = int(rng.integers(0, 400)), int(rng.integers(40, 460))
+        cv.putText(img, "x+y=3", (x, y), cv.FONT_HERSHEY_SIMPLEX, 1, 40, 3)
+    return img
+
+
+def run(img: np.ndarray, params, roi: bool) -> np.ndarray:
+    out = Image(img)
+    letterforms(out, roi=roi, **params)
+    return out.img
+
+
+class TestRegionOfInterest(unittest.TestCase):
+    def test_same_as_whole_board(self):
+        random.seed(0)
+        params = [PRESETS["default"], PRESETS["fine"]]
+        params += [next(gen_parameters()) for _ in range(4)]
+        for i, p in enumerate(params):
+            for gradient, noise in [(False, False), (True, False), (True, True)]:
+                img = board(i, gradient, noise)
+                self.assertTrue(
+                    np.array_equal(run(img, p, False), run(img, p, True)),
+                    "{} gradient={} noise={}".format(p, gradient, noise),
+                )
+
+    def test_blank_board(self):
+        blank = np.full((480, 640), 180, dtype=np.uint8)
+        p = PRESETS["default"]
+        self.assertFalse(ink_tiles(blank, **_thresholds(p)).any())
+        self.assertTrue((run(blank, p, True) == 255).all())
+
+    def test_nothing_skipped(self):
+        img = board(0)
+        # No flat area is sure to come out white, when adaptive_c is 0,
+        # or when the threshold turns everything black
+        for change in [{"adaptive_c": 0.0}, {"thresh_percent": 0.0}]:
+            p = dict(PRESETS["default"], **change)
+            self.assertIsNone(ink_tiles(img, **_thresholds(p)))
+            self.assertTrue(np.array_equal(run(img, p, False), run(img, p, True)))
+
+    def test_ink_tiles(self):
+        img = np.full((256, 256), 200, dtype=np.uint8)
+        img[100:110, 100:110] = 40
+        ink = ink_tiles(img, **_thresholds(PRESETS["default"]))
+        self.assertEqual(ink.shape, (8, 8))
+        # The tiles around the ink are within reach of it too
+        self.assertTrue(ink[2:5, 2:5].all())
+        self.assertFalse(ink[7, 7])
+
+    def test_stages_recorded_once(self):
+        img, p = board(0), PRESETS["default"]
+        with Recorder() as rec:
+            out = run(img, p, True)
+        self.assertEqual(
+            [e["stage"] for e in rec.events],
+            ["adaptive_threshold", "blur", "threshold", "area_threshold"],
+        )
+        self.assertEqual(rec.events[0]["in_shape"], [480, 640])
+        self.assertTrue(np.array_equal(out, run(img, p, False)))
+
+    def test_black_tiles(self):
+        binary = np.full((70, 100), 255, dtype=np.uint8)
+        binary[65, 99] = 0
+        black = black_tiles(binary)
+        self.assertEqual(black.shape, (3, 4))
+        self.assertEqual(np.argwhere(black).tolist(), [[2, 3]])
+
+
+# A photo of a board smaller than the reference resolution, with a few
+# lines of writing on it
+def photo(noise: float):
+    rng = np.random.default_rng(0)
+    img = np.full((1100, 1700, 3), 60, dtype=np.uint8)
+    points = [(60, 50), (1640, 70), (1620, 1060), (80, 1040)]
+    cv.fillConvexPoly(img, np.array(points, dtype=np.int32), (205, 205, 205))
+    img = np.clip(img + rng.normal(0, noise, img.shape), 0, 255).astype(np.uint8)
+    for i in range(10):
+        x, y = 150 + int(rng.integers(0, 700)), 140 + i * 90
+        cv.putText(
+            img, "f(x)=ax^2+bx", (x, y), cv.FONT_HERSHEY_SIMPLEX, 1.2, (40,) * 3, 3
+        )
+    return img, points
+
+
+class TestNativeResolution(unittest.TestCase):
+    def test_matches_reference(self):
+        # At noise 2 the default preset leaves the reference itself
+        # covered in specks, so it's compared on a cleaner photo
+        for noise, preset in [(0, "fine"), (2, "fine"), (0, "default"), (1, "default")]:
+            img, points = photo(noise)
+            p = PRESETS[preset]
+            reference = filter_letterforms(Image(img), trans_matrix=points, **p)
+            native = filter_letterforms(
+                Image(img), trans_matrix=points, native=True, **p
+            )
+            # Far fewer pixels filtered
+            self.assertLess(native.img.size * 4, reference.img.size)
+
+            # Compared at the native resolution, which can't show edges
+            # any finer than its own pixels
+            scaled = cv.resize(
+                reference.img,
+                (native.x_res, native.y_res),
+                interpolation=cv.INTER_AREA,
+            )
+            a, b = scaled < 128, native.img == 0
+            self.assertGreater((a == b).mean(), 0.99)
+            self.assertGreater(
+                (a & b).sum() / (a | b).sum(), 0.9, "{} {}".format(noise, preset)
+            )
+
+    def test_same_as_rectify_params(self):
+        img, points = photo(0)
+        p = with_resolution(PRESETS["default"], True, 800)
+        board, params = rectify_params(Image(img), points, p)
+        self.assertEqual(max(board.x_res, board.y_res), 800)
+        letterforms(board, **params)
+        expected = filter_letterforms(Image(img), trans_matrix=points, **p)
+        self.assertTrue(np.array_equal(board.img, expected.img))
+
+    def test_max_side_needs_native(self):
+        img, points = photo(0)
+        with self.assertRaises(ValueError):
+            with_resolution(PRESETS["default"], False, 800)
+        with self.assertRaises(ValueError):
+            filter_letterforms(
+                Image(img), trans_matrix=points, max_side=800, **PRESETS["default"]
+            )
+        self.assertEqual(
+            with_resolution(PRESETS["default"], False, None), PRESETS["default"]
+        )
+
+    def test_max_side(self):
+        img, points = photo(0)
+        board, factor = rectify_native(Image(img), points)
+        self.assertAlmostEqual(factor, min(board.x_res, board.y_res) / RECTIFIED_MIN)
+
+        capped, factor = rectify_native(Image(img), points, max_side=800)
+        self.assertEqual(max(capped.x_res, capped.y_res), 800)
+        self.assertAlmostEqual(factor, capped.y_res / RECTIFIED_MIN)
+
+    def test_scale_params(self):
+        p = scale_params(PRESETS["default"], 0.5)
+        self.assertEqual(p["blur_kernel"], 5)
+        self.assertEqual(p["adaptive_thresh_block"], 9)
+        self.assertEqual(p["area"], 2)
+        self.assertEqual(p["adaptive_c"], PRESETS["default"]["adaptive_c"])
+
+    def test_nearest_odd(self):
+        for n, expected in [(7.4, 7), (7.9, 9), (8.0, 9), (8.6, 9), (9.5, 11)]:
+            self.assertEqual(nearest_odd(n), expected, n)
+        self.assertEqual(nearest_odd(0.2), 3)
+
+
+def _thresholds(params):
+    return {k: v for k, v in params.items() if k != "area"}
@@ -0,0 +1,55 @@
+import unittest
+import io
+import numpy as np  # type: ignore
+from .image import Image
+from .instrument import Recorder, load_events, summarize
+
+ORIGINAL_BLUR = Image.blur
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        self.img = Image(np.full((40, 60), 255, dtype=np.uint8))
+
+    def test_records_stages(self):
+        out = io.StringIO()
+        with Recorder(out, memory=True) as rec:
+            self.img.blur(3)
+            self.img.scale(0.5)
+
+        self.assertEqual([e["stage"] for e in rec.events], ["blur", "scale"])
+        self.assertEqual(rec.events[1]["in_shape"], [40, 60])
+        self.assertEqual(rec.events[1]["out_shape"], [20, 30])
+        self.assertEqual(rec.events[1]["out_dtype"], "uint8")
+        self.assertGreater(rec.events[1]["allocated_bytes"], 0)
+        self.assertEqual(load_events(out.getvalue().splitlines()), rec.events)
+
+    def test_restores_methods(self):
+        with Recorder():
+            self.assertIsNot(Image.blur, ORIGINAL_BLUR)
+        self.assertIs(Image.blur, ORIGINAL_BLUR)
+
+    def test_nested_counted_once(self):
+        with Recorder() as rec:
+            self.img.watermark({"a": 1})
+        self.assertEqual([e["stage"] for e in rec.events], ["watermark"])
+
+    def test_only_one_active(self):
+        with Recorder():
+            with self.assertRaises(RuntimeError):
+                with Recorder():
+                    pass
+        self.assertIs(Image.blur, ORIGINAL_BLUR)
+
+    def test_summarize(self):
+        events = [
+            {"stage": "blur", "wall_ms": ms, "cpu_ms": 1.0} for ms in range(1, 101)
+        ]
+        summary = summarize(events)["blur"]
+        self.assertEqual(summary["calls"], 100)
+        self.assertAlmostEqual(summary["p50_ms"], 50.5)
+        self.assertAlmostEqual(summary["p95_ms"], 95.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
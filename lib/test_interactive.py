@@ -0,0 +1,109 @@
+import unittest
+import os
+import tempfile
+from argparse import Namespace
+from pathlib import Path
+from unittest import mock
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from . import interactive, thumbnail
+from .asset_manager import AssetManager
+from .headless import HeadlessBackend
+from .window import KEY_ENTER, Window
+
+# Photos are 400x300, shown scaled up by 10/3 to fit the window
+CLICKS = [(100, 100), (1200, 100), (1200, 900), (100, 900)]
+POINTS = [(30, 30), (360, 30), (360, 270), (30, 270)]
+CLICKS2 = [(200, 150), (1100, 150), (1100, 850), (200, 850)]
+POINTS2 = [(60, 45), (330, 45), (330, 255), (60, 255)]
+
+
+def clicks(points, t: float):
+    return [
+        {"t": t + i * 0.01, "type": "click", "x": x, "y": y}
+        for i, (x, y) in enumerate(points)
+    ]
+
+
+# Runs a command against a db in a temporary folder, with a headless
+# window replaying script
+class HeadlessCommand(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        folder = os.path.join(self.tmp.name, "assets")
+        self.mgr = AssetManager(folder)
+        for patch in [
+            mock.patch.object(interactive, "get_asset_mgr", return_value=self.mgr),
+            mock.patch.object(thumbnail, "THUMB_FOLDER", str(self.mgr.thumb_folder)),
+        ]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def photo(self, name: str) -> Path:
+        path = Path(self.tmp.name, name)
+        img = np.full((300, 400, 3), 200, dtype=np.uint8)
+        cv.putText(img, name, (40, 160), cv.FONT_HERSHEY_SIMPLEX, 1, (40,) * 3, 2)
+        cv.imwrite(str(path), img)
+        return path
+
+    def run_command(self, command, args: Namespace, script) -> HeadlessBackend:
+        backend = HeadlessBackend(script, quit_after=0.2)
+        with mock.patch.object(interactive, "get_window", return_value=Window(backend)):
+            command(args)
+        return backend
+
+
+class TestInteractiveAdd(HeadlessCommand):
+    def test_clicked_points_stored(self):
+        photos = [self.photo("first.png"), self.photo("second.png")]
+        # The second photo is clicked wrong, reset with a key, and
+        # clicked again
+        wrong = [(x + 50, y) for x, y in CLICKS]
+        script = (
+            clicks(CLICKS, 0.1)
+            + [{"t": 0.2, "type": "key", "key": KEY_ENTER}]
+            + clicks(wrong, 0.3)
+            + [{"t": 0.4, "type": "key", "key": "r"}]
+            + clicks(CLICKS2, 0.5)
+            + [{"t": 0.6, "type": "key", "key": KEY_ENTER}]
+        )
+        args = Namespace(
+            photopaths=[str(p) for p in photos],
+            prefetch=1,
+            prefetch_mb=64,
+            min_confidence=2.0,
+        )
+        backend = self.run_command(interactive.interactive_add, args, script)
+
+        self.assertEqual(len(self.mgr), 2)
+        for i, expected in enumerate([POINTS, POINTS2]):
+            path, points = self.mgr.get(i)
+            self.assertEqual(path.name, photos[i].name)
+            self.assertEqual([tuple(p) for p in points], expected)
+        # Thumbnails were built for both
+        self.assertEqual(len(list(self.mgr.thumb_folder.glob("*.json"))), 2)
+        self.assertEqual(backend.report()["click"]["count"], 12)
+
+
+class TestView(HeadlessCommand):
+    def test_zoom_and_pan(self):
+        photo = self.photo("board.png")
+        self.mgr.add(photo, POINTS)
+        script = [
+            {"t": 0.1, "type": "wheel", "x": 900, "y": 500, "delta": 120},
+            {"t": 0.2, "type": "drag", "x0": 900, "y0": 500, "x": 700, "y": 400},
+        ]
+        backend = self.run_command(interactive.view, Namespace(n=0), script)
+
+        report = backend.report()
+        # The first frame, then one for each event
+        self.assertEqual(report["frames"], 3)
+        self.assertEqual(len({shape for _, shape in backend.frames}), 1)
+        for kind in ["wheel", "drag"]:
+            self.assertEqual(report[kind]["count"], 1)
+            self.assertLess(report[kind]["max"], 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import threading
+import time
+from .pipeline import Pipeline, Stage
+
+
+def double(n):
+    return n * 2
+
+
+def fail_on_three(n):
+    if n == 3:
+        raise ValueError("three")
+    return n
+
+
+class TestPipeline(unittest.TestCase):
+    def test_all_items(self):
+        pipeline = Pipeline(
+            [Stage("add", lambda n: n + 1, workers=3), Stage("double", double, 2)]
+        )
+        results = list(pipeline.run(range(50)))
+        self.assertEqual(
+            sorted((n + 1) * 2 for n in range(50)), sorted(r.value for r in results)
+        )
+        for r in results:
+            self.assertEqual((r.index + 1) * 2, r.value)
+
+    def test_errors_skip_later_stages(self):
+        later = []
+        pipeline = Pipeline(
+            [Stage("check", fail_on_three), Stage("later", later.append)]
+        )
+        results = {r.index: r for r in pipeline.run(range(5))}
+        self.assertIsInstance(results[3].error, ValueError)
+        self.assertNotIn(3, later)
+        self.assertEqual(1, pipeline.stats()["check"]["errors"])
+        self.assertEqual(4, pipeline.stats()["later"]["items"])
+
+    def test_backpressure(self):
+        # With a slow last stage, the fast first stage must stall once
+        # the queues between them are full
+        started = []
+        lock = threading.Lock()
+
+        def fast(n):
+            with lock:
+                started.append(n)
+            return n
+
+        def slow(n):
+            time.sleep(0.05)
+            return n
+
+        pipeline = Pipeline([Stage("fast", fast), Stage("slow", slow)], queue_size=2)
+        results = pipeline.run(range(100))
+        next(results)
+        time.sleep(0.1)
+        # Items held: one per worker, plus a full queue on each side
+        self.assertLess(len(started), 10)
+        results.close()
+
+    def test_processes(self):
+        pipeline = Pipeline([Stage("double", double, workers=2, processes=True)])
+        values = sorted(r.value for r in pipeline.run(range(10)))
+        self.assertEqual([n * 2 for n in range(10)], values)
+
+    def test_stats(self):
+        pipeline = Pipeline([Stage("double", double)])
+        list(pipeline.run(range(10)))
+        stats = pipeline.stats()["double"]
+        self.assertEqual(10, stats["items"])
+        self.assertGreater(stats["items_per_s"], 0)
+
+    def test_needs_workers(self):
+        with self.assertRaises(ValueError):
+            Stage("none", double, workers=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
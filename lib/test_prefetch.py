@@ -0,0 +1,89 @@
+import unittest
+import asyncio
+import threading
+import time
+import numpy as np
+from .prefetch import Prefetcher
+
+
+class TestPrefetcher(unittest.TestCase):
+    def test_order(self):
+        items = list(range(20))
+        self.assertEqual(
+            [n * 2 for n in items], list(Prefetcher(items, lambda n: n * 2))
+        )
+
+    def test_empty(self):
+        self.assertEqual([], list(Prefetcher([], lambda n: n)))
+
+    def test_depth(self):
+        loaded = []
+        lock = threading.Lock()
+
+        def load(n):
+            with lock:
+                loaded.append(n)
+            return n
+
+        prefetch = Prefetcher(range(100), load, depth=3)
+        self.assertEqual(0, next(prefetch))
+        # The first item was consumed, so at most depth more were started
+        self.assertLessEqual(len(loaded), 4)
+        prefetch.close()
+
+    def test_memory_budget(self):
+        started = []
+
+        def load(n):
+            started.append(n)
+            return np.zeros(1000, dtype="uint8")
+
+        prefetch = Prefetcher(range(100), load, depth=50, max_bytes=1, workers=1)
+        next(prefetch)
+        # Only one result at a time fits in the budget, so loading never
+        # gets ahead by more than one, even though the depth would allow it
+        self.assertLessEqual(len(started), 2)
+        prefetch.close()
+
+    def test_errors_raised(self):
+        def load(n):
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            next(Prefetcher([1], load))
+
+    def test_async_order(self):
+        async def consume():
+            return [n async for n in Prefetcher(range(20), lambda n: n * 2)]
+
+        self.assertEqual([n * 2 for n in range(20)], asyncio.run(consume()))
+
+    def test_async_doesnt_block_loop(self):
+        ticks = []
+
+        def load(n):
+            time.sleep(0.2)
+            return n
+
+        async def tick():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        async def consume():
+            ticker = asyncio.ensure_future(tick())
+            result = await Prefetcher([1], load).__anext__()
+            ticker.cancel()
+            return result
+
+        self.assertEqual(asyncio.run(consume()), 1)
+        # The loop kept running while the load was waited on
+        self.assertGreater(len(ticks), 5)
+
+    def test_bad_depth(self):
+        with self.assertRaises(ValueError):
+            Prefetcher([], lambda n: n, depth=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
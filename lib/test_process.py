@@ -0,0 +1,77 @@
+import unittest
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+import numpy as np  # type: ignore
+from .image import Image
+from .process import describe, is_fresh, output_path, sidecar_path, write_output
+
+POINTS = [(0, 0), (1, 0), (1, 1), (0, 1)]
+PARAMS = {"area": 10}
+
+
+class TestFreshness(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = Path(self.tmp.name, "board.jpg")
+        self.src.touch()
+        self.out = output_path(self.tmp.name, self.src.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_output(self, description):
+        self.out.touch()
+        with open(sidecar_path(self.out), "w") as f:
+            json.dump(description, f)
+
+    def test_missing_output(self):
+        self.assertFalse(is_fresh(self.src, self.out, describe(POINTS, PARAMS)))
+
+    def test_up_to_date(self):
+        self.write_output(describe(POINTS, PARAMS))
+        self.assertTrue(is_fresh(self.src, self.out, describe(POINTS, PARAMS)))
+
+    def test_params_changed(self):
+        self.write_output(describe(POINTS, PARAMS))
+        self.assertFalse(is_fresh(self.src, self.out, describe(POINTS, {"area": 5})))
+
+    def test_photo_newer(self):
+        self.write_output(describe(POINTS, PARAMS))
+        mtime = self.out.stat().st_mtime
+        os.utime(self.src, (mtime + 10, mtime + 10))
+        self.assertFalse(is_fresh(self.src, self.out, describe(POINTS, PARAMS)))
+
+
+class TestWriteOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.src = Path(self.tmp.name, "board.jpg")
+        self.src.touch()
+        self.img = Image(np.full((20, 30), 255, dtype=np.uint8))
+
+    def test_sidecar_per_format(self):
+        outs = [output_path(self.tmp.name, self.src.name, f) for f in ["png", "svg"]]
+        write_output(self.img, outs[0], POINTS, PARAMS)
+        write_output(self.img, outs[1], POINTS, {"area": 5})
+        self.assertNotEqual(sidecar_path(outs[0]), sidecar_path(outs[1]))
+        self.assertTrue(is_fresh(self.src, outs[0], describe(POINTS, PARAMS)))
+        self.assertTrue(is_fresh(self.src, outs[1], describe(POINTS, {"area": 5})))
+
+    def test_interrupted_write(self):
+        # The old output stays, but not the sidecar that vouched for it
+        out = output_path(self.tmp.name, self.src.name)
+        write_output(self.img, out, POINTS, PARAMS)
+        with mock.patch.object(Image, "save", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                write_output(self.img, out, POINTS, {"area": 5})
+        self.assertTrue(out.exists())
+        self.assertFalse(is_fresh(self.src, out, describe(POINTS, PARAMS)))
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["board.jpg", "board.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
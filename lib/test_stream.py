@@ -0,0 +1,128 @@
+import unittest
+import os
+import tempfile
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .filter import (
+    letterforms,
+    rectify,
+    rectify_native,
+    scale_params,
+    with_resolution,
+)
+from .image import Image
+from .stream import StreamFilter, read_frames
+
+POINTS = [(40, 30), (600, 40), (590, 450), (50, 440)]
+PARAMS = {
+    "blur_kernel": 3,
+    "adaptive_thresh_block": 11,
+    "adaptive_c": 2.0,
+    "thresh_percent": 0.1,
+    "area": 1,
+}
+
+
+def board() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    frame = np.full((480, 640, 3), 220, dtype=np.uint8)
+    for i in range(12):
+        x, y = rng.integers(60, 520), rng.integers(60, 420)
+        cv.putText(
+            frame, "AB", (int(x), int(y)), cv.FONT_HERSHEY_SIMPLEX, 1, (30, 30, 30), 2
+        )
+    return frame
+
+
+class TestStreamFilter(unittest.TestCase):
+    def setUp(self):
+        self.filt = StreamFilter(POINTS, PARAMS, tile=256)
+
+    def test_remap_matches_rectify(self):
+        frame = board()
+        expected = rectify(Image(frame), POINTS).img
+        gray = self.filt.rectify(frame)
+        self.assertEqual(gray.shape, expected.shape)
+        diff = cv.absdiff(gray, expected)
+        self.assertLess(diff.mean(), 2.0)
+
+    def test_unchanged_frame(self):
+        frame = board()
+        _, changed = self.filt.process(frame)
+        self.assertGreater(changed, 1)
+        _, changed = self.filt.process(frame)
+        self.assertEqual(changed, 0)
+
+    def test_only_changed_tiles_match_full_filter(self):
+        frame = board()
+        self.filt.process(frame)
+
+        # Scribble in one spot
+        cv.circle(frame, (300, 250), 15, (0, 0, 0), -1)
+        output, changed = self.filt.process(frame)
+        # The 4 tiles it touches, and those around them
+        self.assertGreaterEqual(changed, 1)
+        self.assertLessEqual(changed, 16)
+
+        full = Image(self.filt.rectify(frame))
+        letterforms(full, **PARAMS)
+        np.testing.assert_array_equal(output, full.img)
+
+    def test_small_mark(self):
+        frame = board()
+        self.filt.process(frame)
+
+        cv.putText(
+            frame, "x", (300, 250), cv.FONT_HERSHEY_SIMPLEX, 0.5, (30, 30, 30), 1
+        )
+        output, changed = self.filt.process(frame)
+        self.assertGreaterEqual(changed, 1)
+
+        full = Image(self.filt.rectify(frame))
+        letterforms(full, **PARAMS)
+        np.testing.assert_array_equal(output, full.img)
+
+    def test_neighbours_within_halo(self):
+        # Frames already rectified, so ink can be put exactly at a tile edge
+        filt = StreamFilter(POINTS, PARAMS, tile=64)
+        filt.rectify = lambda frame: frame
+        gray = np.full((256, 256), 220, dtype=np.uint8)
+        cv.putText(gray, "AB", (100, 150), cv.FONT_HERSHEY_SIMPLEX, 1, 30, 2)
+        filt.process(gray.copy())
+
+        # New ink ending at the last column of tile (0, 0)
+        gray[20:40, 56:64] = 30
+        output, _ = filt.process(gray.copy())
+
+        full = Image(gray)
+        letterforms(full, **PARAMS)
+        np.testing.assert_array_equal(output, full.img)
+
+    def test_native(self):
+        frame = board()
+        params = with_resolution(PARAMS, True, None)
+        filt = StreamFilter(POINTS, params, tile=64)
+        expected, factor = rectify_native(Image(frame), POINTS)
+        gray = filt.rectify(frame)
+        self.assertEqual(gray.shape, expected.img.shape)
+        self.assertLess(cv.absdiff(gray, expected.img).mean(), 2.0)
+        self.assertEqual(filt.params, scale_params(PARAMS, factor))
+
+        output, _ = filt.process(frame)
+        self.assertEqual(output.shape, expected.img.shape)
+
+
+class TestReadFrames(unittest.TestCase):
+    def test_folder_in_name_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for i in [2, 0, 1]:
+                img = np.full((4, 4, 3), i, dtype=np.uint8)
+                cv.imwrite(os.path.join(tmp, "{}.png".format(i)), img)
+            open(os.path.join(tmp, "notes.txt"), "w").close()
+
+            frames = list(read_frames(tmp))
+        self.assertEqual([f[0, 0, 0] for f in frames], [0, 1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+import argparse
+import itertools as it
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+import numpy as np  # type: ignore
+from . import test
+from .experiment import from_records, load_results, save_results
+from .test import (
+    PARAM_RANGES,
+    SPACE_SIZE,
+    merge,
+    params_at,
+    parse_shard,
+    run_shard,
+    shard_file,
+    shard_indices,
+)
+
+
+class TestShards(unittest.TestCase):
+    def test_params_at_follows_product_order(self):
+        product = it.product(*[values for _, values in PARAM_RANGES])
+        for index, values in enumerate(it.islice(product, 50)):
+            params = params_at(index)
+            self.assertEqual([params[name] for name, _ in PARAM_RANGES], list(values))
+        self.assertEqual(SPACE_SIZE, 14 * 4 * 11 * 14 * 29)
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/5"), (2, 5))
+        for bad in ["5/5", "a/2", "1", "-1/2"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_shard(bad)
+
+    def test_same_seed_same_sample(self):
+        a = shard_indices(3, 100, (0, 1))
+        np.testing.assert_array_equal(a, shard_indices(3, 100, (0, 1)))
+        self.assertFalse(np.array_equal(a, shard_indices(4, 100, (0, 1))))
+
+    def test_shards_disjoint_and_complete(self):
+        whole = shard_indices(3, 100, (0, 1))
+        shards = [shard_indices(3, 100, (i, 3)) for i in range(3)]
+        joined = np.concatenate(shards)
+        self.assertEqual(len(joined), 100)
+        self.assertEqual(set(joined), set(whole))
+
+    def test_unsplit_sweep_writes_results(self):
+        self.assertEqual(shard_file("out", (0, 1)).name, "results.npy")
+        self.assertEqual(shard_file("out", (1, 3)).name, "shard_1of3.npy")
+
+
+class TestMerge(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_shard(self, name, ids):
+        path = os.path.join(self.tmp.name, name)
+        save_results(path, from_records([{"id": i, "area": i} for i in ids]))
+        return path
+
+    def merge(self, paths, force=False):
+        merge(argparse.Namespace(merge=paths, output=self.tmp.name, force=force))
+
+    def test_merge_sorted(self):
+        paths = [self.write_shard("a.npy", [5, 1]), self.write_shard("b.npy", [3])]
+        self.merge(paths)
+        results = load_results(os.path.join(self.tmp.name, "results.npy"))
+        self.assertEqual(list(results["id"]), [1, 3, 5])
+        self.assertEqual(list(results["area"]), [1, 3, 5])
+
+    def test_overlap_rejected(self):
+        paths = [self.write_shard("a.npy", [1, 2]), self.write_shard("b.npy", [2])]
+        with self.assertRaises(ValueError):
+            self.merge(paths)
+
+    def test_earlier_results_kept_without_force(self):
+        paths = [self.write_shard("a.npy", [1])]
+        self.merge(paths)
+        labels = os.path.join(self.tmp.name, "labels.log")
+        with open(labels, "w") as f:
+            f.write("1 1\n")
+
+        paths = [self.write_shard("b.npy", [2])]
+        with self.assertRaises(FileExistsError):
+            self.merge(paths)
+        self.assertTrue(os.path.exists(labels))
+
+        self.merge(paths, force=True)
+        results = load_results(os.path.join(self.tmp.name, "results.npy"))
+        self.assertEqual(list(results["id"]), [2])
+        self.assertFalse(os.path.exists(labels))
+
+
+class TestRunShard(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        # The sweep itself is replaced by a tiny one
+        img = np.zeros((4, 4, 3), dtype=np.uint8)
+        for patch in [
+            mock.patch.object(test.cv, "imread", return_value=img),
+            mock.patch.object(test, "transform_img", return_value=img),
+            mock.patch.object(test, "pipeline", return_value=img),
+        ]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def run_shard(self, shard=(0, 1), force=False):
+        args = argparse.Namespace(
+            image="board.jpg",
+            output=self.tmp.name,
+            seed=0,
+            samples=3,
+            shard=shard,
+            force=force,
+        )
+        with mock.patch("builtins.print"):
+            run_shard(args)
+
+    def files(self):
+        return sorted(os.listdir(self.tmp.name))
+
+    def test_new_sweep_replaces_old(self):
+        self.run_shard()
+        old = self.files()
+        for name in ["signatures.npy", "labels.log", "shard_0of2.npy"]:
+            Path(self.tmp.name, name).touch()
+
+        with self.assertRaises(FileExistsError):
+            self.run_shard()
+        self.assertEqual(len(self.files()), len(old) + 3)
+
+        self.run_shard(force=True)
+        self.assertEqual(self.files(), old)
+
+    def test_shard_only_minds_its_own_file(self):
+        self.run_shard((0, 2))
+        self.run_shard((1, 2))
+        with self.assertRaises(FileExistsError):
+            self.run_shard((1, 2))
+        outputs = [f for f in self.files() if f.startswith("out_")]
+        self.assertEqual(len(outputs), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
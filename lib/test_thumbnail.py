@@ -0,0 +1,90 @@
+import unittest
+import io
+import tempfile
+from argparse import Namespace
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from . import thumbnail
+from .headless import HeadlessBackend
+from .thumbnail import build_pyramid, is_fresh, sidecar_path, thumb_path
+from .window import Window
+
+POINTS = [(0, 0), (299, 0), (299, 199), (0, 199)]
+FIXED = [(20, 10), (280, 0), (299, 199), (0, 180)]
+
+
+class TestPyramid(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patch = mock.patch.object(thumbnail, "THUMB_FOLDER", self.tmp.name)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        self.photo = Path(self.tmp.name, "board.png")
+        img = np.random.default_rng(0).integers(0, 256, (200, 300, 3), np.uint8)
+        cv.imwrite(str(self.photo), img)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fresh_only_for_same_points(self):
+        self.assertFalse(is_fresh(self.photo, self.photo.name, POINTS))
+        build_pyramid(self.photo, POINTS, self.photo.name)
+        self.assertTrue(is_fresh(self.photo, self.photo.name, POINTS))
+        self.assertFalse(is_fresh(self.photo, self.photo.name, FIXED))
+
+    def test_rebuilt_when_points_fixed(self):
+        build_pyramid(self.photo, POINTS, self.photo.name)
+        before = thumb_path(self.photo.name, 0).read_bytes()
+        build_pyramid(self.photo, FIXED, self.photo.name)
+        self.assertNotEqual(thumb_path(self.photo.name, 0).read_bytes(), before)
+        self.assertTrue(is_fresh(self.photo, self.photo.name, FIXED))
+
+    def test_interrupted_rebuild_not_fresh(self):
+        build_pyramid(self.photo, POINTS, self.photo.name)
+        with mock.patch.object(cv, "imencode", return_value=(False, None)):
+            with self.assertRaises(ValueError):
+                build_pyramid(self.photo, FIXED, self.photo.name)
+        self.assertFalse(sidecar_path(self.photo.name).exists())
+        self.assertFalse(is_fresh(self.photo, self.photo.name, POINTS))
+
+
+class TestBrowse(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patch = mock.patch.object(thumbnail, "THUMB_FOLDER", self.tmp.name)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_missing_photo_drawn_as_placeholder(self):
+        photo = Path(self.tmp.name, "board.png")
+        cv.imwrite(str(photo), np.full((200, 300, 3), 255, np.uint8))
+        assets = [(photo, POINTS), (Path(self.tmp.name, "gone.png"), POINTS)]
+        mgr = mock.MagicMock()
+        mgr.__len__.return_value = len(assets)
+        mgr.get.side_effect = lambda i: assets[i]
+
+        backend = HeadlessBackend([], keep_frames=True, quit_after=0.2)
+        args = Namespace(cols=2, rows=1, page=0)
+        out = io.StringIO()
+        with mock.patch.object(
+            thumbnail, "AssetManager", return_value=mgr
+        ), mock.patch.object(
+            thumbnail, "get_window", return_value=Window(backend)
+        ), redirect_stdout(
+            out
+        ):
+            thumbnail.browse(args)
+
+        self.assertEqual(len(backend.images), 1)
+        self.assertIn("asset 1", out.getvalue())
+        # Below the labels, the first cell shows the white board and the
+        # second the placeholder
+        page = backend.images[0][40:]
+        half = page.shape[1] // 2
+        self.assertEqual(page[:, :half].max(), 255)
+        self.assertLess(page[:, half:].max(), 255)
@@ -0,0 +1,49 @@
+import unittest
+import random
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .filter import PRESETS, gen_parameters, letterforms
+from .image import Image
+from .tiled import TiledFilter, strips
+
+
+# Writing large enough to cross several strips, on a noisy board
+def board() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    img = np.clip(rng.normal(190, 3, (600, 500)), 0, 255).astype(np.uint8)
+    for y in range(60, 600, 70):
+        cv.putText(img, "E=mc^2", (20, y), cv.FONT_HERSHEY_SIMPLEX, 2, 40, 5)
+    cv.line(img, (250, 0), (260, 600), 30, 4)
+    return img
+
+
+class TestStrips(unittest.TestCase):
+    def test_cover_rows(self):
+        parts = strips(100, 30, 5)
+        self.assertEqual(
+            parts,
+            [(0, 30, 0, 35), (30, 60, 25, 65), (60, 90, 55, 95), (90, 100, 85, 100)],
+        )
+
+    def test_bad_strip(self):
+        with self.assertRaises(ValueError):
+            strips(100, 0, 5)
+
+
+class TestTiledFilter(unittest.TestCase):
+    def test_same_as_whole_board(self):
+        random.seed(1)
+        params = [PRESETS["default"]] + [next(gen_parameters()) for _ in range(2)]
+        with TiledFilter(workers=2, strip=64) as tiled:
+            for p in params:
+                expected = Image(board())
+                letterforms(expected, **p)
+
+                img = Image(board())
+                tiled.letterforms(img, p)
+                self.assertTrue(np.array_equal(img.img, expected.img), p)
+
+    def test_only_grayscale(self):
+        with TiledFilter(workers=1) as tiled:
+            with self.assertRaises(ValueError):
+                tiled.letterforms(Image(np.zeros((10, 10, 3), np.uint8)), {})
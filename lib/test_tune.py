@@ -0,0 +1,137 @@
+import unittest
+import io
+import tempfile
+import time
+from argparse import Namespace
+from contextlib import redirect_stdout
+from copy import copy
+from pathlib import Path
+from unittest import mock
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from . import tune
+from .filter import PRESETS, letterforms, scale_params
+from .headless import HeadlessBackend
+from .image import Image
+from .window import X_MAX, Y_MAX, Window
+
+PROXY_SCALE = 0.5
+IDLE = 0.2
+# How long each render takes, long enough for a slider to move mid way
+RENDER_TIME = 0.1
+
+
+def board() -> Image:
+    img = np.full((300, 400), 200, dtype=np.uint8)
+    cv.putText(img, "a+b", (40, 160), cv.FONT_HERSHEY_SIMPLEX, 3, 40, 8)
+    return Image(img)
+
+
+def expected(img: Image, params, factor: float) -> np.ndarray:
+    img = copy(img)
+    letterforms(img, **scale_params(params, factor))
+    img.scale_bounded(X_MAX, Y_MAX)
+    return img.img
+
+
+class TestRender(unittest.TestCase):
+    def test_same_as_whole_board(self):
+        img = Image(np.tile(board().img, (3, 1)))
+        result = tune.render(img, PRESETS["default"])
+        self.assertTrue(
+            np.array_equal(result.img, expected(img, PRESETS["default"], 1))
+        )
+
+    def test_stale(self):
+        # Goes stale once the first strip is filtered
+        checks = []
+
+        def stale():
+            checks.append(1)
+            return len(checks) > 1
+
+        img = Image(np.tile(board().img, (3, 1)))
+        self.assertIsNone(tune.render(img, PRESETS["default"], stale))
+        self.assertEqual(len(checks), 2)
+
+
+class TestTune(unittest.TestCase):
+    def run_tune(self, script):
+        backend = HeadlessBackend(script, keep_frames=True)
+        rendered = []
+        render = tune.render
+
+        def slow_render(img, params, stale=lambda: False):
+            rendered.append(params)
+            time.sleep(RENDER_TIME)
+            return render(img, params, stale)
+
+        mgr = mock.Mock()
+        with tempfile.TemporaryDirectory() as tmp:
+            # Only read to be rectified, which is replaced by board
+            photo = Path(tmp, "board.png")
+            cv.imwrite(str(photo), board().img)
+            mgr.get.return_value = (photo, [])
+
+            args = Namespace(n=0, preset="default", proxy_scale=PROXY_SCALE, idle=IDLE)
+            with mock.patch.object(
+                tune, "AssetManager", return_value=mgr
+            ), mock.patch.object(
+                tune, "rectify", return_value=board()
+            ), mock.patch.object(
+                tune, "get_window", return_value=Window(backend)
+            ), mock.patch.object(
+                tune, "render", slow_render
+            ), redirect_stdout(
+                io.StringIO()
+            ):
+                tune.tune(args)
+        return backend, rendered
+
+    def test_proxy_then_full(self):
+        backend, _ = self.run_tune(
+            [{"t": 0.6, "type": "trackbar", "name": "Area", "value": 40}]
+        )
+        params = PRESETS["default"]
+        moved = dict(params, area=40)
+        proxy = copy(board())
+        proxy.scale(PROXY_SCALE)
+
+        # Proxy and full renders of the preset, then of the moved slider
+        expect = [
+            expected(proxy, params, PROXY_SCALE),
+            expected(board(), params, 1),
+            expected(proxy, moved, PROXY_SCALE),
+            expected(board(), moved, 1),
+        ]
+        self.assertEqual(len(backend.images), len(expect))
+        for i, (image, frame) in enumerate(zip(backend.images, expect)):
+            self.assertTrue(np.array_equal(image, frame), i)
+
+        # The proxy follows the slider straight away, the full render
+        # only once it has been left alone
+        times = [t for t, _ in backend.frames]
+        self.assertLess(times[2], 0.6 + IDLE)
+        self.assertGreaterEqual(times[3], 0.6 + IDLE)
+
+    def test_stale_render_discarded(self):
+        # The second move lands while the proxy of the first renders
+        backend, rendered = self.run_tune(
+            [
+                {"t": 0.6, "type": "trackbar", "name": "Area", "value": 40},
+                {"t": 0.65, "type": "trackbar", "name": "Area", "value": 60},
+            ]
+        )
+        first = dict(PRESETS["default"], area=40)
+        self.assertIn(scale_params(first, PROXY_SCALE), rendered)
+
+        proxy = copy(board())
+        proxy.scale(PROXY_SCALE)
+        stale = expected(proxy, first, PROXY_SCALE)
+        latest = expected(board(), dict(PRESETS["default"], area=60), 1)
+        self.assertFalse(any(np.array_equal(image, stale) for image in backend.images))
+        self.assertTrue(np.array_equal(backend.images[-1], latest))
+
+
+if __name__ == "__main__":
+    unittest.main()
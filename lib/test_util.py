@@ -0,0 +1,44 @@
+import unittest
+import os
+import tempfile
+from pathlib import Path
+from .util import UMASK, atomic_write
+
+
+class TestAtomicWrite(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name, "results.npy")
+        self.path.write_text("old")
+
+    def test_replaces(self):
+        with atomic_write(str(self.path)) as tmp:
+            # Keeps the suffix, for writers that go by it
+            self.assertEqual(tmp.suffix, ".npy")
+            tmp.write_text("new")
+            self.assertEqual(self.path.read_text(), "old")
+        self.assertEqual(self.path.read_text(), "new")
+        self.assertEqual(os.listdir(self.tmp.name), ["results.npy"])
+        self.assertEqual(self.path.stat().st_mode & 0o777, 0o666 & ~UMASK)
+
+    def test_writers_never_share(self):
+        # The last one to finish wins, whole
+        with atomic_write(self.path) as first, atomic_write(self.path) as second:
+            self.assertNotEqual(first, second)
+            second.write_text("second")
+            first.write_text("first")
+        self.assertEqual(self.path.read_text(), "first")
+        self.assertEqual(os.listdir(self.tmp.name), ["results.npy"])
+
+    def test_failed_write_leaves_original(self):
+        with self.assertRaises(RuntimeError):
+            with atomic_write(self.path) as tmp:
+                tmp.write_text("partial")
+                raise RuntimeError
+        self.assertEqual(self.path.read_text(), "old")
+        self.assertEqual(os.listdir(self.tmp.name), ["results.npy"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import io
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .image import Image
+from .vector import read_polylines, render, trace, write_polylines, write_svg
+
+
+def letters() -> Image:
+    img = np.full((200, 400), 255, dtype=np.uint8)
+    cv.putText(img, "BOARD", (10, 140), cv.FONT_HERSHEY_SIMPLEX, 3, 0, 12)
+    return Image(img)
+
+
+def overlap(a: np.ndarray, b: np.ndarray) -> float:
+    ink_a, ink_b = a == 0, b == 0
+    return (ink_a & ink_b).sum() / (ink_a | ink_b).sum()
+
+
+class TestTrace(unittest.TestCase):
+    def test_ring_with_hole(self):
+        img = np.full((50, 50), 255, dtype=np.uint8)
+        cv.rectangle(img, (10, 10), (39, 39), 0, -1)
+        cv.rectangle(img, (20, 20), (29, 29), 255, -1)
+
+        [rings] = list(trace(Image(img), 0.5))
+        self.assertEqual(len(rings), 2)
+        self.assertEqual(len(rings[0]), 4)
+        np.testing.assert_array_equal(render(50, 50, [rings]).img, img)
+
+    def test_needs_grayscale(self):
+        with self.assertRaises(ValueError):
+            list(trace(Image(np.zeros((10, 10, 3), dtype=np.uint8))))
+
+    def test_render_close_to_original(self):
+        img = letters()
+        rendered = render(img.x_res, img.y_res, trace(img, 1.0))
+        self.assertGreater(overlap(img.img, rendered.img), 0.95)
+
+
+class TestFormats(unittest.TestCase):
+    def test_polyline_round_trip(self):
+        img = letters()
+        components = list(trace(img))
+        f = io.BytesIO()
+        write_polylines(f, img.x_res, img.y_res, components)
+
+        width, height, read = read_polylines(f.getvalue())
+        self.assertEqual((width, height), (400, 200))
+        self.assertEqual(len(read), len(components))
+        for rings, read_rings in zip(components, read):
+            for ring, read_ring in zip(rings, read_rings):
+                np.testing.assert_array_equal(ring, read_ring)
+
+    def test_smaller_than_png(self):
+        img = letters()
+        f = io.BytesIO()
+        write_polylines(f, img.x_res, img.y_res, trace(img))
+        _, png = cv.imencode(".png", img.img)
+        self.assertLess(len(f.getvalue()), len(png) / 2)
+
+    def test_svg(self):
+        img = letters()
+        f = io.BytesIO()
+        write_svg(f, img.x_res, img.y_res, trace(img))
+        svg = f.getvalue().decode()
+        self.assertTrue(svg.startswith("<svg"))
+        self.assertEqual(svg.count("<path"), len(list(trace(img))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import cv2 as cv
+import numpy as np
+from .image import Image
+from .viewer import Pyramid, TiledViewer
+
+VIEWPORT = (200, 100)
+
+
+def board(x: int, y: int) -> Image:
+    arr = np.zeros((y, x, 3), dtype="uint8")
+    arr[:, :, 0] = np.arange(x, dtype="uint32")[None, :] % 256
+    return Image(arr)
+
+
+class TestPyramid(unittest.TestCase):
+    def test_halves(self):
+        pyramid = Pyramid(np.zeros((400, 800), dtype="uint8"))
+        level, scale = pyramid.level(2)
+        self.assertEqual((100, 200), level.shape)
+        self.assertEqual(0.25, scale)
+
+    def test_level_has_enough_detail(self):
+        pyramid = Pyramid(np.zeros((4000, 4000), dtype="uint8"))
+        for zoom in [0.01, 0.1, 0.3, 0.5, 0.9, 1.0, 4.0]:
+            _, scale = pyramid.level(pyramid.level_for(zoom))
+            self.assertGreaterEqual(scale, min(zoom, 1.0))
+            self.assertLess(scale, 2 * zoom)
+
+
+class TestTiledViewer(unittest.TestCase):
+    def test_frame_size_constant(self):
+        viewer = TiledViewer(board(3000, 1000), VIEWPORT)
+        for _ in range(10):
+            self.assertEqual((100, 200, 3), viewer.render().shape)
+            viewer.zoom_at(50, 50, 2)
+
+    def test_fit_shows_everything(self):
+        img = board(400, 100)
+        viewer = TiledViewer(img, VIEWPORT)
+        frame = viewer.render()
+        # Half size fits the width, leaving a border above and below
+        half = cv.resize(img.img, (200, 50), interpolation=cv.INTER_AREA)
+        self.assertTrue(np.array_equal(half, frame[25:75]))
+        self.assertFalse(frame[:25].any())
+        self.assertFalse(frame[75:].any())
+
+    def test_zoom_keeps_point_under_cursor(self):
+        viewer = TiledViewer(board(2000, 1000), VIEWPORT)
+        before = viewer.to_image(30, 70)
+        viewer.zoom_at(30, 70, 4)
+        after = viewer.to_image(30, 70)
+        self.assertAlmostEqual(before[0], after[0])
+        self.assertAlmostEqual(before[1], after[1])
+
+    def test_full_resolution_pixels(self):
+        img = board(1000, 1000)
+        viewer = TiledViewer(img, VIEWPORT)
+        viewer.zoom = 1.0
+        viewer.cx, viewer.cy = 500, 500
+        frame = viewer.render()
+        expected = img.img[450:550, 400:600]
+        self.assertTrue(np.array_equal(expected, frame))
+
+    def test_drag_pans(self):
+        viewer = TiledViewer(board(2000, 1000), VIEWPORT)
+        viewer.zoom_at(100, 50, 4)
+        cx = viewer.cx
+        viewer.handle_mouse(cv.EVENT_LBUTTONDOWN, 100, 50, cv.EVENT_FLAG_LBUTTON)
+        moved = viewer.handle_mouse(cv.EVENT_MOUSEMOVE, 120, 50, cv.EVENT_FLAG_LBUTTON)
+        self.assertTrue(moved)
+        self.assertLess(viewer.cx, cx)
+
+    def test_wheel_zooms(self):
+        viewer = TiledViewer(board(2000, 1000), VIEWPORT)
+        zoom = viewer.zoom
+        viewer.handle_mouse(cv.EVENT_MOUSEWHEEL, 100, 50, 120 << 16)
+        self.assertGreater(viewer.zoom, zoom)
+        viewer.handle_mouse(cv.EVENT_MOUSEWHEEL, 100, 50, -120 << 16)
+        self.assertAlmostEqual(zoom, viewer.zoom)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from . import warp_cache
+from .image import Image
+from .warp_cache import WarpCache, perspective_matrix
+
+POINTS = [(10, 12), (180, 8), (190, 140), (5, 150)]
+
+
+def photo() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (160, 200, 3), dtype=np.uint8)
+
+
+class TestWarpCache(unittest.TestCase):
+    def test_matches_warp_perspective(self):
+        img = photo()
+        matrix, size = perspective_matrix(POINTS)
+        cache = WarpCache()
+        for interpolation in [cv.INTER_LINEAR, cv.INTER_NEAREST, cv.INTER_CUBIC]:
+            expected = cv.warpPerspective(img, matrix, size, flags=interpolation)
+            for _ in range(2):
+                np.testing.assert_array_equal(
+                    cache.warp(img, POINTS, interpolation), expected
+                )
+
+    def test_image_uses_cache_only_when_given(self):
+        cache = WarpCache()
+        plain = Image(photo())
+        plain.perspective_transform(POINTS)
+        cached = Image(photo())
+        cached.perspective_transform(POINTS, cache)
+        np.testing.assert_array_equal(plain.img, cached.img)
+        self.assertEqual(cache.misses, 1)
+
+    def test_same_result_every_call(self):
+        cache = WarpCache()
+        img = photo()
+        first = cache.warp(img, POINTS)
+        cache.warp(img, POINTS)
+        third = cache.warp(img, POINTS)
+        np.testing.assert_array_equal(first, third)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_evicts_least_recent(self):
+        cache = WarpCache(maxsize=1)
+        img = photo()
+        other = [(0, 0), (100, 0), (100, 100), (0, 100)]
+        for points in (POINTS, other, POINTS):
+            cache.warp(img, points)
+        # POINTS was evicted by other, so building it again is a miss
+        self.assertEqual((cache.hits, cache.misses), (0, 3))
+
+    def test_persisted_tables(self):
+        img = photo()
+        with tempfile.TemporaryDirectory() as tmp:
+            first = WarpCache(folder=tmp)
+            expected = first.warp(img, POINTS)
+            self.assertEqual(len(os.listdir(tmp)), 1)
+
+            # A fresh cache loads the saved tables instead of building them
+            second = WarpCache(folder=tmp)
+            with mock.patch.object(warp_cache, "homography_maps") as build:
+                np.testing.assert_array_equal(second.warp(img, POINTS), expected)
+            build.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
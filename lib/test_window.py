@@ -0,0 +1,101 @@
+import unittest
+import asyncio
+import numpy as np
+from .headless import HeadlessBackend
+from .window import Window, KEY_ENTER
+
+frame = np.zeros((10, 10, 3), dtype="uint8")
+
+
+def clicks(*points, t=0.0):
+    return [{"t": t, "type": "click", "x": x, "y": y} for x, y in points]
+
+
+class TestHeadlessWindow(unittest.TestCase):
+    def test_clicks_and_keys(self):
+        script = clicks((1, 2), (3, 4), t=0.01) + [
+            {"t": 0.02, "type": "key", "key": KEY_ENTER}
+        ]
+        win = Window(HeadlessBackend(script))
+        seen = []
+
+        async def run():
+            seen.append(await win.click())
+            seen.append(await win.click())
+            seen.append(await win.keypress())
+
+        self.assertTrue(win.run(run()))
+        self.assertEqual([(1, 2), (3, 4), KEY_ENTER], seen)
+
+    def test_no_lost_clicks(self):
+        # Many clicks arriving at once must all be delivered
+        points = [(i, i) for i in range(20)]
+        win = Window(HeadlessBackend(clicks(*points)))
+        seen = []
+
+        async def run():
+            for _ in points:
+                seen.append(await win.click())
+
+        win.run(run())
+        self.assertEqual(points, seen)
+
+    def test_quit(self):
+        script = [{"t": 0.0, "type": "key", "key": "q"}]
+        win = Window(HeadlessBackend(script))
+
+        async def run():
+            await win.click()
+
+        self.assertFalse(win.run(run()))
+
+    def test_ends_without_quit_key(self):
+        win = Window(HeadlessBackend([], quit_after=0.01))
+
+        async def run():
+            await win.keypress()
+
+        self.assertFalse(win.run(run()))
+
+    def test_latency_recorded(self):
+        backend = HeadlessBackend(clicks((1, 1), (2, 2), t=0.01))
+        win = Window(backend)
+
+        async def run():
+            for _ in range(2):
+                await win.click()
+                win.show(frame)
+
+        win.run(run())
+        report = backend.report()
+        self.assertEqual(2, report["frames"])
+        self.assertEqual(2, report["click"]["count"])
+        self.assertGreaterEqual(report["click"]["p50"], 0)
+
+    def test_first_input_after_idle(self):
+        # However long the window has been idle, input is handled within
+        # about a frame, whether or not anything runs in the background
+        async def forever():
+            await asyncio.sleep(10)
+
+        for background in [[], [forever()]]:
+            backend = HeadlessBackend([{"t": 0.5, "type": "key", "key": "n"}])
+            win = Window(backend)
+
+            async def run():
+                await win.keypress()
+                win.show(frame)
+
+            win.run(run(), background)
+            self.assertLess(backend.report()["key"]["max"], 30)
+
+    def test_frames_kept(self):
+        backend = HeadlessBackend([], keep_frames=True, quit_after=0)
+        win = Window(backend)
+        win.show(frame)
+        self.assertEqual(1, len(backend.images))
+        self.assertEqual(frame.shape, backend.frames[0][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
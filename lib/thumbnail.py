@@ -0,0 +1,233 @@
+# Thumbnails make the asset database quick to browse. Every asset gets
+# a small pyramid of rectified, pre-encoded images, so browsing never
+# has to decode and warp the full resolution photo.
+
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import *
+from .asset_manager import AssetManager, THUMB_FOLDER
+from .image import Image
+from .util import WORKERS, atomic_write
+from .window import X_MAX, Y_MAX, KEY_LEFT, KEY_RIGHT, KEY_SPACE
+from . import get_window
+
+PointType = Tuple[int, int]
+
+# Bounds of each level in the pyramid, smallest first. The largest
+# level matches what view displays, so it never needs the original
+LEVELS = [(256, 256), (1024, 1024), (X_MAX, Y_MAX)]
+
+JPEG_QUALITY = 85
+
+
+def thumb_path(name: str, level: int) -> Path:
+    x, y = LEVELS[level]
+    return Path(THUMB_FOLDER, "{}.{}x{}.jpg".format(name, x, y))
+
+
+# The points each pyramid was made with
+def sidecar_path(name: str) -> Path:
+    return Path(THUMB_FOLDER, "{}.json".format(name))
+
+
+# A pyramid is up to date if every level is at least as new as the
+# source photo, and it was made with the same points. Fixing an asset's
+# points leaves the photo as it was, so the times alone can't tell
+def is_fresh(path: Path, name: str, points: List[PointType]) -> bool:
+    src_time = os.stat(path).st_mtime
+    for level in range(len(LEVELS)):
+        thumb = thumb_path(name, level)
+        if not thumb.exists() or thumb.stat().st_mtime < src_time:
+            return False
+
+    sidecar = sidecar_path(name)
+    if not sidecar.exists():
+        return False
+    with open(sidecar, "r") as f:
+        try:
+            return json.load(f) == [list(p) for p in points]
+        except ValueError:
+            return False
+
+
+# Decodes and rectifies the photo once, then encodes every level. Each
+# level is scaled down from the previous larger one, which is much
+# cheaper than going back to the original each time
+def build_pyramid(path: Path, points: List[PointType], name: str):
+    if is_fresh(path, name, points):
+        return
+
+    os.makedirs(THUMB_FOLDER, exist_ok=True)
+    # Removed before any level is replaced, so a build that stops part
+    # way leaves a pyramid that is rebuilt rather than taken as fresh
+    sidecar = sidecar_path(name)
+    if sidecar.exists():
+        sidecar.unlink()
+
+    img = Image(path)
+    img.perspective_transform(points)
+
+    for level in reversed(range(len(LEVELS))):
+        x_max, y_max = LEVELS[level]
+        if img.x_res > x_max or img.y_res > y_max:
+            img.scale_bounded(x_max, y_max)
+
+        ok, buf = cv.imencode(".jpg", img.img, [cv.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if not ok:
+            raise ValueError("Unable to encode thumbnail for {}".format(name))
+
+        # A reader never sees a partially written thumbnail
+        with atomic_write(thumb_path(name, level)) as tmp, open(tmp, "wb") as f:
+            f.write(buf.tobytes())
+
+    # Written last, so an interrupted build is never taken as fresh
+    with atomic_write(sidecar) as tmp, open(tmp, "w") as f:
+        json.dump([list(p) for p in points], f)
+
+
+# Returns the smallest level that covers a cell of the given size
+def level_for(x: int, y: int) -> int:
+    for level, (x_max, y_max) in enumerate(LEVELS):
+        if x_max >= x and y_max >= y:
+            return level
+    return len(LEVELS) - 1
+
+
+# Builds pyramids in a background pool, so adding assets never waits
+# on the encoding work
+class ThumbnailBuilder:
+    def __init__(self, workers: int = WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+
+    def submit(self, path: Path, points: List[PointType]) -> Future:
+        return self._pool.submit(build_pyramid, path, points, path.name)
+
+    # Loads a single level, building the pyramid first if needed
+    def load(self, path: Path, points: List[PointType], level: int) -> Future:
+        def task():
+            build_pyramid(path, points, path.name)
+            thumb = cv.imread(str(thumb_path(path.name, level)))
+            if thumb is None:
+                raise ValueError("Unable to read thumbnail for {}".format(path.name))
+            return thumb
+
+        return self._pool.submit(task)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+def build_all(args):
+    mgr = AssetManager()
+    builder = ThumbnailBuilder(args.workers)
+    futures = [builder.submit(*mgr.get(i)) for i in range(len(mgr))]
+
+    for i, fut in enumerate(futures):
+        try:
+            fut.result()
+        except Exception as e:
+            print("Unable to build thumbnails for asset {}: {}".format(i, e))
+    builder.shutdown()
+
+
+# Places each thumbnail in the middle of its cell, and labels it with
+# the asset number so it can be used with the other commands
+def compose_page(
+    thumbs: List[Tuple[int, np.ndarray]], cols: int, rows: int
+) -> np.ndarray:
+    cell_x = X_MAX // cols
+    cell_y = Y_MAX // rows
+    canvas = np.zeros((cell_y * rows, cell_x * cols, 3), dtype="uint8")
+
+    for slot, (n, thumb) in enumerate(thumbs):
+        cell = Image(thumb)
+        if cell.x_res > cell_x or cell.y_res > cell_y:
+            cell.scale_bounded(cell_x, cell_y)
+
+        x = (slot % cols) * cell_x + (cell_x - cell.x_res) // 2
+        y = (slot // cols) * cell_y + (cell_y - cell.y_res) // 2
+        canvas[y : y + cell.y_res, x : x + cell.x_res] = cell.img
+
+        cv.putText(
+            canvas,
+            str(n),
+            ((slot % cols) * cell_x + 8, (slot // cols) * cell_y + 28),
+            cv.FONT_HERSHEY_DUPLEX,
+            1,
+            (255, 255, 255),
+        )
+
+    return canvas
+
+
+# Shown in the cell of an asset whose thumbnail can't be loaded
+def placeholder(x: int, y: int) -> np.ndarray:
+    cell = np.full((y, x, 3), 48, dtype="uint8")
+    cv.line(cell, (0, 0), (x - 1, y - 1), (96, 96, 96), 2)
+    cv.line(cell, (x - 1, 0), (0, y - 1), (96, 96, 96), 2)
+    return cell
+
+
+def browse(args):
+    mgr = AssetManager()
+    cols, rows = args.cols, args.rows
+    per_page = cols * rows
+    pages = max(1, -(-len(mgr) // per_page))
+    level = level_for(X_MAX // cols, Y_MAX // rows)
+    builder = ThumbnailBuilder()
+
+    # Pages that are loading or loaded, so flipping back and forth, or
+    # onto the next page, doesn't wait on the disk
+    loaded: Dict[int, List[Future]] = {}
+
+    def request(page: int) -> List[Future]:
+        if page not in loaded:
+            start = page * per_page
+            stop = min(start + per_page, len(mgr))
+            loaded[page] = [
+                builder.load(*mgr.get(i), level) for i in range(start, stop)
+            ]
+        return loaded[page]
+
+    # A missing or unreadable photo only costs its own cell, the rest of
+    # the page is still shown
+    def thumb(n: int, fut: Future) -> np.ndarray:
+        try:
+            return fut.result()
+        except Exception as e:
+            print("Unable to load thumbnail for asset {}: {}".format(n, e))
+            return placeholder(X_MAX // cols, Y_MAX // rows)
+
+    async def pager():
+        page = min(max(args.page, 0), pages - 1)
+        while True:
+            futures = request(page)
+            thumbs = [
+                (n, thumb(n, fut))
+                for n, fut in enumerate(futures, start=page * per_page)
+            ]
+            win.show(Image(compose_page(thumbs, cols, rows)))
+
+            # Start decoding the neighbouring pages while the user looks
+            # at this one
+            for near in (page + 1, page - 1):
+                if 0 <= near < pages:
+                    request(near)
+            # Only pages near this one are kept, so memory stays bounded
+            # however many pages are flipped through
+            for far in [p for p in loaded if abs(p - page) > 2]:
+                del loaded[far]
+
+            k = await win.keypress()
+            if k in (KEY_RIGHT, KEY_SPACE, "n"):
+                page = min(page + 1, pages - 1)
+            elif k in (KEY_LEFT, "p"):
+                page = max(page - 1, 0)
+
+    win = get_window()
+    win.run(pager())
+    builder.shutdown()
@@ -0,0 +1,87 @@
+# Runs the letterform filter over one board across several processes.
+# The area threshold is plain Python, so threads would only take turns
+# with it, and OpenCV's own threading doesn't reach it.
+#
+# The rectified board is split into strips of rows, and each strip is
+# filtered with a halo of rows above and below it, as wide as the filter
+# reaches (see filter.halo). That includes the area threshold's reach, so
+# a component crossing from one strip into the next is counted the same
+# as it would be on the whole board, and only the strip itself is kept
+# from each result. Only a few strips are handed to the workers at a
+# time, so the memory used grows with the strip size, not the board.
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import *
+import numpy as np  # type: ignore
+from .filter import halo, letterforms
+from .image import Image
+from .util import WORKERS
+
+ParamsType = Dict[str, Any]
+# (y0, y1) of the strip, and (y0, y1) of it with its halo
+StripType = Tuple[int, int, int, int]
+
+# Rows in each strip. Each has up to twice the halo filtered along with
+# it, so much smaller strips waste a lot of work
+DEFAULT_STRIP = 512
+
+
+def strips(height: int, strip: int, margin: int) -> List[StripType]:
+    if strip < 1:
+        raise ValueError("Strips must be at least 1 row")
+    return [
+        (
+            y0,
+            min(y0 + strip, height),
+            max(y0 - margin, 0),
+            min(y0 + strip + margin, height),
+        )
+        for y0 in range(0, height, strip)
+    ]
+
+
+def _filter_strip(gray: np.ndarray, params: ParamsType) -> np.ndarray:
+    img = Image(gray)
+    letterforms(img, **params)
+    return img.img
+
+
+class TiledFilter:
+    def __init__(self, workers: int = WORKERS, strip: int = DEFAULT_STRIP):
+        self.workers = workers
+        self.strip = strip
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+
+    # Same as filter.letterforms, mutating img
+    def letterforms(self, img: Image, params: ParamsType):
+        if not img.is_gray():
+            raise ValueError("Image must be grayscale")
+        gray = img.img
+        out = np.empty_like(gray)
+
+        pending: Dict[Any, StripType] = {}
+        queue = iter(strips(gray.shape[0], self.strip, halo(params)))
+        while True:
+            for y0, y1, hy0, hy1 in queue:
+                fut = self._pool.submit(_filter_strip, gray[hy0:hy1], params)
+                pending[fut] = (y0, y1, hy0, hy1)
+                if len(pending) >= 2 * self.workers:
+                    break
+
+            if not pending:
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                y0, y1, hy0, hy1 = pending.pop(fut)
+                out[y0:y1] = fut.result()[y0 - hy0 : y1 - hy0]
+        img.img = out
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self) -> "TiledFilter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,133 @@
+# Interactive tuning of the letterform parameters. Every slider move
+# re-renders a downscaled proxy of the board straight away, and once the
+# sliders have been left alone the full resolution result replaces it.
+#
+# Only one render runs at a time. A render whose parameters have
+# changed by the time it finishes is thrown away rather than shown, and
+# the next render always uses the latest parameters, so moving a slider
+# quickly never builds up a queue of work. Renders are done a strip of
+# rows at a time, and one that goes stale stops at the end of the strip
+# it's on, so a slow full resolution render doesn't hold up the proxy
+# render after it.
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from typing import *
+import numpy as np  # type: ignore
+from .asset_manager import AssetManager
+from .filter import PRESETS, halo, letterforms, rectify, scale_params
+from .image import Image
+from .tiled import DEFAULT_STRIP, strips
+from .warp_cache import WarpCache
+from .window import X_MAX, Y_MAX
+from . import get_window
+
+ParamsType = Dict[str, Any]
+
+# Each slider maps the integer trackbar position onto a parameter.
+# Entries are (trackbar name, parameter, maximum position, position to
+# value, value to position)
+SLIDERS = [
+    ("Blur kernel", "blur_kernel", 30, lambda v: 2 * max(v, 1) + 1, lambda p: p // 2),
+    (
+        "Block size",
+        "adaptive_thresh_block",
+        30,
+        lambda v: 2 * max(v, 1) + 1,
+        lambda p: p // 2,
+    ),
+    ("C x10", "adaptive_c", 100, lambda v: v / 10, lambda p: round(p * 10)),
+    (
+        "Percent black x1000",
+        "thresh_percent",
+        200,
+        lambda v: v / 1000,
+        lambda p: round(p * 1000),
+    ),
+    ("Area", "area", 200, lambda v: max(v, 1), lambda p: p),
+]
+
+
+# Filters the board and scales it to fit on screen. Returns None if
+# stale returns True before the last strip is filtered
+def render(
+    img: Image, params: ParamsType, stale: Callable[[], bool] = lambda: False
+) -> Optional[Image]:
+    gray = img.img
+    out = np.empty_like(gray)
+    for y0, y1, hy0, hy1 in strips(gray.shape[0], DEFAULT_STRIP, halo(params)):
+        if stale():
+            return None
+        strip = Image(gray[hy0:hy1])
+        letterforms(strip, **params)
+        out[y0:y1] = strip.img[y0 - hy0 : y1 - hy0]
+
+    result = Image(out)
+    result.scale_bounded(X_MAX, Y_MAX)
+    return result
+
+
+def tune(args):
+    mgr = AssetManager()
+    path, points = mgr.get(args.n)
+    # Tuning the same asset again loads the saved tables
+    warps = WarpCache(maxsize=1, folder=str(mgr.warp_folder))
+    full = rectify(Image(path), points, warps)
+    proxy = copy(full)
+    proxy.scale(args.proxy_scale)
+
+    params = dict(PRESETS[args.preset])
+    win = get_window()
+    for name, key, maximum, _, to_pos in SLIDERS:
+        win.trackbar(name, to_pos(params[key]), maximum)
+
+    # Bumped on every change, renders remember the generation they
+    # started with to tell if they are stale
+    generation = 0
+    changed = asyncio.Event()
+    pool = ThreadPoolExecutor(max_workers=1)
+
+    async def watch():
+        nonlocal generation
+        while True:
+            name, pos = await win.trackbar_change()
+            for slider, key, _, to_value, _ in SLIDERS:
+                if slider == name:
+                    params[key] = to_value(pos)
+            generation += 1
+            changed.set()
+
+    async def draw(img: Image, factor: float) -> bool:
+        started = generation
+        result = await asyncio.get_running_loop().run_in_executor(
+            pool,
+            render,
+            img,
+            scale_params(params, factor),
+            lambda: started != generation,
+        )
+        if result is None or started != generation:
+            return False
+        win.show(result)
+        return True
+
+    async def renderer():
+        while True:
+            changed.clear()
+            if not await draw(proxy, args.proxy_scale):
+                continue
+
+            # Wait for the sliders to settle before the expensive render
+            try:
+                await asyncio.wait_for(changed.wait(), args.idle)
+                continue
+            except asyncio.TimeoutError:
+                pass
+
+            await draw(full, 1.0)
+            await changed.wait()
+
+    win.run(renderer(), [watch()])
+    pool.shutdown(wait=False)
+    print(params)
@@ -0,0 +1,43 @@
+# Small helpers shared by the commands. Only the standard library is
+# used here, so the command line can import it without OpenCV.
+
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import *
+
+# Default for every --workers option, and every pool that isn't told
+# how many workers to use
+WORKERS = os.cpu_count() or 1
+
+# Read once up front, as the only way to read it also sets it
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+# Yields a temporary path beside path, and once the block is done
+# writing to it, swaps it in for path. Readers only ever see the old
+# file or the whole of the new one, never part of it, and an
+# interrupted write leaves path as it was. Every writer gets its own
+# temporary path, so writers of the same file never write into each
+# other's. It keeps the suffix of path, for writers that pick the
+# format by it
+@contextmanager
+def atomic_write(path: Union[str, Path]) -> Iterator[Path]:
+    path = Path(path)
+    fd, name = tempfile.mkstemp(
+        dir=path.parent, prefix=path.stem + ".", suffix=path.suffix
+    )
+    os.close(fd)
+    tmp = Path(name)
+    # mkstemp makes the file private, but it should end up like any
+    # other file that's written
+    os.chmod(tmp, 0o666 & ~UMASK)
+    try:
+        yield tmp
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    os.replace(tmp, path)
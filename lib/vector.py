@@ -0,0 +1,160 @@
+# Turns the black and white output of the letterform filter into
+# outlines. Each surviving component is traced, simplified with
+# Douglas-Peucker, and written out as it's traced, so only one
+# component's outline is held at a time.
+#
+# Two formats are written:
+#   SVG, one evenodd filled path per component, for viewing anywhere
+#   BVPL, a compact binary format, laid out as
+#     MAGIC, then the width and height as little endian uint32
+#     per component, the number of rings, then per ring the number of
+#     points and each point as the difference from the one before it
+#   Every number after the header is a zigzag encoded varint, so most
+#   points take two bytes.
+#
+# A component is a list of rings, its outer edge followed by any holes.
+
+import struct
+from typing import *
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .image import Image
+
+Component = List[np.ndarray]
+
+MAGIC = b"BVPL0001"
+HEADER = struct.Struct("<II")
+
+# Pixels an outline may stray from the traced edge when simplified
+DEFAULT_TOLERANCE = 1.0
+
+
+# Yields the simplified outline of every black component of a binary
+# image, in the order the components were labelled
+def trace(img: Image, tolerance: float = DEFAULT_TOLERANCE) -> Iterator[Component]:
+    if not img.is_gray():
+        raise ValueError("Image must be grayscale")
+
+    ink = (img.img == 0).astype(np.uint8)
+    n, labels, stats, _ = cv.connectedComponentsWithStats(ink, connectivity=8)
+
+    # Label 0 is the background
+    for k in range(1, n):
+        x, y, w, h = stats[k, :4]
+        # Pad so contours never touch the edge of the crop
+        mask = np.pad((labels[y : y + h, x : x + w] == k).astype(np.uint8), 1)
+        contours, _ = cv.findContours(
+            mask, cv.RETR_CCOMP, cv.CHAIN_APPROX_SIMPLE, offset=(x - 1, y - 1)
+        )
+
+        rings = []
+        for contour in contours:
+            ring = cv.approxPolyDP(contour, tolerance, True)
+            rings.append(ring.reshape(-1, 2))
+        yield rings
+
+
+# Draws components back into a binary image, black on white
+def render(width: int, height: int, components: Iterable[Component]) -> Image:
+    img = np.full((height, width), 255, dtype=np.uint8)
+    for rings in components:
+        # Fill the outer edge, then cut the holes back out. Hole rings
+        # run along the ink around the hole, so that edge is redrawn
+        outer, holes = rings[0], rings[1:]
+        cv.fillPoly(img, [outer.astype(np.int32)], 0)
+        if holes:
+            cv.fillPoly(img, [h.astype(np.int32) for h in holes], 255)
+            cv.polylines(img, [h.astype(np.int32) for h in holes], True, 0)
+    return Image(img)
+
+
+def write_svg(f: BinaryIO, width: int, height: int, components: Iterable[Component]):
+    f.write(
+        (
+            '<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" '
+            'viewBox="0 0 {0} {1}">\n'
+            '<rect width="{0}" height="{1}" fill="white"/>\n'
+            '<g fill="black" fill-rule="evenodd">\n'
+        )
+        .format(width, height)
+        .encode()
+    )
+    for rings in components:
+        d = " ".join(
+            "M" + " ".join("{} {}".format(x, y) for x, y in ring) + "Z"
+            for ring in rings
+        )
+        f.write('<path d="{}"/>\n'.format(d).encode())
+    f.write(b"</g>\n</svg>\n")
+
+
+def _varint(n: int, out: bytearray):
+    # Zigzag so small negative numbers stay small
+    n = (n << 1) ^ (n >> 63)
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return (n >> 1) ^ -(n & 1), pos
+
+
+def write_polylines(
+    f: BinaryIO, width: int, height: int, components: Iterable[Component]
+):
+    f.write(MAGIC + HEADER.pack(width, height))
+    for rings in components:
+        out = bytearray()
+        _varint(len(rings), out)
+        for ring in rings:
+            _varint(len(ring), out)
+            px = py = 0
+            for x, y in ring.tolist():
+                _varint(x - px, out)
+                _varint(y - py, out)
+                px, py = x, y
+        f.write(out)
+
+
+# Returns the width, height and components of a BVPL file's contents
+def read_polylines(data: bytes) -> Tuple[int, int, List[Component]]:
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError("Not a board vector polyline file")
+    width, height = HEADER.unpack_from(data, len(MAGIC))
+
+    components = []
+    pos = len(MAGIC) + HEADER.size
+    while pos < len(data):
+        n_rings, pos = _read_varint(data, pos)
+        rings = []
+        for _ in range(n_rings):
+            n_points, pos = _read_varint(data, pos)
+            ring = np.empty((n_points, 2), dtype=np.int32)
+            px = py = 0
+            for i in range(n_points):
+                dx, pos = _read_varint(data, pos)
+                dy, pos = _read_varint(data, pos)
+                px, py = px + dx, py + dy
+                ring[i] = (px, py)
+            rings.append(ring)
+        components.append(rings)
+    return width, height, components
+
+
+WRITERS = {".svg": write_svg, ".bvpl": write_polylines}
+
+
+# Traces img and writes it to f in the format named by suffix
+def write_vector(
+    f: BinaryIO, suffix: str, img: Image, tolerance: float = DEFAULT_TOLERANCE
+):
+    WRITERS[suffix](f, img.x_res, img.y_res, trace(img, tolerance))
@@ -0,0 +1,190 @@
+# Zoom and pan viewer for inspecting an image at full resolution.
+#
+# The image is kept as a pyramid, each level half the size of the one
+# before. A redraw picks the smallest level with at least as much detail
+# as the current zoom, and only resizes the part of it that's visible.
+# The work per frame then depends on the size of the window, not on the
+# size of the image.
+
+import cv2 as cv  # type: ignore
+import math
+import numpy as np  # type: ignore
+from typing import *
+from .image import Image
+from .window import Window, X_MAX, Y_MAX, KEY_UP, KEY_DOWN, KEY_LEFT, KEY_RIGHT
+
+# Zoom applied for each notch of the wheel, or press of +/-
+ZOOM_STEP = 1.25
+# Closest zoom allowed, in screen pixels per image pixel
+MAX_ZOOM = 16.0
+# Fraction of the viewport moved by the arrow keys
+PAN_STEP = 0.25
+
+
+class Pyramid:
+    def __init__(self, img: np.ndarray):
+        self.levels = [img]
+
+    # Levels are only made when first needed. Returns the level, plus
+    # its size relative to the full image
+    def level(self, n: int) -> Tuple[np.ndarray, float]:
+        while len(self.levels) <= n:
+            prev = self.levels[-1]
+            size = (max(1, prev.shape[1] // 2), max(1, prev.shape[0] // 2))
+            self.levels.append(cv.resize(prev, size, interpolation=cv.INTER_AREA))
+        level = self.levels[n]
+        return level, level.shape[1] / self.levels[0].shape[1]
+
+    # Index of the smallest level that has at least zoom pixels for
+    # every pixel of the full image
+    def level_for(self, zoom: float) -> int:
+        if zoom >= 1:
+            return 0
+        n = int(math.floor(math.log2(1 / zoom)))
+        smallest = int(math.log2(max(self.levels[0].shape[:2])))
+        return min(n, smallest)
+
+
+class TiledViewer:
+    def __init__(self, img: Image, viewport: Tuple[int, int] = (X_MAX, Y_MAX)):
+        self.pyramid = Pyramid(img.img)
+        self.width = img.x_res
+        self.height = img.y_res
+        self.viewport = viewport
+        # Last position while dragging, None when the button is up
+        self._drag: Optional[Tuple[int, int]] = None
+        self.fit()
+
+    # Shows the whole image, centred
+    def fit(self):
+        vw, vh = self.viewport
+        self.zoom = min(vw / self.width, vh / self.height)
+        self.cx = self.width / 2
+        self.cy = self.height / 2
+
+    def min_zoom(self) -> float:
+        vw, vh = self.viewport
+        return min(vw / self.width, vh / self.height, 1.0)
+
+    # Converts viewport coordinates to image coordinates
+    def to_image(self, x: float, y: float) -> Tuple[float, float]:
+        vw, vh = self.viewport
+        return (
+            self.cx + (x - vw / 2) / self.zoom,
+            self.cy + (y - vh / 2) / self.zoom,
+        )
+
+    # Zooms by factor, keeping the image point under (x, y) in place
+    def zoom_at(self, x: float, y: float, factor: float):
+        ix, iy = self.to_image(x, y)
+        self.zoom = min(max(self.zoom * factor, self.min_zoom()), MAX_ZOOM)
+        vw, vh = self.viewport
+        self.cx = ix - (x - vw / 2) / self.zoom
+        self.cy = iy - (y - vh / 2) / self.zoom
+        self._clamp()
+
+    # Moves the view by dx, dy viewport pixels
+    def pan(self, dx: float, dy: float):
+        self.cx -= dx / self.zoom
+        self.cy -= dy / self.zoom
+        self._clamp()
+
+    def _clamp(self):
+        self.cx = min(max(self.cx, 0), self.width)
+        self.cy = min(max(self.cy, 0), self.height)
+
+    def render(self) -> np.ndarray:
+        vw, vh = self.viewport
+        shape = (vh, vw) + self.pyramid.levels[0].shape[2:]
+        frame = np.zeros(shape, dtype=self.pyramid.levels[0].dtype)
+
+        # Visible part of the image, in image coordinates
+        left = self.cx - vw / 2 / self.zoom
+        top = self.cy - vh / 2 / self.zoom
+        x0, x1 = max(left, 0), min(left + vw / self.zoom, self.width)
+        y0, y1 = max(top, 0), min(top + vh / self.zoom, self.height)
+
+        # Where that lands in the frame
+        dx0, dx1 = round((x0 - left) * self.zoom), round((x1 - left) * self.zoom)
+        dy0, dy1 = round((y0 - top) * self.zoom), round((y1 - top) * self.zoom)
+        if dx1 <= dx0 or dy1 <= dy0:
+            return frame
+
+        level, scale = self.pyramid.level(self.pyramid.level_for(self.zoom))
+        lx0, ly0 = int(x0 * scale), int(y0 * scale)
+        lx1 = max(int(math.ceil(x1 * scale)), lx0 + 1)
+        ly1 = max(int(math.ceil(y1 * scale)), ly0 + 1)
+        visible = level[ly0:ly1, lx0:lx1]
+
+        # Shrinking averages pixels, enlarging keeps them sharp so
+        # single pixels can be inspected
+        interpolation = cv.INTER_AREA if self.zoom < scale else cv.INTER_NEAREST
+        frame[dy0:dy1, dx0:dx1] = cv.resize(
+            visible, (dx1 - dx0, dy1 - dy0), interpolation=interpolation
+        )
+        return frame
+
+    # Handles one raw mouse event. Returns True if the view changed
+    def handle_mouse(self, event: int, x: int, y: int, flags: int) -> bool:
+        if event == cv.EVENT_MOUSEWHEEL:
+            # The wheel delta is in the upper 16 bits of flags
+            factor = ZOOM_STEP if (flags >> 16) > 0 else 1 / ZOOM_STEP
+            self.zoom_at(x, y, factor)
+            return True
+        if event == cv.EVENT_LBUTTONDOWN:
+            self._drag = (x, y)
+        elif event == cv.EVENT_MOUSEMOVE and flags & cv.EVENT_FLAG_LBUTTON:
+            if self._drag is not None:
+                px, py = self._drag
+                self._drag = (x, y)
+                self.pan(x - px, y - py)
+                return True
+        elif event == cv.EVENT_LBUTTONUP:
+            self._drag = None
+        return False
+
+    # Handles a key press. Returns True if the view changed
+    def handle_key(self, key: Union[int, str]) -> bool:
+        vw, vh = self.viewport
+        if key in ("+", "="):
+            self.zoom_at(vw / 2, vh / 2, ZOOM_STEP)
+        elif key == "-":
+            self.zoom_at(vw / 2, vh / 2, 1 / ZOOM_STEP)
+        elif key == "0":
+            self.fit()
+        elif key == KEY_LEFT:
+            self.pan(vw * PAN_STEP, 0)
+        elif key == KEY_RIGHT:
+            self.pan(-vw * PAN_STEP, 0)
+        elif key == KEY_UP:
+            self.pan(0, vh * PAN_STEP)
+        elif key == KEY_DOWN:
+            self.pan(0, -vh * PAN_STEP)
+        else:
+            return False
+        return True
+
+    # Shows the image in win until the user quits
+    def run(self, win: Window):
+        win.track_mouse = True
+
+        async def mouse():
+            while True:
+                changed = self.handle_mouse(*await win.mouse())
+                # Handle everything that queued up during the last
+                # redraw before drawing again
+                event = win.mouse_nowait()
+                while event is not None:
+                    changed = self.handle_mouse(*event) or changed
+                    event = win.mouse_nowait()
+                if changed:
+                    win.show(self.render())
+
+        async def keys():
+            win.show(self.render())
+            while True:
+                if self.handle_key(await win.keypress()):
+                    win.show(self.render())
+
+        win.run(keys(), [mouse()])
+        win.track_mouse = False
@@ -0,0 +1,138 @@
+# Rectifying means projecting the board's 4 points onto a rectangle,
+# and every time warpPerspective works out where each output pixel
+# comes from. Commands that rectify the same asset over and over, like
+# tune and serve, can keep those answers in a WarpCache, as fixed point
+# remap tables, so rectifying the asset again is a single remap. The
+# tables hold exactly what warpPerspective computes, so a cached warp
+# gives the same result as a plain one.
+#
+# Tables are keyed by the points, input shape, output size and
+# interpolation, and the least recently used are dropped once there are
+# more than maxsize. Tables for a 12MP photo take around 70MB, and cost
+# more to build than one plain warp, so Image only uses a cache when
+# given one, and one off batch runs don't pay for them. Given a folder,
+# tables are also saved there and loaded back by later runs.
+
+import hashlib
+import os
+from pathlib import Path
+from typing import *
+import cv2 as cv  # type: ignore
+import numpy as np  # type: ignore
+from .cache import LRUCache
+from .util import atomic_write
+
+PointType = Tuple[int, int]
+KeyType = Tuple[Tuple[PointType, ...], Tuple[int, int], Tuple[int, int], int]
+MapsType = Tuple[np.ndarray, np.ndarray]
+
+DEFAULT_SIZE = 4
+# Fixed point precision OpenCV warps with, fractions of a pixel are in
+# 1 / INTER_TAB_SIZE steps
+INTER_BITS = 5
+INTER_TAB_SIZE = 1 << INTER_BITS
+INT_MIN, INT_MAX = -(2**31), 2**31 - 1
+
+
+# Returns the matrix projecting the quad given by 4 points onto a
+# rectangle, along with the (width, height) of that rectangle
+def perspective_matrix(points: List[PointType]) -> Tuple[np.ndarray, Tuple[int, int]]:
+    if len(points) != 4:
+        raise ValueError("Exactly 4 points must be provided")
+    for x, y in points:
+        if type(x) != int or type(y) != int:
+            raise ValueError("Non integer value passed as point")
+
+    top_left = points[0]
+    top_right = points[1]
+    bottom_right = points[2]
+    bottom_left = points[3]
+
+    source = np.array([top_left, top_right, bottom_right, bottom_left], dtype="float32")
+    maxW = max(top_right[0] - top_left[0], bottom_right[0] - bottom_left[0])
+    maxH = max(bottom_right[1] - top_right[1], bottom_left[1] - top_left[1])
+    # This determines the output size we want to map onto. It's not
+    # perfect, but it's good enough to get the general shape of what
+    # was captured
+    dest = np.array(
+        [(0, 0), (maxW - 1, 0), (maxW - 1, maxH - 1), (0, maxH - 1)],
+        dtype="float32",
+    )
+    return cv.getPerspectiveTransform(source, dest), (maxW, maxH)
+
+
+# Remap tables sampling, for each output pixel at (xs[i], ys[j]) in the
+# space matrix projects onto, from where matrix projected it from. They
+# are worked out in double precision and rounded to fixed point the
+# same way warpPerspective does, so remapping with them gives exactly
+# the same result. Nearest neighbour warps round to whole pixels, and
+# need bits of 0
+def homography_maps(
+    matrix: np.ndarray, xs: np.ndarray, ys: np.ndarray, bits: int = INTER_BITS
+) -> MapsType:
+    grid_x, grid_y = np.meshgrid(xs.astype(np.float64), ys.astype(np.float64))
+    _, inverse = cv.invert(matrix)
+    w = inverse[2, 0] * grid_x + inverse[2, 1] * grid_y + inverse[2, 2]
+    w = np.divide(1 << bits, w, out=np.zeros_like(w), where=w != 0)
+    x = inverse[0, 0] * grid_x + inverse[0, 1] * grid_y + inverse[0, 2]
+    y = inverse[1, 0] * grid_x + inverse[1, 1] * grid_y + inverse[1, 2]
+    # np.rint rounds halves to even, as OpenCV does
+    x = np.rint(np.clip(x * w, INT_MIN, INT_MAX)).astype(np.int32)
+    y = np.rint(np.clip(y * w, INT_MIN, INT_MAX)).astype(np.int32)
+
+    # The whole pixel to sample from, and the fraction between it and
+    # the next one
+    whole = np.dstack([x >> bits, y >> bits])
+    map1 = np.clip(whole, -32768, 32767).astype(np.int16)
+    mask = (1 << bits) - 1
+    map2 = (y & mask) * INTER_TAB_SIZE + (x & mask)
+    return map1, map2.astype(np.uint16)
+
+
+class WarpCache:
+    def __init__(self, maxsize: int = DEFAULT_SIZE, folder: Optional[str] = None):
+        self.folder = folder
+        self._maps: LRUCache[KeyType, MapsType] = LRUCache(maxsize)
+
+    @property
+    def hits(self) -> int:
+        return self._maps.hits
+
+    @property
+    def misses(self) -> int:
+        return self._maps.misses
+
+    def _file(self, key: KeyType) -> Path:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+        return Path(self.folder, "{}.npz".format(digest))
+
+    # Loads the tables for key from the folder, or builds them and saves
+    # them there
+    def _make(self, key: KeyType, matrix: np.ndarray) -> MapsType:
+        if self.folder and self._file(key).exists():
+            with np.load(self._file(key)) as f:
+                return f["map1"], f["map2"]
+
+        width, height = key[2]
+        bits = 0 if key[3] == cv.INTER_NEAREST else INTER_BITS
+        maps = homography_maps(matrix, np.arange(width), np.arange(height), bits)
+        if self.folder:
+            os.makedirs(self.folder, exist_ok=True)
+            with atomic_write(self._file(key)) as tmp:
+                np.savez(tmp, map1=maps[0], map2=maps[1])
+        return maps
+
+    # Same as warpPerspective with the matrix for points
+    def warp(
+        self,
+        img: np.ndarray,
+        points: List[PointType],
+        interpolation: int = cv.INTER_LINEAR,
+    ) -> np.ndarray:
+        matrix, size = perspective_matrix(points)
+        key = (tuple(tuple(p) for p in points), img.shape[:2], size, interpolation)
+        maps = self._maps.get_or_make(key, lambda: self._make(key, matrix))
+        return cv.remap(img, maps[0], maps[1], interpolation)
+
+    def clear(self):
+        self._maps.clear()
@@ -7,7 +7,17 @@ from typing import *
 
 
 WINDOW_NAME = "Board Vector"
-WAIT_PERIOD = 10
+
+# Bounds, in milliseconds, on how long the event pump waits between
+# polls. It polls quickly while the user is interacting, and backs off
+# towards the longer period while the window is idle. The longer one is
+# about a frame, so the first input after a pause isn't noticeably late
+MIN_WAIT_PERIOD = 1
+MAX_WAIT_PERIOD = 16
+
+# Largest image that comfortably fits on screen
+X_MAX = 1850
+Y_MAX = 1000
 
 KEY_UP = 82
 KEY_DOWN = 84
@@ -19,79 +29,174 @@ KEY_ESC = 27
 
 SPECIAL_KEYS = {KEY_UP, KEY_DOWN, KEY_LEFT, KEY_RIGHT, KEY_SPACE, KEY_ENTER, KEY_ESC}
 
-NULL_CODE = 255
+# Depending on the build, waitKey reports no key as either of these
+NULL_CODES = {-1, 255}
 
 PointType = Tuple[int, int]
 
 
+# The calls Window makes to put frames on screen and collect events.
+# This default sends them to a real OpenCV window, lib.headless has one
+# that works without a display
+class CvBackend:
+    def create(self, name: str):
+        cv.namedWindow(name)
+
+    def set_mouse_callback(self, name: str, callback: Callable):
+        cv.setMouseCallback(name, callback, None)
+
+    def imshow(self, name: str, img: np.ndarray):
+        cv.imshow(name, img)
+
+    def wait_key(self, delay: int) -> int:
+        return cv.waitKey(delay)
+
+    def create_trackbar(
+        self, name: str, window: str, value: int, maximum: int, callback: Callable
+    ):
+        cv.createTrackbar(name, window, value, maximum, callback)
+
+
 # Adds a control layer for the OpenCV window and event
 # mangement. Intended to be used as a singleton
 class Window:
-    def __init__(self):
-        cv.namedWindow(WINDOW_NAME)
+    def __init__(self, backend: Any = None):
+        self.backend = backend or CvBackend()
+        self.backend.create(WINDOW_NAME)
+        self._clicks: asyncio.Queue = None
+        self._keys: asyncio.Queue = None
+        self._changes: asyncio.Queue = None
+        self._mouse: asyncio.Queue = None
+        # Raw mouse events are only queued for those who ask, otherwise
+        # every movement over the window would pile up unread
+        self.track_mouse = False
+        self._tasks: List[asyncio.Task] = []
 
     def _setup_callbacks(self):
-        self.loop = asyncio.get_event_loop()
-        self.pos_fut = self.loop.create_future()
+        self._clicks = asyncio.Queue()
+        self._keys = asyncio.Queue()
+        self._changes = asyncio.Queue()
+        self._mouse = asyncio.Queue()
+        self._active = False
 
         def cv_click_callback(event, x, y, flags, params):
+            if self.track_mouse:
+                self._mouse.put_nowait((event, x, y, flags))
+                self._active = True
+
             # Fire only when the button is lifted up
             if event == cv.EVENT_LBUTTONUP:
-                self.pos_fut.set_result((x, y))
+                self._clicks.put_nowait((x, y))
+                self._active = True
 
-        cv.setMouseCallback(WINDOW_NAME, cv_click_callback, None)
+        self.backend.set_mouse_callback(WINDOW_NAME, cv_click_callback)
 
-        self.key_fut = self.loop.create_future()
+    # Runs coro until it completes, or until the user quits. Any
+    # background coroutines run alongside it, and are cancelled once it
+    # finishes. Returns False if the user quit
+    def run(self, coro: Awaitable, background: Iterable[Awaitable] = ()) -> bool:
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._main(coro, background))
+        finally:
+            loop.close()
 
-    def run(self, coro: Awaitable) -> bool:
+    async def _main(self, coro: Awaitable, background: Iterable[Awaitable]) -> bool:
         self._setup_callbacks()
 
-        task = self.loop.create_task(coro)
+        task = asyncio.ensure_future(coro)
+        for bg in background:
+            self.spawn(bg)
+        pump = asyncio.ensure_future(self._pump(task))
 
-        # Drives the events through the usage of waitkey. Without it,
-        # no events will ever be registered
-        def driver():
-            key_code = cv.waitKey(WAIT_PERIOD)
+        try:
+            await task
+            return True
+        except asyncio.CancelledError:
+            return False
+        finally:
+            pump.cancel()
+            for t in self._tasks:
+                t.cancel()
+            self._tasks.clear()
+
+    # Schedules a coroutine to run in the background of the current run
+    def spawn(self, coro: Awaitable) -> asyncio.Task:
+        t = asyncio.ensure_future(coro)
+        self._tasks.append(t)
+        return t
+
+    # Drives the events through the usage of waitkey. Without it, no
+    # events will ever be registered. Between polls the loop is free to
+    # run other tasks, and the pause grows while nothing is happening so
+    # an idle window costs next to nothing. With no background tasks
+    # left to run, the pause is spent inside waitKey instead, which
+    # returns as soon as a key is pressed
+    async def _pump(self, task: asyncio.Task):
+        wait = MIN_WAIT_PERIOD
+        while not task.done():
+            background = any(not t.done() for t in self._tasks)
+            key_code = self.backend.wait_key(1 if background else wait)
             if key_code == ord("q") or key_code == KEY_ESC:
                 # Quit, the user wants out
                 task.cancel()
                 return
-            if key_code != NULL_CODE:
-                if self.key_fut.done():
-                    # Reset our future, so old keys aren't sent
-                    self.key_fut = self.loop.create_future()
-                self.key_fut.set_result(key_code)
-
-            # Reset future to ensure clicks aren't queued
-            if self.pos_fut.done():
-                self.pos_fut = self.loop.create_future()
+            if key_code not in NULL_CODES:
+                self._keys.put_nowait(key_code)
+                self._active = True
 
-            # Keep calling this, driving the main event loop
-            self.loop.call_soon(driver)
+            if self._active:
+                wait = MIN_WAIT_PERIOD
+                self._active = False
+            else:
+                wait = min(wait * 2, MAX_WAIT_PERIOD)
 
-        self.loop.call_soon(driver)
-        try:
-            self.loop.run_until_complete(task)
-            return True
-        except asyncio.CancelledError:
-            return False
+            await asyncio.sleep(wait / 1000 if background else 0)
 
     def run_until_quit(self):
         while True:
-            if cv.waitKey(-1) == ord("q") or key_code == KEY_ESC:
+            key_code = self.backend.wait_key(-1)
+            if key_code == ord("q") or key_code == KEY_ESC:
                 return
 
-    # Returns the X, Y coordinates of the position clicked
+    # Drops any clicks and keys that haven't been handled yet
+    def flush(self):
+        for queue in (self._clicks, self._keys, self._changes, self._mouse):
+            while queue is not None and not queue.empty():
+                queue.get_nowait()
+
+    # Adds a slider to the window, ranging from 0 to maximum. Moving it
+    # queues a change, see trackbar_change
+    def trackbar(self, name: str, value: int, maximum: int):
+        def on_change(v: int):
+            if self._changes is not None:
+                self._changes.put_nowait((name, v))
+                self._active = True
+
+        self.backend.create_trackbar(name, WINDOW_NAME, value, maximum, on_change)
+
+    # Returns the name and new value of the next slider that moved
+    async def trackbar_change(self) -> Tuple[str, int]:
+        return await self._changes.get()
+
+    # Returns the next raw mouse event as (event, x, y, flags). Only
+    # available while track_mouse is set
+    async def mouse(self) -> Tuple[int, int, int, int]:
+        return await self._mouse.get()
+
+    # Like mouse, but returns None straight away if nothing is queued
+    def mouse_nowait(self) -> Optional[Tuple[int, int, int, int]]:
+        if self._mouse is None or self._mouse.empty():
+            return None
+        return self._mouse.get_nowait()
+
+    # Returns the X, Y coordinates of the next position clicked
     async def click(self) -> PointType:
-        p = await self.pos_fut
-        # Reset the future for the next click
-        self.pos_fut = self.loop.create_future()
-        return p
+        return await self._clicks.get()
 
     # Returns the keycode, or the character pressed if possible
     async def keypress(self) -> Union[int, str]:
-        key_code = await self.key_fut
-        self.key_fut = self.loop.create_future()
+        key_code = await self._keys.get()
         if key_code in SPECIAL_KEYS:
             return key_code
         else:
@@ -99,8 +204,8 @@ class Window:
 
     def show(self, img: Image):
         if isinstance(img, Image):
-            cv.imshow(WINDOW_NAME, img.img)
-        elif isinstance(np.ndarray):
-            cv.imshow(WINDOW_NAME, img)
+            self.backend.imshow(WINDOW_NAME, img.img)
+        elif isinstance(img, np.ndarray):
+            self.backend.imshow(WINDOW_NAME, img)
         else:
             raise TypeError
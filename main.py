@@ -1,96 +1,231 @@
 #!/usr/bin/python3
 
+# Only lightweight modules are imported here. Commands that need OpenCV
+# or numpy name their runner as "module:function", and it's imported
+# once that command is chosen, so the quick commands start quickly
 from lib.asset_manager import add_cmd, delete_cmd
+from lib.client import SOCKET_PATH
 from lib.cmdlet import Commander, Cmdlet
-from lib.image import Image
-from lib.window import KEY_ENTER
-from lib import get_window, get_asset_mgr
-from pathlib import Path
-from copy import copy
-from argparse import Namespace
-from typing import *
+from lib.presets import PRESETS
+from lib.util import WORKERS
 
-X_MAX = 1850
-Y_MAX = 1000
-
-PointType = Tuple[int, int]
-
-def view(args: Namespace):
-    mgr = get_asset_mgr()
-
-    (path, points) = mgr.get(args.n)
-
-    img = Image(path)
-    img.perspective_transform(points)
-    img.scale_bounded(X_MAX, Y_MAX)
-    win = get_window()
-    win.show(img)
-    win.run_until_quit()
-
-
-def interactive_add(args: Namespace):
-    mgr = get_asset_mgr()
-    paths = [Path(p) for p in args.photopaths]
-    points: List[PointType] = []
-
-    async def add():
-        # Adds image to the database
-        def add_image():
-            inverse = 1 / factor
-            mgr.add(
-                path, [(round(p[0] * inverse), round(p[1] * inverse)) for p in points]
-            )
-            points.clear()
-
-        for path in paths:
-            img = Image(path)
-            factor = img.scale_bounded(X_MAX, Y_MAX)
-            scaled = copy(img)
-            win.show(img)
+if __name__ == "__main__":
+    iadd_cmd = Cmdlet(
+        "iadd", "Interactively add coordinates", "lib.interactive:interactive_add"
+    )
+    iadd_cmd.add_arg(
+        "photopaths", nargs="+", help="Paths of the photos you want to add"
+    )
+    iadd_cmd.add_arg(
+        "--prefetch", type=int, default=3, help="Photos to load ahead of the current"
+    )
+    iadd_cmd.add_arg(
+        "--prefetch-mb", type=int, default=256, help="Memory budget for loaded photos"
+    )
+    iadd_cmd.add_arg(
+        "--min-confidence",
+        type=float,
+        default=0.5,
+        help="Fill in detected corners above this confidence, above 1 never does",
+    )
 
-            while True:
-                while len(points) < 4:
-                    x, y = await win.click()
-                    points.append((x, y))
-                    if len(points) == 4:
-                        p1 = points[-1]
-                        p2 = points[0]
-                        img.draw_line(p1, p2)
-                    if len(points) > 1:
-                        p1 = points[-2]
-                        p2 = points[-1]
-                        img.draw_line(p1, p2)
+    bulk_add_cmd = Cmdlet(
+        "bulk-add",
+        "Add photos with automatically detected corners",
+        "lib.corners:bulk_add",
+    )
+    bulk_add_cmd.add_arg(
+        "photopaths", nargs="+", help="Paths of the photos you want to add"
+    )
+    bulk_add_cmd.add_arg(
+        "--min-confidence",
+        type=float,
+        default=0.5,
+        help="Photos detected with less confidence are left for iadd",
+    )
+    bulk_add_cmd.add_arg(
+        "--workers", type=int, default=WORKERS, help="Worker threads for detection"
+    )
 
-                    img.draw_point(x, y)
-                    win.show(img)
+    view_cmd = Cmdlet(
+        "view",
+        "View an image in the db with the perspective transformation applied. "
+        "Scroll to zoom, drag to pan",
+        "lib.interactive:view",
+    )
+    view_cmd.add_arg("n", type=int, help="Image number in the db to lookup")
 
-                k = await win.keypress()
+    browse_cmd = Cmdlet(
+        "browse", "Page through a grid of every asset in the db", "lib.thumbnail:browse"
+    )
+    browse_cmd.add_arg("--cols", type=int, default=6, help="Thumbnails per row")
+    browse_cmd.add_arg("--rows", type=int, default=4, help="Thumbnails per column")
+    browse_cmd.add_arg("--page", type=int, default=0, help="Page to start on")
+
+    thumbs_cmd = Cmdlet(
+        "thumbs",
+        "Build the thumbnail pyramid for every asset in the db",
+        "lib.thumbnail:build_all",
+    )
+    thumbs_cmd.add_arg("--workers", type=int, default=WORKERS, help="Worker threads")
 
-                if k == KEY_ENTER:
-                    add_image()
-                    break
+    process_cmd = Cmdlet(
+        "process",
+        "Run the letterform filter over assets in the db",
+        "lib.process:process",
+    )
+    process_cmd.add_arg(
+        "n", type=int, nargs="*", help="Asset numbers to process, all if none given"
+    )
+    process_cmd.add_arg(
+        "--preset", default="default", choices=sorted(PRESETS), help="Parameter preset"
+    )
+    process_cmd.add_arg("--output", default="./processed", help="Output folder")
+    process_cmd.add_arg(
+        "--format",
+        default="png",
+        choices=["png", "svg", "bvpl"],
+        help="Write the filtered image, or its outlines as SVG or binary polylines",
+    )
+    process_cmd.add_arg(
+        "--workers", type=int, default=WORKERS, help="Worker processes to use"
+    )
+    process_cmd.add_arg(
+        "--in-flight", type=int, default=0, help="Max queued jobs, 2x workers if 0"
+    )
+    process_cmd.add_arg(
+        "--force", action="store_true", help="Process assets even if up to date"
+    )
+    process_cmd.add_arg(
+        "--profile", help="Write per stage timings to this file as JSON lines"
+    )
+    process_cmd.add_arg(
+        "--native",
+        action="store_true",
+        help="Filter boards at their own resolution instead of scaling to 2000px",
+    )
+    process_cmd.add_arg(
+        "--max-side",
+        type=int,
+        help="With --native, scale down boards whose longer side is over this",
+    )
 
-                # Reset
-                points.clear()
-                img = copy(scaled)
-                win.show(img)
+    export_cmd = Cmdlet(
+        "export",
+        "Pack rectified assets into a single dataset file",
+        "lib.dataset:export",
+    )
+    export_cmd.add_arg("output", help="Path of the dataset file to write")
+    export_cmd.add_arg(
+        "n", type=int, nargs="*", help="Asset numbers to export, all if none given"
+    )
+    export_cmd.add_arg("--gray", action="store_true", help="Store grayscale arrays")
+    export_cmd.add_arg(
+        "--workers", type=int, default=WORKERS, help="Worker threads for decoding"
+    )
 
-    win = get_window()
-    win.run(add())
+    tune_cmd = Cmdlet(
+        "tune",
+        "Interactively tune the letterform parameters on an asset",
+        "lib.tune:tune",
+    )
+    tune_cmd.add_arg("n", type=int, help="Image number in the db to tune on")
+    tune_cmd.add_arg(
+        "--preset",
+        default="default",
+        choices=sorted(PRESETS),
+        help="Starting parameters",
+    )
+    tune_cmd.add_arg(
+        "--proxy-scale", type=float, default=0.25, help="Scale of the quick render"
+    )
+    tune_cmd.add_arg(
+        "--idle",
+        type=float,
+        default=0.5,
+        help="Seconds without changes before rendering at full resolution",
+    )
 
+    run_cmd = Cmdlet(
+        "run",
+        "Run the staged processing pipeline described by a manifest",
+        "lib.manifest:run_manifest",
+    )
+    run_cmd.add_arg("manifest", help="Path of the JSON manifest")
+    run_cmd.add_arg(
+        "--force", action="store_true", help="Process assets even if up to date"
+    )
 
-if __name__ == "__main__":
-    iadd_cmd = Cmdlet("iadd", "Interactively add coordinates", interactive_add)
-    iadd_cmd.add_arg(
-        "photopaths", nargs="+", help="Paths of the photos you want to add"
+    stream_cmd = Cmdlet(
+        "stream",
+        "Filter the frames of a video or image folder from a fixed camera",
+        "lib.stream:stream",
+    )
+    stream_cmd.add_arg("source", help="Video file, or folder of frames")
+    stream_cmd.add_arg("n", type=int, help="Asset whose points locate the board")
+    stream_cmd.add_arg(
+        "--preset", default="default", choices=sorted(PRESETS), help="Parameter preset"
+    )
+    stream_cmd.add_arg("--output", default="./stream", help="Output folder")
+    stream_cmd.add_arg("--tile", type=int, default=256, help="Tile size in pixels")
+    stream_cmd.add_arg(
+        "--diff",
+        type=float,
+        default=16.0,
+        help="Grey level change in a pixel that makes its tile be filtered again",
+    )
+    stream_cmd.add_arg(
+        "--native",
+        action="store_true",
+        help="Filter frames at the board's own resolution instead of 2000px",
+    )
+    stream_cmd.add_arg(
+        "--max-side",
+        type=int,
+        help="With --native, scale down boards whose longer side is over this",
     )
 
-    view_cmd = Cmdlet(
-        "view",
-        "View an image in the db with the perspective transformation applied",
-        view,
+    serve_cmd = Cmdlet(
+        "serve",
+        "Keep a worker running with warm caches, taking jobs over a socket",
+        "lib.daemon:serve",
+    )
+    serve_cmd.add_arg("--socket", default=SOCKET_PATH, help="Path of the socket")
+    serve_cmd.add_arg(
+        "--cache", type=int, default=8, help="Images to keep in each cache"
+    )
+    serve_cmd.add_arg(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes to filter each board across",
     )
-    view_cmd.add_arg("n", type=int, help="Image number in the db to lookup")
 
-    commander = Commander([add_cmd, delete_cmd, iadd_cmd, view_cmd])
+    client_cmd = Cmdlet(
+        "client", "Send a job to a running serve command", "lib.client:client"
+    )
+    client_cmd.add_arg("job", help="Job to run, e.g. process, list, stats")
+    client_cmd.add_arg(
+        "params", nargs="*", help="Job parameters as key=value, e.g. n=[0,1]"
+    )
+    client_cmd.add_arg("--socket", default=SOCKET_PATH, help="Path of the socket")
+
+    commander = Commander(
+        [
+            add_cmd,
+            delete_cmd,
+            iadd_cmd,
+            bulk_add_cmd,
+            view_cmd,
+            browse_cmd,
+            thumbs_cmd,
+            process_cmd,
+            export_cmd,
+            tune_cmd,
+            run_cmd,
+            stream_cmd,
+            serve_cmd,
+            client_cmd,
+        ]
+    )
     commander.run()